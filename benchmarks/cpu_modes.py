@@ -0,0 +1,172 @@
+#CPU execution mode benchmark for SimpleCNN (see training/cpu_modes.py).
+#For every mode: warm up (compiles with "compile"), then time forward and
+#backward + optimizer step on a synthetic CIFAR-sized batch. The loss of a
+#short training run from the same seed is checked against eager fp32; the
+#fastest mode within tolerance is then tried with each intra-op thread
+#count, and the winner is saved for train_real's CPU_MODE="auto".
+#
+#  python -m benchmarks.cpu_modes [--steps 50] [--modes eager,bf16] [--no-save]
+import argparse
+import json
+import os
+import time
+
+import torch
+from torch import nn, optim
+
+from training.cpu_modes import CPU_MODE_FILE, CPU_MODES, CPUMode, save_best, set_threads
+from training.model import SimpleCNN
+
+
+BATCH_SIZE = 64
+NUM_CLASSES = 10
+WARMUP_STEPS = 5
+CHECK_STEPS = 20      # training steps compared against eager fp32
+LOSS_RTOL = 0.05      # relative loss difference allowed per step
+
+
+def make_batch(seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    images = torch.rand(BATCH_SIZE, 3, 32, 32, generator=generator)
+    labels = torch.randint(0, NUM_CLASSES, (BATCH_SIZE,), generator=generator)
+    return images, labels
+
+
+def make_trainer(mode):
+    torch.manual_seed(0)
+    model = SimpleCNN(num_classes=NUM_CLASSES)
+    optimizer = optim.Adam(model.parameters(), lr=1e-3)
+    return mode.prepare_model(model), optimizer
+
+
+def train_losses(mode, images, labels, steps):
+    model, optimizer = make_trainer(mode)
+    criterion = nn.CrossEntropyLoss()
+    images = mode.prepare_input(images)
+    losses = []
+    for _ in range(steps):
+        with mode.autocast():
+            loss = criterion(model(images), labels)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        losses.append(loss.item())
+    return losses
+
+
+def time_steps(mode, images, labels, steps):
+    model, optimizer = make_trainer(mode)
+    criterion = nn.CrossEntropyLoss()
+    images = mode.prepare_input(images)
+
+    def step():
+        start = time.perf_counter()
+        with mode.autocast():
+            loss = criterion(model(images), labels)
+        mid = time.perf_counter()
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        return mid - start, time.perf_counter() - mid
+
+    warmup_start = time.perf_counter()
+    for _ in range(WARMUP_STEPS):
+        step()
+    warmup = time.perf_counter() - warmup_start
+
+    forward = backward = 0.0
+    for _ in range(steps):
+        f, b = step()
+        forward += f
+        backward += b
+    return {
+        "warmup_s": warmup,
+        "forward_samples_per_s": steps * BATCH_SIZE / forward,
+        "backward_samples_per_s": steps * BATCH_SIZE / backward,
+        "train_samples_per_s": steps * BATCH_SIZE / (forward + backward),
+    }
+
+
+def bench(name, num_threads, args, images, labels, baseline):
+    threads = set_threads(num_threads)
+    mode = CPUMode(name)
+    result = {"mode": mode.name, "threads": threads}
+    try:
+        result.update(time_steps(mode, images, labels, args.steps))
+        losses = train_losses(mode, images, labels, CHECK_STEPS)
+    except Exception as e:   # e.g. torch.compile without a working C++ toolchain
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+    if baseline is None:
+        baseline = losses
+    diff = max(abs(a - b) / max(abs(b), 1e-6) for a, b in zip(losses, baseline))
+    result.update(final_loss=losses[-1], max_loss_rdiff=diff, loss_ok=diff <= args.rtol)
+    return result
+
+
+def report(r):
+    if "error" in r:
+        print(f"[bench] mode={r['mode']:<27} threads={r['threads']:<3} FAILED  {r['error'].splitlines()[0]}")
+        return
+    print(
+        f"[bench] mode={r['mode']:<27} threads={r['threads']:<3} "
+        f"fwd/s={r['forward_samples_per_s']:9.0f}  bwd/s={r['backward_samples_per_s']:9.0f}  "
+        f"train/s={r['train_samples_per_s']:9.0f}  warmup={r['warmup_s']:6.2f}s  "
+        f"loss_rdiff={r['max_loss_rdiff']:.4f}{'' if r['loss_ok'] else ' (out of tolerance)'}"
+    )
+
+
+def thread_counts():
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    return sorted({1, max(1, cpus // 2), cpus})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleCNN CPU execution mode benchmark")
+    parser.add_argument("--steps", type=int, default=50, help="timed steps per mode")
+    parser.add_argument("--modes", default=",".join(CPU_MODES), help="comma-separated modes")
+    parser.add_argument("--rtol", type=float, default=LOSS_RTOL, help="loss tolerance vs eager fp32")
+    parser.add_argument("--save", default=CPU_MODE_FILE, help="where train_real looks for the choice")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    images, labels = make_batch()
+    default_threads = torch.get_num_threads()
+    baseline = train_losses(CPUMode("eager"), images, labels, CHECK_STEPS)
+
+    results = []
+    for name in args.modes.split(","):
+        r = bench(name, default_threads, args, images, labels, baseline)
+        results.append(r)
+        report(r)
+
+    ok = [r for r in results if r.get("loss_ok")]
+    if not ok:
+        print("[bench] No mode stayed within tolerance; keeping eager fp32")
+        best = {"mode": "eager", "threads": default_threads}
+    else:
+        best = max(ok, key=lambda r: r["train_samples_per_s"])
+        for num_threads in thread_counts():
+            if num_threads == default_threads:
+                continue
+            r = bench(best["mode"], num_threads, args, images, labels, baseline)
+            results.append(r)
+            report(r)
+            if r.get("loss_ok") and r["train_samples_per_s"] > best["train_samples_per_s"]:
+                best = r
+        eager = next((r for r in ok if r["mode"] == "eager" and r["threads"] == default_threads), None)
+        speedup = f" ({best['train_samples_per_s'] / eager['train_samples_per_s']:.2f}x eager fp32)" if eager else ""
+        print(f"[bench] Fastest: mode={best['mode']} threads={best['threads']}{speedup}")
+    set_threads(default_threads)
+
+    if not args.no_save:
+        save_best(best["mode"], best["threads"], args.save, results)
+        print(f"[bench] Saved to {args.save} (train_real CPU_MODE=\"auto\")")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
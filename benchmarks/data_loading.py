@@ -0,0 +1,171 @@
+#CIFAR-10 input pipeline benchmark for train_real.
+#Compares the original torchvision loader (per-sample PIL decode, Resize +
+#ToTensor, 2 non-persistent workers) with the uint8 memmap backend:
+#startup (dataset + loader + first batch), batches/s, and time to the first
+#batch of the next epoch. --train adds a SimpleCNN step per batch (steps/s).
+#
+#  python -m benchmarks.data_loading [--root ./data] [--batches 300] [--train]
+#  python -m benchmarks.data_loading --synthetic     (random data, no download)
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+from torch import nn, optim
+from torch.utils.data import DataLoader, Dataset
+from torchvision import transforms
+
+from training.cifar_memmap import (
+    batch_to_device, make_memmap_loader, prepare_cifar_memmap, write_memmap,
+)
+from training.model import SimpleCNN
+
+
+BATCH_SIZE = 64
+SYNTHETIC_SAMPLES = 50_000
+CLASSES = ["airplane", "automobile", "bird", "cat", "deer",
+           "dog", "frog", "horse", "ship", "truck"]
+
+
+class SyntheticCIFAR(Dataset):
+    """
+    Same per-sample path as torchvision's CIFAR10.__getitem__
+    (Image.fromarray + transform) over in-memory random data.
+    """
+    def __init__(self, data, targets, transform):
+        self.data = data
+        self.targets = targets
+        self.transform = transform
+        self.classes = CLASSES
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        img = Image.fromarray(self.data[index])
+        return self.transform(img), self.targets[index]
+
+
+def make_torchvision_loader(args, synthetic):
+    # the loader train_real used before the memmap backend
+    transform = transforms.Compose([transforms.Resize((32, 32)), transforms.ToTensor()])
+    if synthetic is not None:
+        dataset = SyntheticCIFAR(*synthetic, transform)
+    else:
+        from torchvision import datasets
+        dataset = datasets.CIFAR10(root=args.root, train=True, download=True, transform=transform)
+    return DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=args.workers)
+
+
+def make_memmap(args):
+    loader, _ = make_memmap_loader(
+        args.root, BATCH_SIZE, num_workers=args.workers,
+        persistent_workers=True, prefetch_factor=args.prefetch,
+        pin_memory=torch.cuda.is_available(),
+    )
+    return loader
+
+
+def bench(backend, args, synthetic, device):
+    model = criterion = optimizer = None
+    if args.train:
+        model = SimpleCNN(num_classes=len(CLASSES)).to(device)
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(model.parameters(), lr=1e-3)
+
+    start = time.perf_counter()
+    if backend == "torchvision":
+        loader = make_torchvision_loader(args, synthetic)
+    else:
+        loader = make_memmap(args)
+
+    def epoch(limit):
+        first = None
+        n = 0
+        for images, labels in loader:
+            images, labels = batch_to_device(images, labels, device)
+            if first is None:
+                first = time.perf_counter()
+            if model is not None:
+                loss = criterion(model(images), labels)
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+            n += 1
+            if n >= limit:
+                break
+        return first, n
+
+    first, n = epoch(args.batches)
+    startup = first - start
+    elapsed = time.perf_counter() - first
+    restart = time.perf_counter()
+    second_first, _ = epoch(1)   # new epoch: workers restart unless persistent
+    return {
+        "backend": backend,
+        "workers": args.workers,
+        "train": args.train,
+        "startup_s": startup,
+        "batches": n,
+        "batches_per_s": (n - 1) / elapsed if n > 1 else 0.0,
+        "epoch_restart_s": second_first - restart,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CIFAR-10 loader benchmark")
+    parser.add_argument("--root", default=None, help="data dir (default ./data, or a temp dir with --synthetic)")
+    parser.add_argument("--batches", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--prefetch", type=int, default=4)
+    parser.add_argument("--train", action="store_true", help="run a training step per batch")
+    parser.add_argument("--synthetic", action="store_true", help="random data instead of CIFAR-10")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    synthetic = None
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        synthetic = (
+            rng.integers(0, 256, (SYNTHETIC_SAMPLES, 32, 32, 3), dtype=np.uint8),
+            rng.integers(0, len(CLASSES), SYNTHETIC_SAMPLES).tolist(),
+        )
+        if args.root is None:
+            args.root = tempfile.mkdtemp(prefix="icdash-cifar-")
+    elif args.root is None:
+        args.root = "./data"
+
+    # the one-time conversion is not part of startup
+    convert_start = time.perf_counter()
+    if synthetic is not None:
+        write_memmap(args.root, synthetic[0], synthetic[1], CLASSES)
+    else:
+        prepare_cifar_memmap(args.root)
+    print(f"[bench] memmap conversion (one-time): {time.perf_counter() - convert_start:.2f}s")
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    results = []
+    for backend in ("torchvision", "memmap"):
+        r = bench(backend, args, synthetic, device)
+        results.append(r)
+        print(
+            f"[bench] backend={backend:<11}  startup={r['startup_s']:6.2f}s  "
+            f"batches/s={r['batches_per_s']:8.1f}  epoch_restart={r['epoch_restart_s']:6.2f}s"
+        )
+    old, new = results
+    print(
+        f"[bench] memmap saves {old['startup_s'] - new['startup_s']:.2f}s of startup, "
+        f"{new['batches_per_s'] / max(old['batches_per_s'], 1e-9):.1f}x "
+        f"{'steps' if args.train else 'batches'}/s"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
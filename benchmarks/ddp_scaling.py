@@ -0,0 +1,82 @@
+#Data-parallel scaling benchmark for training/train_ddp.py.
+#Runs the same number of steps per rank with 1, 2, 4 and 8 processes
+#(weak scaling: the global batch grows with the ranks) and reports samples/s,
+#speedup and efficiency against 1 process. With --dashboard an in-process
+#dashboard receives the telemetry, to check it stays one stream per run.
+#
+#  python -m benchmarks.ddp_scaling [--procs 1,2,4,8] [--steps 200] [--dashboard]
+#  python -m benchmarks.ddp_scaling --root ./data      (real CIFAR-10)
+import argparse
+import contextlib
+import json
+import sys
+import tempfile
+
+import numpy as np
+
+from dashboard import server as server_mod
+from dashboard.metrics import metrics
+from training.cifar_memmap import write_memmap
+from training.train_ddp import launch
+
+
+PORT = 50062             # away from the default dashboard port
+SYNTHETIC_SAMPLES = 50_000
+CLASSES = ["airplane", "automobile", "bird", "cat", "deer",
+           "dog", "frog", "horse", "ship", "truck"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DDP (gloo, CPU) scaling benchmark")
+    parser.add_argument("--procs", default="1,2,4,8", help="comma-separated process counts")
+    parser.add_argument("--steps", type=int, default=200, help="steps per rank")
+    parser.add_argument("--root", default=None, help="memmap data dir (default: synthetic data in a temp dir)")
+    parser.add_argument("--threads", type=int, default=0, help="threads per rank (0: cores / procs)")
+    parser.add_argument("--cpu-mode", default="eager")
+    parser.add_argument("--dashboard", action="store_true", help="stream to an in-process dashboard")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    if args.root is None:
+        args.root = tempfile.mkdtemp(prefix="icdash-cifar-")
+        rng = np.random.default_rng(0)
+        write_memmap(
+            args.root,
+            rng.integers(0, 256, (SYNTHETIC_SAMPLES, 32, 32, 3), dtype=np.uint8),
+            rng.integers(0, len(CLASSES), SYNTHETIC_SAMPLES),
+            CLASSES,
+        )
+
+    server = None
+    addr = ""
+    if args.dashboard:
+        with contextlib.redirect_stdout(sys.stderr):
+            server = server_mod.start_server_in_thread(record_dir=None, port=PORT)
+        addr = f"localhost:{PORT}"
+
+    results = []
+    for nproc in (int(n) for n in args.procs.split(",")):
+        before = metrics.snapshot()["counters"].get("batches_received", 0)
+        r = launch(nproc, args.root, addr, epochs=1000, max_steps=args.steps,
+                   cpu_mode=args.cpu_mode, threads=args.threads)
+        r["batches_received"] = metrics.snapshot()["counters"].get("batches_received", 0) - before
+        base = results[0]["samples_per_s"] if results else r["samples_per_s"]
+        r["speedup"] = r["samples_per_s"] / base
+        r["efficiency"] = r["speedup"] / nproc * (results[0]["world_size"] if results else 1)
+        results.append(r)
+        print(
+            f"[bench] procs={nproc:<2} threads/rank={r['threads_per_rank']:<3} "
+            f"samples/s={r['samples_per_s']:8.0f}  speedup={r['speedup']:5.2f}x  "
+            f"efficiency={r['efficiency'] * 100:5.1f}%  batches_sent={r['batches_sent']}"
+            + (f"  received={r['batches_received']}" if args.dashboard else "")
+        )
+
+    if server is not None:
+        server.stop(0)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#End-to-end throughput benchmark.
+#Starts the dashboard server in this process, drives it with concurrent
+#train_client generators and prints one JSON report: sustained batches/s,
+#MB/s, CPU time per component and the latency histograms.
+#
+#  python -m benchmarks.e2e_throughput --clients 4 --rate 0 --encoding raw
+#  python -m benchmarks.e2e_throughput --gui --duration 20 --json out.json
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+import grpc
+
+from dashboard import server as server_mod
+from dashboard.metrics import metrics
+from proto import dashboard_pb2_grpc
+from training.tiles import COMPRESSIONS, ENCODINGS
+from training.train_client import generate_fake_batches
+
+
+PORT = 50061             # away from the default dashboard port
+DISPLAY_TILE_SIZE = (128, 128)   # headless stand-in for the GUI tile grid
+DISPLAY_TILES = 16
+MOSAIC_GRID = (4, 4)             # --mosaic: rows, cols
+MOSAIC_SIZE = (512, 512)
+
+# thread-name prefix -> component; everything unmatched is "other"
+# (gRPC core pollers, request iterator threads, interpreter)
+THREAD_COMPONENTS = (
+    ("grpc-ingest", "ingest"),
+    ("grpc-aio", "ingest"),
+    ("tile-render", "render"),
+    ("MainThread", "gui"),
+)
+
+
+def thread_cpu_times():
+    """
+    CPU seconds (user + system) per live Python thread, keyed by thread
+    name. Linux only; returns {} where /proc is not available.
+    """
+    tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    times = {}
+    for t in threading.enumerate():
+        try:
+            with open(f"/proc/self/task/{t.native_id}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError, TypeError):
+            continue
+        # fields[11], fields[12] are utime and stime (stat fields 14 and 15)
+        times[t.name] = (int(fields[11]) + int(fields[12])) / tick
+    return times
+
+
+def cpu_by_component(start, end):
+    components = {name: 0.0 for _, name in THREAD_COMPONENTS}
+    for thread_name, cpu in end.items():
+        for prefix, name in THREAD_COMPONENTS:
+            if thread_name.startswith(prefix):
+                components[name] += cpu - start.get(thread_name, 0.0)
+                break
+    return components
+
+
+class BenchClient:
+    """
+    One simulated trainer: a StreamTraining call fed by
+    generate_fake_batches. CPU spent producing batches (noise + encoding)
+    is measured inside the generator's thread, so it is attributed to
+    "client" even though gRPC consumes the iterator on its own thread.
+    """
+    def __init__(self, index, args, stop_event):
+        self.index = index
+        self.args = args
+        self.stop_event = stop_event
+        self.sent = 0
+        self.cpu_s = 0.0
+        self.error = None
+        self._thread = threading.Thread(
+            target=self._run, name=f"bench-client-{index}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _batches(self):
+        args = self.args
+        batches = generate_fake_batches(
+            num_batches=None, batch_size=args.batch_size,
+            encoding=ENCODINGS[args.encoding], rate=args.rate,
+            num_tiles=args.tiles, tile_res=args.tile_res,
+            run_id=f"bench-{self.index}", stop_event=self.stop_event,
+            verbose=False, dataset_size=args.dataset_size,
+        )
+        while True:
+            # the generator sleeps for pacing, but sleep costs no CPU time
+            start = time.thread_time()
+            try:
+                batch = next(batches)
+            except StopIteration:
+                return
+            finally:
+                self.cpu_s += time.thread_time() - start
+            self.sent += 1
+            yield batch
+
+    def _run(self):
+        channel = grpc.insecure_channel(
+            f"localhost:{self.args.port}",
+            compression=COMPRESSIONS[self.args.compression],
+        )
+        stub = dashboard_pb2_grpc.DashboardServiceStub(channel)
+        try:
+            stub.StreamTraining(self._batches())
+        except grpc.RpcError as e:
+            self.error = str(e)
+        finally:
+            channel.close()
+
+
+def start_headless_consumer(stop_event, mosaic=False):
+    """
+    Stand-in for the GUI: decode every batch with a TileRenderer (and
+    compose the mosaic, if asked) and take the results as they come.
+    """
+    from dashboard.mosaic import Mosaic
+    from dashboard.render import TileRenderer
+    from dashboard.tiles import tile_labels
+
+    ready = threading.Event()
+    renderer = TileRenderer(
+        DISPLAY_TILE_SIZE, DISPLAY_TILES, on_ready=ready.set,
+        mosaic=Mosaic(*MOSAIC_GRID, MOSAIC_SIZE) if mosaic else None,
+        labels_for=lambda batch: tile_labels(
+            batch, server_mod.registry.get(batch.run_id).label_names
+        ),
+    )
+    server_mod.registry.add_listener(renderer.submit)
+    taken = [0]
+
+    def consume():
+        while not stop_event.is_set():
+            if ready.wait(0.1):
+                ready.clear()
+                if renderer.take_ready() is not None:
+                    taken[0] += 1
+
+    threading.Thread(target=consume, name="bench-consumer", daemon=True).start()
+    return renderer, taken
+
+
+def run(args):
+    server = server_mod.start_server_in_thread(
+        record_dir=None, port=args.port, mode=args.server_mode
+    )
+    stop_event = threading.Event()
+
+    root = renderer = None
+    if args.gui:
+        import tkinter as tk
+        from dashboard.gui import DashboardGUI
+        root = tk.Tk()
+        DashboardGUI(root)
+    else:
+        renderer, taken = start_headless_consumer(stop_event, args.mosaic)
+
+    clients = [BenchClient(i, args, stop_event) for i in range(args.clients)]
+    before = metrics.snapshot()["counters"]
+    cpu_start = thread_cpu_times()
+    process_start = time.process_time()
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+
+    # CPU is sampled before the clients stop, while all threads are alive
+    sample = {}
+    def finish():
+        sample["cpu"] = thread_cpu_times()
+        sample["process"] = time.process_time()
+        sample["elapsed"] = time.perf_counter() - start
+        sample["counters"] = metrics.snapshot()["counters"]
+        sample["client_cpu"] = sum(c.cpu_s for c in clients)
+        sample["sent"] = sum(c.sent for c in clients)
+
+    if root is not None:
+        def on_timeout():
+            finish()
+            root.quit()
+        root.after(int(args.duration * 1000), on_timeout)
+        root.mainloop()
+    else:
+        time.sleep(args.duration)
+        finish()
+
+    stop_event.set()
+    for client in clients:
+        client.join(5.0)
+    if renderer is not None:
+        renderer.stop()
+    server.stop(0)
+    if root is not None:
+        root.destroy()
+
+    elapsed = sample["elapsed"]
+    counters = sample["counters"]
+    def delta(name):
+        return counters.get(name, 0) - before.get(name, 0)
+
+    cpu = cpu_by_component(cpu_start, sample["cpu"])
+    if not args.gui:
+        cpu.pop("gui")
+    cpu["client"] = sample["client_cpu"]
+    cpu["total"] = sample["process"] - process_start
+    cpu["other"] = max(cpu["total"] - sum(v for k, v in cpu.items() if k != "total"), 0.0)
+
+    received = delta("batches_received")
+    cache_hits, cache_misses = delta("tile_cache_hits"), delta("tile_cache_misses")
+    histograms = metrics.snapshot()["histograms"]
+    return {
+        "config": {
+            "clients": args.clients, "rate": args.rate, "tiles": args.tiles,
+            "tile_res": args.tile_res, "batch_size": args.batch_size,
+            "dataset_size": args.dataset_size,
+            "encoding": args.encoding, "compression": args.compression,
+            "duration_s": args.duration,
+            "mode": "gui" if args.gui else ("mosaic" if args.mosaic else "headless"),
+            "server_mode": args.server_mode,
+        },
+        "elapsed_s": elapsed,
+        "batches_sent": sample["sent"],
+        "batches_received": received,
+        "batches_per_s": received / elapsed,
+        "mb_per_s": delta("bytes_received") / elapsed / 1e6,
+        "frames_displayed": delta("frames_displayed") if args.gui else taken[0],
+        "frames_dropped": delta("frames_dropped"),
+        "tile_cache_hit_rate": cache_hits / max(cache_hits + cache_misses, 1),
+        "cpu_s": cpu,
+        "cpu_percent": {k: v / elapsed * 100.0 for k, v in cpu.items()},
+        "histograms": {
+            name: {k: h[k] for k in ("count", "mean", "p50", "p95", "p99", "max", "unit")}
+            for name, h in sorted(histograms.items()) if h["count"]
+        },
+        "client_errors": [c.error for c in clients if c.error],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end dashboard throughput benchmark")
+    parser.add_argument("--clients", type=int, default=1, help="concurrent trainers")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="batches/s per client (0 = as fast as possible)")
+    parser.add_argument("--tiles", type=int, default=16, help="images per batch")
+    parser.add_argument("--tile-res", type=int, default=64, help="image side in pixels")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--dataset-size", type=int, default=0,
+                        help="tiles from a fixed pool of N images (exercises the tile cache)")
+    parser.add_argument("--encoding", default="png", choices=sorted(ENCODINGS))
+    parser.add_argument("--compression", default="none", choices=sorted(COMPRESSIONS))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--gui", action="store_true", help="render into the real Tk GUI")
+    parser.add_argument("--mosaic", action="store_true",
+                        help="headless: also compose the 4x4 mosaic image")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--server-mode", default=server_mod.SERVER_MODE,
+                        choices=["threads", "aio"])
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    # keep stdout clean for the JSON report; server prints go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    print(
+        f"[bench] {report['batches_per_s']:.1f} batches/s  "
+        f"{report['mb_per_s']:.2f} MB/s  "
+        f"cpu={report['cpu_percent']['total']:.0f}%",
+        file=sys.stderr,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
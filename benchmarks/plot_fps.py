@@ -0,0 +1,114 @@
+#Loss plot rendering benchmark.
+#Compares the autoscale/draw_idle path with the blit renderer at several
+#history sizes, with and without min/max decimation of the series.
+#
+#  python -m benchmarks.plot_fps                 (headless Agg canvas)
+#  python -m benchmarks.plot_fps --tk            (real TkAgg window)
+import argparse
+import json
+import time
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from dashboard.history import LossHistory
+from dashboard.plotting import RENDERERS
+
+
+SIZES = (1_000, 100_000, 1_000_000)
+FIG_SIZE = (8, 6)        # inches at 100 dpi -> 800 px wide plot
+PLOT_POINTS = 800        # ~one point per horizontal pixel
+
+
+def make_history(n):
+    """
+    LossHistory with n points of a noisy decaying loss curve.
+    """
+    rng = np.random.default_rng(0)
+    steps = np.arange(n)
+    losses = 2.3 * np.exp(-steps / max(n / 5, 1)) + 0.1 + rng.normal(0, 0.05, n)
+    history = LossHistory()
+    with history.lock:
+        for i in range(n):
+            history.append(i, losses[i])
+    return history
+
+
+def make_canvas(use_tk):
+    fig = Figure(figsize=FIG_SIZE, dpi=100)
+    ax = fig.add_subplot(111)
+    ax.set_title("Training Loss")
+    ax.set_xlabel("Iteration")
+    ax.set_ylabel("Loss")
+    if use_tk:
+        import tkinter as tk
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        root = tk.Tk()
+        canvas = FigureCanvasTkAgg(fig, master=root)
+        canvas.get_tk_widget().pack()
+        root.update()
+        return root, canvas, ax
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    return None, FigureCanvasAgg(fig), ax
+
+
+def bench(history, renderer_name, decimate, frames, use_tk):
+    root, canvas, ax = make_canvas(use_tk)
+    line, = ax.plot([], [], lw=1)
+    renderer = RENDERERS[renderer_name](canvas, ax)
+    renderer.add_line(line)
+    canvas.draw()
+
+    n = len(history)
+    start = time.perf_counter()
+    for f in range(frames):
+        # one new point per frame, like a live run
+        with history.lock:
+            history.append(n + f, 0.1)
+        x, y = history.snapshot(PLOT_POINTS if decimate else None)
+        line.set_data(x, y)
+        renderer.render()
+        if root is not None:
+            root.update()   # let Tk actually paint (draw_idle runs here)
+    elapsed = time.perf_counter() - start
+    if root is not None:
+        root.destroy()
+    return {
+        "renderer": renderer_name,
+        "decimated": decimate,
+        "points": n,
+        "frames": frames,
+        "fps": frames / elapsed,
+        "ms_per_frame": elapsed / frames * 1000.0,
+        "full_draws": getattr(renderer, "full_draws", frames),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loss plot rendering benchmark")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--tk", action="store_true", help="render into a real Tk window")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        history = make_history(n)
+        for renderer_name in RENDERERS:
+            for decimate in (False, True):
+                r = bench(history, renderer_name, decimate, args.frames, args.tk)
+                results.append(r)
+                print(
+                    f"[bench] points={n:>9,}  renderer={renderer_name:<9}  "
+                    f"decimated={str(decimate):<5}  fps={r['fps']:8.1f}  "
+                    f"ms/frame={r['ms_per_frame']:7.2f}  full_draws={r['full_draws']}"
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#Scrollback (tile history) benchmark.
+#Feeds tile batches of one or more runs through dashboard.scrollback and
+#prints the process RSS and the RAM/disk bytes of all runs' histories along
+#the way (they should level off once the budgets, shared by all runs, are
+#used), then times scrubber seeks on the first run: random ones over its
+#whole history, and a paced backward scrub with and without read-ahead.
+#
+#  python -m benchmarks.scrollback [--iterations 1000000] [--tile-every 10] [--runs 1]
+#  python -m benchmarks.scrollback --encoding raw     (pays the PNG re-encode)
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import time
+
+import numpy as np
+from PIL import Image
+
+from dashboard.scrollback import DISK_BYTES, RAM_BYTES, SEGMENT_BYTES, Scrollback
+from proto import dashboard_pb2
+
+
+POOL_SIZE = 5000          # distinct images, like a (small) dataset
+TILE_RES = 32
+CHECKPOINTS = 10          # memory lines printed over the run
+RANDOM_SEEKS = 500
+SCRUB_SEEKS = 200
+SCRUB_INTERVAL_S = 0.01   # between drag events while scrubbing
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_pool(encoding, seed=0):
+    """
+    POOL_SIZE smooth random images: PNG bytes, or uint8 HWC arrays for raw.
+    """
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (POOL_SIZE, 4, 4, 3), dtype=np.uint8)
+    pool = []
+    for pixels in small:
+        img = Image.fromarray(pixels).resize((TILE_RES, TILE_RES), Image.BILINEAR)
+        if encoding == "raw":
+            pool.append(np.asarray(img))
+        else:
+            buf = io.BytesIO()
+            img.save(buf, format="PNG")
+            pool.append(buf.getvalue())
+    return pool
+
+
+def make_batch(pool, encoding, run_id, iteration, tiles, rng):
+    batch = dashboard_pb2.TrainingBatch(run_id=run_id, iteration=iteration, loss=1.0)
+    picks = rng.sample(range(len(pool)), tiles)
+    batch.tile_true_ids.extend(p % 10 for p in picks)
+    batch.tile_predicted_ids.extend(rng.randrange(10) for _ in picks)
+    for i, p in enumerate(picks):
+        img_msg = batch.images.add()
+        img_msg.id = i
+        if encoding == "png":
+            img_msg.image_data = pool[p]
+    if encoding == "raw":
+        packed = np.stack([pool[p] for p in picks])
+        batch.encoding = dashboard_pb2.TILE_ENCODING_RAW
+        batch.tile_data = packed.tobytes()
+        batch.tile_shape.extend(packed.shape)
+        batch.tile_dtype = "uint8"
+    else:
+        batch.encoding = dashboard_pb2.TILE_ENCODING_PNG
+    return batch
+
+
+def percentiles(samples_ms):
+    a = np.array(samples_ms)
+    return {"p50": float(np.percentile(a, 50)), "p95": float(np.percentile(a, 95)),
+            "max": float(a.max())}
+
+
+def scrub(scrollback, start, step, direction):
+    """
+    Paced backward scrub from start; per-seek ms.
+    """
+    times = []
+    iteration = start
+    for _ in range(SCRUB_SEEKS):
+        t = time.perf_counter()
+        scrollback.seek("bench-0", iteration, direction)
+        times.append((time.perf_counter() - t) * 1000.0)
+        iteration -= step
+        time.sleep(SCRUB_INTERVAL_S)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrollback memory and seek benchmark")
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    parser.add_argument("--tile-every", type=int, default=10, help="one tile batch per N iterations")
+    parser.add_argument("--tiles", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=1, help="runs fed in turn, sharing the budgets")
+    parser.add_argument("--encoding", choices=("png", "raw"), default="png")
+    parser.add_argument("--ram-mb", type=int, default=RAM_BYTES // 2**20)
+    parser.add_argument("--disk-mb", type=int, default=DISK_BYTES // 2**20)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    pool = make_pool(args.encoding)
+    rng = random.Random(0)
+    # a scratch directory of its own, removed on close()
+    scrollback = Scrollback(None, args.ram_mb * 2**20, args.disk_mb * 2**20, SEGMENT_BYTES)
+
+    results = {"args": vars(args), "memory": []}
+    start_rss = rss_mb()
+    every = max(args.iterations // CHECKPOINTS, 1)
+    add_ms = []
+    start = time.perf_counter()
+    for iteration in range(0, args.iterations, args.tile_every):
+        for run in range(args.runs):
+            batch = make_batch(pool, args.encoding, f"bench-{run}", iteration, args.tiles, rng)
+            t = time.perf_counter()
+            scrollback.add(batch, time.time())
+            add_ms.append((time.perf_counter() - t) * 1000.0)
+        if (iteration + args.tile_every) // every != iteration // every:
+            point = {
+                "iteration": iteration, "rss_mb": rss_mb(),
+                "ram_mb": scrollback.ram_used / 2**20, "disk_mb": scrollback.disk_used / 2**20,
+                "oldest": scrollback.bounds("bench-0")[0],
+            }
+            results["memory"].append(point)
+            print(
+                f"[bench] iter={iteration:>9}  rss={point['rss_mb']:7.1f} MB "
+                f"(+{point['rss_mb'] - start_rss:6.1f})  ram={point['ram_mb']:6.1f} MB  "
+                f"disk={point['disk_mb']:7.1f} MB  oldest={point['oldest']}"
+            )
+    elapsed = time.perf_counter() - start
+    results["add_ms"] = percentiles(add_ms)
+    print(f"[bench] stored {len(add_ms)} batches in {elapsed:.1f}s, "
+          f"add p50={results['add_ms']['p50']:.2f} ms p95={results['add_ms']['p95']:.2f} ms")
+
+    first, last = scrollback.bounds("bench-0")
+    seeks = []
+    for _ in range(RANDOM_SEEKS):
+        t = time.perf_counter()
+        scrollback.seek("bench-0", rng.randint(first, last))
+        seeks.append((time.perf_counter() - t) * 1000.0)
+    results["random_seek_ms"] = percentiles(seeks)
+
+    # scrub on disk-resident history (well behind the RAM tier)
+    step = args.tile_every
+    middle = (first + last) // 2
+    results["scrub_ms"] = percentiles(scrub(scrollback, middle, step, direction=0))
+    results["scrub_prefetch_ms"] = percentiles(scrub(scrollback, middle - 2 * SCRUB_SEEKS * step, step, direction=-1))
+    for name in ("random_seek_ms", "scrub_ms", "scrub_prefetch_ms"):
+        r = results[name]
+        print(f"[bench] {name:<18} p50={r['p50']:.3f}  p95={r['p95']:.3f}  max={r['max']:.3f}")
+
+    scrollback.close()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
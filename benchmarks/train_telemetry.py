@@ -0,0 +1,131 @@
+#Training-side telemetry overhead benchmark.
+#Runs SimpleCNN steps on synthetic CIFAR-sized batches and reports steps/s
+#without telemetry and with each TELEMETRY_MODE of train_real. Batches go
+#to a sender that only counts them, so only the trainer's cost is measured.
+#
+#  python -m benchmarks.train_telemetry [--steps 300] [--device cuda] [--image-rate 15]
+import argparse
+import json
+import time
+
+import torch
+from torch import nn, optim
+
+from training.model import SimpleCNN
+from training.step_telemetry import TELEMETRY_MODES, make_step_telemetry
+from training.tiles import ENCODINGS
+
+
+BATCH_SIZE = 64
+NUM_CLASSES = 10
+WARMUP_STEPS = 20
+
+
+class CountingSender:
+    """
+    TelemetrySender stand-in: same flow-control interface, no network.
+    image_rate=None asks for tiles on every step (the worst case).
+    """
+    def __init__(self, image_rate=None):
+        self.online = True
+        self.sent = 0
+        self.bytes = 0
+        self.image_rate = image_rate
+        self.sent_tiles = None     # no dashboard cache: every tile carries pixels
+        self.label_names = [str(c) for c in range(NUM_CLASSES)]
+        self._last_images = None
+
+    def take_image_slot(self):
+        if self.image_rate is None:
+            return True
+        now = time.monotonic()
+        if self._last_images is not None and now - self._last_images < 1.0 / self.image_rate:
+            return False
+        self._last_images = now
+        return True
+
+    def wants_loss(self, iteration):
+        return True
+
+    def send(self, batch_msg):
+        self.sent += 1
+        self.bytes += batch_msg.ByteSize()
+        return True
+
+
+def bench(mode, args, device):
+    torch.manual_seed(0)
+    model = SimpleCNN(num_classes=NUM_CLASSES).to(device)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=1e-3)
+    images = torch.rand(BATCH_SIZE, 3, 32, 32, device=device)
+    labels = torch.randint(0, NUM_CLASSES, (BATCH_SIZE,), device=device)
+
+    sender = CountingSender(args.image_rate)
+    telemetry = None
+    if mode != "none":
+        telemetry = make_step_telemetry(mode, sender, ENCODINGS[args.encoding], device)
+
+    def run(steps, first):
+        for iteration in range(first, first + steps):
+            start_time = time.time()
+            outputs = model(images)
+            loss = criterion(outputs, labels)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            preds = outputs.argmax(dim=1)
+            if telemetry is not None:
+                telemetry.step(iteration, loss, images, labels, preds,
+                               (time.time() - start_time) * 1000.0)
+
+    run(WARMUP_STEPS, 0)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    run(args.steps, WARMUP_STEPS)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    elapsed = time.perf_counter() - start
+    if telemetry is not None:
+        telemetry.close()
+    return {
+        "mode": mode,
+        "device": str(device),
+        "encoding": args.encoding,
+        "image_rate": args.image_rate,
+        "steps": args.steps,
+        "steps_per_s": args.steps / elapsed,
+        "ms_per_step": elapsed / args.steps * 1000.0,
+        "batches_sent": sender.sent,
+        "mb_sent": sender.bytes / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training-side telemetry overhead benchmark")
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--encoding", default="png", choices=sorted(ENCODINGS))
+    parser.add_argument("--image-rate", type=float, default=None,
+                        help="tile batches/s the dashboard asks for (default: every step)")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    results = []
+    for mode in ("none",) + TELEMETRY_MODES:
+        r = bench(mode, args, device)
+        results.append(r)
+        print(
+            f"[bench] mode={mode:<12}  steps/s={r['steps_per_s']:8.1f}  "
+            f"ms/step={r['ms_per_step']:7.2f}  batches_sent={r['batches_sent']}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
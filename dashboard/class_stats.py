@@ -0,0 +1,102 @@
+#Per-class statistics from the full-batch class ids in TrainingBatch.
+#Trainers send the true and predicted id of every sample (batch_true_ids /
+#batch_predicted_ids, packed), not just of the few tiles; DashboardState keeps
+#a ClassStats per dashboard and the GUI draws its windowed confusion matrix.
+import collections
+
+import numpy as np
+
+
+# --- CONFIG ---
+WINDOW_ITERS = 500     # windowed accuracy covers the samples of this many iterations
+MAX_CLASSES = 1000     # id bound for trainers that send no label names
+ID_DTYPES = {"": "<u1", "uint8": "<u1", "int16": "<i2", "int32": "<i4"}
+
+
+def batch_class_ids(batch, num_classes=0):
+    """
+    (true_ids, predicted_ids) int64 arrays of a batch's full-batch ids,
+    or None if it has none. Raises ValueError unless every id is in
+    [0, num_classes) (or [0, MAX_CLASSES) when num_classes is 0).
+    """
+    if not batch.batch_true_ids:
+        return None
+    dtype = ID_DTYPES.get(batch.batch_ids_dtype)
+    if dtype is None:
+        raise ValueError(f"unsupported batch id dtype {batch.batch_ids_dtype!r}")
+    true_ids = np.frombuffer(batch.batch_true_ids, dtype=dtype)
+    pred_ids = np.frombuffer(batch.batch_predicted_ids, dtype=dtype)
+    if len(true_ids) != len(pred_ids):
+        raise ValueError("batch_true_ids and batch_predicted_ids differ in length")
+    true_ids, pred_ids = true_ids.astype(np.int64), pred_ids.astype(np.int64)
+    limit = num_classes or MAX_CLASSES
+    for ids in (true_ids, pred_ids):
+        if len(ids) and (ids.min() < 0 or ids.max() >= limit):
+            raise ValueError(
+                f"class ids must be in [0, {limit}), got {ids.min()}..{ids.max()}"
+            )
+    return true_ids, pred_ids
+
+
+def per_class_accuracy(confusion):
+    """
+    Diagonal over row sums (rows are true classes); NaN for classes
+    without samples.
+    """
+    totals = confusion.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.diag(confusion) / totals
+
+
+class ClassStats:
+    """
+    Confusion matrix (rows: true class, columns: prediction) of a run,
+    over the whole run and over the last window_iters iterations.
+
+    A batch's ids are added with one np.bincount over true * n + pred;
+    the ids are also kept until they leave the window, and then taken
+    out of the windowed matrix with np.add.at. The matrices grow when a
+    class id beyond the vocabulary shows up. Not thread-safe: the owning
+    DashboardState calls it under its lock.
+    """
+    def __init__(self, window_iters=WINDOW_ITERS):
+        self.window_iters = window_iters
+        self.total = np.zeros((0, 0), dtype=np.int64)
+        self.window = np.zeros((0, 0), dtype=np.int64)
+        self._chunks = collections.deque()   # (iteration, true_ids, pred_ids) in the window
+        self.samples = 0
+        self.version = 0        # bumped on every update
+
+    @property
+    def num_classes(self):
+        return len(self.total)
+
+    def _grow(self, n):
+        for name in ("total", "window"):
+            old = getattr(self, name)
+            grown = np.zeros((n, n), dtype=np.int64)
+            grown[:len(old), :len(old)] = old
+            setattr(self, name, grown)
+
+    def update(self, iteration, true_ids, pred_ids, num_classes=0):
+        if not len(true_ids):
+            return
+        n = max(num_classes, self.num_classes, int(true_ids.max()) + 1, int(pred_ids.max()) + 1)
+        if n > self.num_classes:
+            self._grow(n)
+        counts = np.bincount(true_ids * n + pred_ids, minlength=n * n).reshape(n, n)
+        self.total += counts
+        self.window += counts
+        self.samples += len(true_ids)
+
+        self._chunks.append((iteration, true_ids, pred_ids))
+        while self._chunks and self._chunks[0][0] <= iteration - self.window_iters:
+            _, old_true, old_pred = self._chunks.popleft()
+            np.add.at(self.window, (old_true, old_pred), -1)
+        self.version += 1
+
+    def snapshot(self):
+        """
+        (version, total, window) with copies of both matrices.
+        """
+        return self.version, self.total.copy(), self.window.copy()
@@ -0,0 +1,97 @@
+import os
+import threading
+
+from proto import dashboard_pb2
+
+
+# --- CONFIG ---
+IMAGE_RATE = float(os.environ.get("ICDASH_IMAGE_RATE", "15"))  # tile batches/s for the shown run
+BACKGROUND_IMAGE_RATE = 1.0   # tile batches/s for runs that are not on screen
+LOSS_EVERY = 1                # loss point every N steps
+
+
+class FlowPolicy:
+    """
+    What the dashboard asks trainers to send on StreamTelemetry.
+
+    There is no point in a trainer selecting, copying and encoding tiles
+    faster than the GUI can show them, or at all for runs that are not on
+    screen. The GUI calls focus() with the run it displays; that run gets
+    image_rate, every other run background_image_rate (all runs get
+    image_rate while nothing is focused, e.g. headless). Streams subscribe
+    a callback and resend their FlowControl when it changes.
+
+    tile_cache_entries tells trainers how many dataset tiles the
+    dashboard caches, i.e. how many recently sent ones they may omit. Only
+    the run whose tiles a renderer is putting into the cache right now
+    (cache_run(), the GUI's live run) is offered it; every other run, and
+    every run of a headless server, gets 0 and always sends pixels.
+    """
+    def __init__(self, image_rate=IMAGE_RATE, background_image_rate=BACKGROUND_IMAGE_RATE,
+                 loss_every=LOSS_EVERY, tile_cache_entries=0):
+        self.image_rate = image_rate
+        self.background_image_rate = background_image_rate
+        self.loss_every = loss_every
+        self.tile_cache_entries = tile_cache_entries
+        self.focused = None          # run id on screen, None = no preference
+        self.cached_run = None       # run id filling the tile cache, None = none
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def for_run(self, run_id):
+        if self.focused is None or run_id == self.focused:
+            rate = self.image_rate
+        else:
+            rate = self.background_image_rate
+        return dashboard_pb2.FlowControl(
+            max_image_batches_per_s=rate, loss_every_n=self.loss_every,
+            tile_cache_entries=self.tile_cache_entries if self.may_omit(run_id) else 0,
+        )
+
+    def may_omit(self, run_id):
+        """
+        True if run_id is offered the tile cache, i.e. may send tiles
+        without pixels.
+        """
+        return self.tile_cache_entries > 0 and self.cached_run is not None and run_id == self.cached_run
+
+    def focus(self, run_id):
+        if run_id != self.focused:
+            self.focused = run_id
+            self._changed()
+
+    def cache_run(self, run_id):
+        """
+        A renderer now fills the tile cache with run_id's tiles (None: no
+        run's); only that run may omit cached pixels.
+        """
+        if run_id != self.cached_run:
+            self.cached_run = run_id
+            self._changed()
+
+    def set_rates(self, image_rate=None, background_image_rate=None, loss_every=None):
+        if image_rate is not None:
+            self.image_rate = image_rate
+        if background_image_rate is not None:
+            self.background_image_rate = background_image_rate
+        if loss_every is not None:
+            self.loss_every = loss_every
+        self._changed()
+
+    def subscribe(self, callback):
+        """
+        Register callback(), called from whichever thread changed the policy.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def _changed(self):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
@@ -1,4 +1,3 @@
-import io
 import time
 import tkinter as tk
 from tkinter import ttk
@@ -8,13 +7,46 @@ from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 from dashboard import server as server_mod
+from dashboard.metrics import metrics
+from dashboard.mosaic import Mosaic
+from dashboard.plotting import RENDERERS, ConfusionHeatmap
+from dashboard.render import TileRenderer
+from dashboard.scrollback import Scrollback
+from dashboard.tiles import tile_labels
+from dashboard.wakeup import TkWakeup
 
 
 # --- GUI CONFIG ---
-TILE_ROWS = 4
+TILE_ROWS = 4           # any grid works in mosaic mode (8x8, 16x16, ...)
 TILE_COLS = 4
-TILE_SIZE = (128, 128)  # width, height in pixels
-REFRESH_MS = 16         # GUI refresh period (ms) -> ~60 FPS polling
+TILE_SIZE = (128, 128)  # width, height in pixels ("widgets" view)
+TILE_VIEW = "mosaic"    # "mosaic" (one composited image) or "widgets" (a Label per tile)
+MOSAIC_SIZE = (512, 512)  # whole grid in mosaic view; tiles get an equal share
+MOSAIC_OVERLAYS = True  # "pred / true" caption on each tile (if tiles are large enough)
+MOSAIC_BORDERS = True   # green/red border for correct/wrong predictions
+REFRESH_MS = 16         # polling period (ms), only if cross-thread wakeups fail
+READOUT_MS = 250        # FPS/latency readout period while data is flowing
+IDLE_CHECK_MS = 1000    # housekeeping period once no data arrives
+ACTIVE_WINDOW_S = 5.0   # keep the readout ticking this long after the last batch
+MIN_PLOT_POINTS = 200   # decimation floor while the canvas is not mapped yet
+PLOT_RENDERER = "blit"  # "blit" (redraw only the lines) or "autoscale"
+SHOW_CONFUSION = True   # confusion heatmap under the loss plot (trainers sending batch ids)
+SCROLLBACK = True       # keep past tile batches (RAM, then disk; see dashboard/scrollback.py)
+LATEST_RUN = "(latest run)"  # run selector entry that follows the newest run
+
+
+frames_displayed = metrics.counter("frames_displayed")
+gui_refresh_ms = metrics.histogram("gui_refresh_ms")
+latency_display_ms = metrics.histogram("latency_display_ms")   # decoded -> on screen
+latency_e2e_ms = metrics.histogram("latency_e2e_ms")           # trainer send -> on screen
+
+# (readout name, histogram) per latency stage shown under the info line
+LATENCY_STAGES = (
+    ("e2e", latency_e2e_ms),
+    ("transport", metrics.histogram("latency_transport_ms")),
+    ("decode", metrics.histogram("latency_decode_ms")),
+    ("display", latency_display_ms),
+)
 
 
 class DashboardGUI:
@@ -22,12 +54,65 @@ class DashboardGUI:
         self.root = root
         self.root.title("Image Classifier Dashboard")
 
-        # FPS tracking
+        # FPS tracking (rate at which new data reaches the screen)
         self.last_frame_time = None
         self.current_fps = 0.0
-
-        # Keep references to PhotoImage objects so they don't get GC'd
-        self.tile_images = [None] * (TILE_ROWS * TILE_COLS)
+        self._shown_batch = None
+        self._shown_update_time = None
+        self._info_text = None
+        self._last_e2e_ms = None        # end-to-end latency of the last shown frame
+        self._latency_text = None
+        self._latency_time = 0.0        # when the percentile line was last computed
+
+        # Rendering is event driven: ingest and the tile worker call
+        # wakeup.notify() and the Tk thread refreshes once per burst.
+        self.wakeup = TkWakeup(root, self.refresh_from_state)
+
+        # Keep references to PhotoImage objects so they don't get GC'd.
+        # They are created once; each update only pastes new pixels into them.
+        # The mosaic view has a single PhotoImage for the whole grid, so the
+        # per-frame Tk cost does not grow with the number of tiles.
+        self.mosaic = None
+        if TILE_VIEW == "mosaic":
+            self.mosaic = Mosaic(
+                TILE_ROWS, TILE_COLS, MOSAIC_SIZE,
+                overlays=MOSAIC_OVERLAYS, borders=MOSAIC_BORDERS,
+            )
+            self.tile_images = [ImageTk.PhotoImage("RGB", MOSAIC_SIZE)]
+        else:
+            self.tile_images = [
+                ImageTk.PhotoImage("RGB", TILE_SIZE) for _ in range(TILE_ROWS * TILE_COLS)
+            ]
+        self._blank_tile = Image.new("RGB", TILE_SIZE)
+
+        # Tiles are decoded and resized (and composed, in mosaic view) on a
+        # worker thread as batches arrive; the Tk thread only pastes them.
+        self.renderer = TileRenderer(
+            TILE_SIZE, TILE_ROWS * TILE_COLS, on_ready=self.wakeup.notify,
+            mosaic=self.mosaic, labels_for=self._labels_for,
+        )
+        server_mod.registry.add_listener(self._on_batch)
+
+        # Past tile batches for the scrubber; while it is off "live", new
+        # batches are kept but not rendered
+        self.scrollback = None
+        if SCROLLBACK:
+            self.scrollback = Scrollback()
+            server_mod.registry.add_listener(self.scrollback.record)
+        self._live = True
+        self._scrub_iteration = None     # iteration the scrubber points at
+        self._scrub_bounds = None        # (first, last) the scale currently spans
+        self._scrub_quiet = False        # set while the scale is moved from code
+        self._scrub_token = 0            # bumped by go_live(): late seek results are dropped
+
+        # Which run is shown; None follows the most recently updated run
+        self.selected_run = None
+        self._display_run = None    # run id whose tiles get rendered
+        self._runs = []             # DashboardStates, refreshed on registry changes
+        self._runs_version = None
+        self._overlay_lines = {}    # run_id -> Line2D of other runs when overlaying
+        self._overlay_times = {}    # run_id -> last_update_time already plotted
+        self._class_stats_version = None   # ClassStats version already shown
         # Track the last snapshot update time so we can skip expensive
         # image/plot work when nothing new arrived (standby case).
         self._last_snapshot_time = None
@@ -50,31 +135,70 @@ class DashboardGUI:
         self.info_frame.grid(row=2, column=0, padx=5, pady=5, sticky="w")
 
         self.plot_frame = ttk.Frame(main_frame)
-        self.plot_frame.grid(row=0, column=1, rowspan=3, padx=5, pady=5, sticky="nsew")
+        self.plot_frame.grid(row=0, column=1, rowspan=4, padx=5, pady=5, sticky="nsew")
 
         main_frame.columnconfigure(0, weight=0)
         main_frame.columnconfigure(1, weight=1)
         main_frame.rowconfigure(0, weight=1)
 
-        # 16 image labels
+        # image labels: one for the mosaic, or one per tile
         self.image_labels = []
-        for r in range(TILE_ROWS):
-            for c in range(TILE_COLS):
-                lbl = ttk.Label(self.image_frame)
-                lbl.grid(row=r, column=c, padx=2, pady=2)
-                self.image_labels.append(lbl)
-
-        # 16 text labels (pred / true)
         self.text_labels = []
-        for r in range(TILE_ROWS):
-            for c in range(TILE_COLS):
-                lbl = ttk.Label(self.text_frame, text="pred: ? / true: ?")
-                lbl.grid(row=r, column=c, padx=2, pady=2)
-                self.text_labels.append(lbl)
+        if self.mosaic is not None:
+            lbl = ttk.Label(self.image_frame, image=self.tile_images[0])
+            lbl.grid(row=0, column=0)
+            self.image_labels.append(lbl)
+        else:
+            for r in range(TILE_ROWS):
+                for c in range(TILE_COLS):
+                    lbl = ttk.Label(self.image_frame, image=self.tile_images[r * TILE_COLS + c])
+                    lbl.grid(row=r, column=c, padx=2, pady=2)
+                    self.image_labels.append(lbl)
+
+            # text labels (pred / true); the mosaic draws them into the image
+            for r in range(TILE_ROWS):
+                for c in range(TILE_COLS):
+                    lbl = ttk.Label(self.text_frame, text="pred: ? / true: ?")
+                    lbl.grid(row=r, column=c, padx=2, pady=2)
+                    self.text_labels.append(lbl)
+        # (pred, true) currently shown per text label; "" = placeholder text
+        self._tile_labels = [""] * len(self.text_labels)
 
         # Info label for iteration / loss / FPS / latency
         self.info_label = ttk.Label(self.info_frame, text="iter: -  loss: -  fps: -  latency: - ms")
         self.info_label.grid(row=0, column=0, sticky="w")
+        # p50/p95/p99 per latency stage (trainer send -> screen)
+        self.latency_label = ttk.Label(self.info_frame, text="latency p50/p95/p99: -")
+        self.latency_label.grid(row=1, column=0, sticky="w")
+
+        # ---- Scrubber over the scrollback ----
+        if self.scrollback is not None:
+            scrub_frame = ttk.Frame(main_frame)
+            scrub_frame.grid(row=3, column=0, padx=5, pady=5, sticky="ew")
+            scrub_frame.columnconfigure(0, weight=1)
+            self.scrub_scale = ttk.Scale(
+                scrub_frame, orient=tk.HORIZONTAL, from_=0, to=0, command=self.on_scrub
+            )
+            self.scrub_scale.grid(row=0, column=0, sticky="ew")
+            self.scrub_label = ttk.Label(scrub_frame, text="live", width=16)
+            self.scrub_label.grid(row=0, column=1, padx=5)
+            ttk.Button(scrub_frame, text="Live", command=self.go_live).grid(row=0, column=2)
+
+        # ---- Run selector ----
+        run_frame = ttk.Frame(self.plot_frame)
+        run_frame.pack(side=tk.TOP, fill=tk.X)
+        ttk.Label(run_frame, text="run:").pack(side=tk.LEFT)
+        self.run_var = tk.StringVar(value=LATEST_RUN)
+        self.run_combo = ttk.Combobox(
+            run_frame, textvariable=self.run_var, state="readonly", values=[LATEST_RUN]
+        )
+        self.run_combo.pack(side=tk.LEFT, padx=5)
+        self.run_combo.bind("<<ComboboxSelected>>", self.on_run_selected)
+        self.overlay_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            run_frame, text="overlay all runs", variable=self.overlay_var,
+            command=self.on_overlay_toggled,
+        ).pack(side=tk.LEFT)
 
         # ---- Matplotlib loss plot ----
         self.fig = Figure(figsize=(4, 3), dpi=100)
@@ -87,17 +211,242 @@ class DashboardGUI:
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
         self.canvas_widget = self.canvas.get_tk_widget()
         self.canvas_widget.pack(fill=tk.BOTH, expand=True)
+        self.plot_renderer = RENDERERS[PLOT_RENDERER](self.canvas, self.ax)
+        self.plot_renderer.add_line(self.loss_line)
+
+        # ---- Confusion heatmap (own canvas: its redraws leave the loss blit alone) ----
+        self.heatmap = None
+        if SHOW_CONFUSION:
+            self.heatmap_fig = Figure(figsize=(4, 3), dpi=100)
+            heatmap_ax = self.heatmap_fig.add_subplot(111)
+            self.heatmap_canvas = FigureCanvasTkAgg(self.heatmap_fig, master=self.plot_frame)
+            self.heatmap_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            self.heatmap = ConfusionHeatmap(self.heatmap_canvas, heatmap_ax)
+
+        # Slow timer for the readout; data-driven redraws come via wakeup
+        self.schedule_readout()
+
+    def schedule_readout(self):
+        """
+        Timer for what changes without new data: the latency/FPS readout
+        while a run is active and the run list (idle eviction). When no
+        batches arrive it drops to one cheap check per IDLE_CHECK_MS.
+        """
+        now = time.time()
+        if self.wakeup.failed:
+            self.refresh_from_state()
+            delay = REFRESH_MS
+        elif server_mod.registry.version != self._runs_version:
+            self.refresh_from_state()
+            delay = READOUT_MS
+        elif self._shown_update_time is not None and now - self._shown_update_time < ACTIVE_WINDOW_S:
+            self.update_readout(now)
+            delay = READOUT_MS
+        else:
+            self.update_readout(now)
+            delay = IDLE_CHECK_MS
+        self.root.after(delay, self.schedule_readout)
+
+    def _on_batch(self, batch, received_time):
+        # ingest thread: only decode tiles of the run that is on screen
+        if batch.images and batch.run_id == self._display_run and self._live:
+            self.renderer.submit(batch, received_time)
+        self.wakeup.notify()
+
+    def _labels_for(self, batch):
+        # tile worker thread: (pred, true) names for the mosaic captions
+        state = server_mod.registry.get(batch.run_id)
+        return tile_labels(batch, state.label_names if state is not None else ())
+
+    def on_scrub(self, value):
+        """
+        Scale moved (Tk thread): show the stored batch at or before that
+        iteration and read ahead in the direction it moves. The lookup may
+        read a spill segment, so it runs on the scrollback's thread.
+        """
+        if self._scrub_quiet or self._scrub_bounds is None:
+            return
+        iteration = int(float(value))
+        if iteration == self._scrub_iteration:
+            return
+        direction = 0
+        if self._scrub_iteration is not None:
+            direction = 1 if iteration > self._scrub_iteration else -1
+        self._scrub_iteration = iteration
+        if self._live:
+            self._live = False
+            server_mod.flow.cache_run(None)   # no live tiles reach the cache now
+        token = self._scrub_token
+        self.scrollback.seek_async(
+            self._display_run, iteration, direction,
+            lambda batch: self._on_scrub_found(batch, token),
+        )
 
-        # Start periodic refresh
-        self.schedule_refresh()
+    def _on_scrub_found(self, batch, token):
+        # scrollback thread: render it unless the GUI went live (or
+        # switched runs) meanwhile; the renderer wakes the Tk thread
+        if batch is None or token != self._scrub_token or self._live:
+            return
+        self.renderer.submit(batch, time.time())
+
+    def go_live(self):
+        self._live = True
+        self._scrub_iteration = None
+        self._scrub_token += 1
+        # the renderer caches this run's tiles again: it may omit pixels
+        server_mod.flow.cache_run(self._display_run)
+        if self.scrollback is not None:
+            self.scrub_label.config(text="live")
+            if self._scrub_bounds is not None:
+                self._move_scale(self._scrub_bounds, self._scrub_bounds[1])
+        state = server_mod.registry.get(self._display_run) if self._display_run is not None else None
+        if state is not None and state.last_tile_batch is not None:
+            self.renderer.submit(state.last_tile_batch, state.last_tile_time)
+
+    def _update_scrubber(self, run_id):
+        """
+        Stretch the scale over the run's stored iterations; live, it
+        follows the newest one.
+        """
+        bounds = self.scrollback.bounds(run_id)
+        if bounds is None or bounds == self._scrub_bounds:
+            return
+        self._scrub_bounds = bounds
+        self._move_scale(bounds, bounds[1] if self._live else self._scrub_iteration)
+
+    def _move_scale(self, bounds, value):
+        # the scale's command fires on every change, not only on drags
+        self._scrub_quiet = True
+        try:
+            self.scrub_scale.config(from_=bounds[0], to=bounds[1])
+            self.scrub_scale.set(value)
+        finally:
+            self._scrub_quiet = False
+
+    @staticmethod
+    def run_name(run_id):
+        return run_id or "(default)"
+
+    def on_run_selected(self, event=None):
+        name = self.run_var.get()
+        self.selected_run = None
+        for state in self._runs:
+            if name != LATEST_RUN and self.run_name(state.run_id) == name:
+                self.selected_run = state.run_id
+        self._last_snapshot_time = None   # force a redraw for the new run
+        self.refresh_from_state()
 
-    def schedule_refresh(self):
+    def on_overlay_toggled(self):
+        if not self.overlay_var.get():
+            self._clear_overlay()
+        self._last_snapshot_time = None
         self.refresh_from_state()
-        self.root.after(REFRESH_MS, self.schedule_refresh)
 
-    def refresh_from_state(self):
-        # FPS
-        now = time.time()
+    def _clear_overlay(self, run_ids=None):
+        for run_id in list(self._overlay_lines if run_ids is None else run_ids):
+            line = self._overlay_lines.pop(run_id, None)
+            if line is not None:
+                self.plot_renderer.remove_line(line)
+                line.remove()
+            self._overlay_times.pop(run_id, None)
+        legend = self.ax.get_legend()
+        if legend is not None and not self._overlay_lines:
+            legend.remove()
+
+    def _refresh_runs(self):
+        """
+        Re-read the run list when runs were added or evicted.
+        """
+        version = server_mod.registry.version
+        if version == self._runs_version:
+            return
+        self._runs_version = version
+        old_run_ids = {state.run_id for state in self._runs}
+        self._runs = server_mod.registry.runs()
+        run_ids = {state.run_id for state in self._runs}
+        if self.scrollback is not None:
+            for run_id in old_run_ids - run_ids:
+                self.scrollback.forget(run_id)
+        self.run_combo.config(
+            values=[LATEST_RUN] + [self.run_name(state.run_id) for state in self._runs]
+        )
+        if self.selected_run is not None and self.selected_run not in run_ids:
+            self.selected_run = None
+            self.run_var.set(LATEST_RUN)
+        self._clear_overlay([r for r in self._overlay_lines if r not in run_ids])
+
+    def _current_state(self):
+        if not self._runs:
+            return None
+        if self.selected_run is not None:
+            for state in self._runs:
+                if state.run_id == self.selected_run:
+                    return state
+        return max(self._runs, key=lambda s: s.last_update_time or s.created_time)
+
+    def _update_overlay(self, shown_run_id, plot_points):
+        """
+        Plot every other run on the same axes. Returns True if a line changed.
+        """
+        changed = False
+        added = False
+        for state in self._runs:
+            run_id = state.run_id
+            if run_id == shown_run_id:
+                self._clear_overlay([run_id])
+                continue
+            _, (iters, losses), last_time = state.get_snapshot(plot_points)
+            if last_time == self._overlay_times.get(run_id) or not len(iters):
+                continue
+            line = self._overlay_lines.get(run_id)
+            if line is None:
+                line, = self.ax.plot([], [], lw=1, alpha=0.6, label=self.run_name(run_id))
+                self._overlay_lines[run_id] = line
+                self.plot_renderer.add_line(line)
+                added = True
+            line.set_data(iters, losses)
+            self._overlay_times[run_id] = last_time
+            changed = True
+        if added:
+            self.ax.legend(fontsize="small")
+        return changed
+
+    def show_tiles(self, rendered):
+        """
+        Paste a RenderedBatch into the tile PhotoImages (Tk thread only).
+        """
+        frames_displayed.inc()
+        if rendered.mosaic is not None:
+            self.tile_images[0].paste(rendered.mosaic)
+        else:
+            self._show_tile_widgets(rendered)
+
+        displayed = time.time()
+        latency_display_ms.record(max(displayed - rendered.decoded_time, 0.0) * 1000.0)
+        send_time_ns = rendered.batch.send_time_ns
+        if send_time_ns:
+            self._last_e2e_ms = max(displayed - send_time_ns / 1e9, 0.0) * 1000.0
+            latency_e2e_ms.record(self._last_e2e_ms)
+
+    def _show_tile_widgets(self, rendered):
+        state = server_mod.registry.get(rendered.batch.run_id)
+        labels = tile_labels(rendered.batch, state.label_names if state is not None else ())
+        for i, photo in enumerate(self.tile_images):
+            if i < len(rendered.tiles):
+                photo.paste(rendered.tiles[i])
+                label = labels[i]
+            else:
+                # fewer tiles than widgets in this batch: clear the rest
+                photo.paste(self._blank_tile)
+                label = None
+            # reconfiguring a Tk label is costly: only touch the ones that changed
+            if label != self._tile_labels[i]:
+                self._tile_labels[i] = label
+                self.text_labels[i].config(
+                    text="(empty)" if label is None else f"pred: {label[0]} / true: {label[1]}"
+                )
+
+    def _count_frame(self, now):
         if self.last_frame_time is not None:
             dt = now - self.last_frame_time
             if dt > 0:
@@ -105,64 +454,121 @@ class DashboardGUI:
                 self.current_fps = 0.9 * self.current_fps + 0.1 * (1.0 / dt)
         self.last_frame_time = now
 
-        batch, history, last_update_time = server_mod.state.get_snapshot()
+    def update_readout(self, now=None):
+        """
+        Refresh the iteration/loss/FPS/latency text, touching the widget
+        only if the text actually changed.
+        """
+        batch = self._shown_batch
         if batch is None:
             return
-
-        # latency = time since last batch arrived
-        latency_ms = 0.0
-        if last_update_time is not None:
-            latency_ms = (now - last_update_time) * 1000.0
-
-        # Update info text (cheap) every frame so FPS/latency look smooth
-        self.info_label.config(
-            text=(
-                f"iter: {batch.iteration}   "
-                f"loss: {batch.loss:.4f}   "
-                f"fps: {self.current_fps:5.1f}   "
-                f"latency: {latency_ms:5.1f} ms"
-            )
+        now = time.time() if now is None else now
+
+        # age = time since last batch arrived; latency = trainer send ->
+        # on screen for the last displayed frame (needs send_time_ns)
+        age_ms = 0.0
+        if self._shown_update_time is not None:
+            age_ms = (now - self._shown_update_time) * 1000.0
+        latency = "-" if self._last_e2e_ms is None else f"{self._last_e2e_ms:5.1f}"
+
+        # without new frames the FPS decays instead of freezing
+        fps = self.current_fps
+        if self.last_frame_time is not None and now - self.last_frame_time > 1.0:
+            fps = min(fps, 1.0 / (now - self.last_frame_time))
+
+        text = (
+            f"iter: {batch.iteration}   "
+            f"loss: {batch.loss:.4f}   "
+            f"fps: {fps:5.1f}   "
+            f"latency: {latency} ms   "
+            f"age: {age_ms:5.0f} ms"
         )
+        if text != self._info_text:
+            self.info_label.config(text=text)
+            self._info_text = text
+
+        # percentiles merge per-thread histograms: at most once per READOUT_MS
+        if now - self._latency_time >= READOUT_MS / 1000.0:
+            self._latency_time = now
+            parts = []
+            for name, histogram in LATENCY_STAGES:
+                h = histogram.snapshot()
+                if h["count"]:
+                    parts.append(f"{name} {h['p50']:.1f}/{h['p95']:.1f}/{h['p99']:.1f}")
+            text = "latency p50/p95/p99 ms: " + ("   ".join(parts) if parts else "-")
+            if text != self._latency_text:
+                self.latency_label.config(text=text)
+                self._latency_text = text
 
-        # Only perform expensive image/plot updates when the snapshot changed.
-        # This avoids Image.open/resize/PhotoImage creation every frame while
-        # the app is idle, allowing the UI to poll at ~60 FPS cheaply.
-        need_update = (last_update_time != self._last_snapshot_time)
-        if need_update:
-            # Update 16 tiles
-            for i, img_msg in enumerate(batch.images):
-                if i >= TILE_ROWS * TILE_COLS:
-                    break
-
-                img = Image.open(io.BytesIO(img_msg.image_data))
-                img = img.resize(TILE_SIZE)
-                photo = ImageTk.PhotoImage(img)
-
-                self.image_labels[i].config(image=photo)
-                self.image_labels[i].image = photo     # keep reference
-
-                self.text_labels[i].config(
-                    text=f"pred: {img_msg.predicted_label} / true: {img_msg.true_label}"
-                )
+    def refresh_from_state(self):
+        """
+        Render whatever changed since the last call. Runs on the Tk thread,
+        triggered by wakeups from ingest/tile rendering (or the poll fallback).
+        """
+        with gui_refresh_ms.time():
+            self._refresh()
+
+    def _refresh(self):
+        now = time.time()
+        self._refresh_runs()
+        state = self._current_state()
+        if state is None:
+            return
+        if state.run_id != self._display_run:
+            # switched runs: show the new run's latest batch right away
+            self._display_run = state.run_id
+            self._last_snapshot_time = None
+            self.loss_line.set_label(self.run_name(state.run_id))
+            self.plot_renderer.reset()
+            self._class_stats_version = None
+            if self.heatmap is not None:
+                self.heatmap.reset()
+            server_mod.flow.focus(state.run_id)
+            self._scrub_bounds = None
+            self.go_live()
+
+        # ~one loss point per horizontal pixel, however long the run is
+        plot_points = max(self.canvas_widget.winfo_width(), MIN_PLOT_POINTS)
+        batch, history, last_update_time = state.get_snapshot(plot_points)
+        if batch is None:
+            return
 
-            # If fewer than 16, clear the rest
-            for j in range(len(batch.images), TILE_ROWS * TILE_COLS):
-                self.image_labels[j].config(image="")
-                self.image_labels[j].image = None
-                self.text_labels[j].config(text="(empty)")
+        # Tiles rendered off-thread since the last refresh (if any)
+        rendered = self.renderer.take_ready()
+        if rendered is not None and rendered.batch.run_id == self._display_run:
+            self.show_tiles(rendered)
+            if self.scrollback is not None and not self._live:
+                self.scrub_label.config(text=f"iter {rendered.batch.iteration}")
+        if self.scrollback is not None:
+            self._update_scrubber(state.run_id)
 
+        # Only redraw the plot when the snapshot changed
+        need_update = (last_update_time != self._last_snapshot_time)
+        overlay_changed = False
+        if self.overlay_var.get():
+            overlay_changed = self._update_overlay(state.run_id, plot_points)
+        if need_update or overlay_changed:
+            if need_update and last_update_time != self._shown_update_time:
+                self._count_frame(now)
             # Update loss plot
-            if history:
-                iters = [p[0] for p in history]
-                losses = [p[1] for p in history]
+            iters, losses = history
+            if len(iters):
                 self.loss_line.set_data(iters, losses)
-                self.ax.relim()
-                self.ax.autoscale_view()
-                self.canvas.draw_idle()
+                self.plot_renderer.render()
 
             # record we processed this snapshot
             self._last_snapshot_time = last_update_time
 
+        if self.heatmap is not None:
+            class_stats = state.get_class_stats(self._class_stats_version)
+            if class_stats is not None:
+                self._class_stats_version, total, window = class_stats
+                self.heatmap.update(window, state.label_names, overall=total)
+
+        self._shown_batch = batch
+        self._shown_update_time = last_update_time
+        self.update_readout(now)
+
 
 def main():
     # Start gRPC server in background
@@ -0,0 +1,206 @@
+import threading
+
+import numpy as np
+
+
+CHUNK_SIZE = 1 << 16   # points per storage chunk (multiple of FANOUT)
+FANOUT = 4             # raw points per level-1 block, blocks per next-level block
+
+
+class _Column:
+    """
+    Append-only 1-D array stored in fixed-size NumPy chunks. Appending never
+    moves existing data, so everything below size stays valid for readers
+    that copy without holding the writer's lock.
+    """
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.chunks = []
+        self.size = 0
+
+    def append(self, value):
+        offset = self.size % CHUNK_SIZE
+        if offset == 0:
+            self.chunks.append(np.empty(CHUNK_SIZE, dtype=self.dtype))
+        self.chunks[-1][offset] = value
+        self.size += 1   # publish only after the value is written
+
+    def read(self, start, stop):
+        """
+        Values [start, stop) as an array; a view if they sit in one chunk.
+        """
+        if stop <= start:
+            return np.empty(0, dtype=self.dtype)
+        first, last = start // CHUNK_SIZE, (stop - 1) // CHUNK_SIZE
+        if first == last:
+            base = first * CHUNK_SIZE
+            return self.chunks[first][start - base:stop - base]
+        parts = []
+        for k in range(first, last + 1):
+            base = k * CHUNK_SIZE
+            parts.append(self.chunks[k][max(start - base, 0):min(stop - base, CHUNK_SIZE)])
+        return np.concatenate(parts)
+
+
+class _Level:
+    """
+    One level of the summary pyramid: per block the first/last iteration,
+    the min and max of the losses it covers with the iterations they occur
+    at, and the sum of the losses.
+    """
+    def __init__(self, span):
+        self.span = span      # raw points per block
+        self.x0 = _Column(np.int64)
+        self.x1 = _Column(np.int64)
+        self.min = _Column(np.float64)
+        self.xmin = _Column(np.int64)
+        self.max = _Column(np.float64)
+        self.xmax = _Column(np.int64)
+        self.sum = _Column(np.float64)
+
+    @property
+    def size(self):
+        # sum is appended last, so its size counts complete blocks only
+        return self.sum.size
+
+    def append(self, x0, x1, lo, xlo, hi, xhi, total):
+        self.x0.append(x0)
+        self.x1.append(x1)
+        self.min.append(lo)
+        self.xmin.append(xlo)
+        self.max.append(hi)
+        self.xmax.append(xhi)
+        self.sum.append(total)
+
+
+class LossHistory:
+    """
+    Full (iteration, loss) series plus a min/max/mean pyramid over it.
+
+    Points are never discarded. Level i of the pyramid summarizes blocks of
+    FANOUT ** (i + 1) raw points and is maintained incrementally, so append()
+    is amortized O(1). snapshot(max_points) reads the finest level that fits
+    in max_points, so plotting cost depends on the canvas width and not on
+    the run length. version counts appends; snapshots are cached per
+    version.
+    """
+    def __init__(self, lock=None):
+        self.lock = lock if lock is not None else threading.Lock()
+        self.iters = _Column(np.int64)
+        self.losses = _Column(np.float64)
+        self.levels = []      # levels[i]: blocks of FANOUT ** (i + 1) points
+        self._open = []       # partially filled block per level: [x0, x1, min, xmin, max, xmax, sum, n]
+        self.version = 0
+
+        self._cache = (None, None)   # (key, snapshot), replaced as one object
+
+    def __len__(self):
+        return self.losses.size
+
+    def append(self, iteration, loss):
+        """
+        Add a point. The caller must hold self.lock.
+        """
+        loss = float(loss)
+        self.iters.append(iteration)
+        self.losses.append(loss)
+        self._fold(0, iteration, iteration, loss, iteration, loss, iteration, loss)
+        self.version += 1
+
+    def _fold(self, level, x0, x1, lo, xlo, hi, xhi, total):
+        """
+        Merge a finished block (or raw point) into the open block of level,
+        cascading upwards whenever a block fills up. Ties keep the earliest
+        extreme.
+        """
+        while True:
+            if level == len(self._open):
+                self._open.append(None)
+                self.levels.append(_Level(FANOUT ** (level + 1)))
+            acc = self._open[level]
+            if acc is None:
+                self._open[level] = [x0, x1, lo, xlo, hi, xhi, total, 1]
+                return
+            acc[1] = x1
+            if lo < acc[2]:
+                acc[2], acc[3] = lo, xlo
+            if hi > acc[4]:
+                acc[4], acc[5] = hi, xhi
+            acc[6] += total
+            acc[7] += 1
+            if acc[7] < FANOUT:
+                return
+            self._open[level] = None
+            self.levels[level].append(*acc[:7])
+            x0, x1, lo, xlo, hi, xhi, total = acc[:7]
+            level += 1
+
+    def _sizes(self):
+        """
+        Consistent (version, raw size, [level sizes]) read under the lock.
+        """
+        with self.lock:
+            return self.version, self.losses.size, [lvl.size for lvl in self.levels]
+
+    def snapshot(self, max_points=None, mode="minmax"):
+        """
+        Return read-only (iters, losses) arrays for plotting.
+
+        With max_points=None this is the full series; otherwise it is a
+        decimation to about max_points points. mode "minmax" emits each
+        block's min and max at the iterations where they occur, in
+        iteration order (spikes stay visible and the line never runs
+        backwards), "mean" one averaged point per block.
+
+        The lock is held only to read sizes; the data below those sizes is
+        immutable, so it is read without the lock.
+        """
+        version, n, sizes = self._sizes()
+        key = (version, max_points, mode)
+        cached_key, cached = self._cache
+        if key == cached_key:
+            return cached
+
+        if max_points is None or n <= max_points:
+            iters, losses = self.iters.read(0, n), self.losses.read(0, n)
+        else:
+            iters, losses = self._decimate(n, sizes, max_points, mode)
+
+        iters = iters.view()
+        losses = losses.view()
+        iters.flags.writeable = False
+        losses.flags.writeable = False
+        self._cache = (key, (iters, losses))
+        return iters, losses
+
+    def _decimate(self, n, sizes, max_points, mode):
+        per_block = 2 if mode == "minmax" else 1
+        # finest level whose complete blocks fit into max_points
+        top = len(sizes) - 1
+        for i, size in enumerate(sizes):
+            if size * per_block <= max_points:
+                top = i
+                break
+
+        xs, ys = [], []
+        covered = 0   # raw points already represented by coarser levels
+        for i in range(top, -1, -1):
+            level = self.levels[i]
+            start, stop = covered // level.span, sizes[i]
+            if stop > start:
+                if mode == "minmax":
+                    xlo, xhi = level.xmin.read(start, stop), level.xmax.read(start, stop)
+                    lo, hi = level.min.read(start, stop), level.max.read(start, stop)
+                    first = xlo <= xhi
+                    xs.append(np.column_stack((np.where(first, xlo, xhi),
+                                               np.where(first, xhi, xlo))).ravel())
+                    ys.append(np.column_stack((np.where(first, lo, hi),
+                                               np.where(first, hi, lo))).ravel())
+                else:
+                    xs.append(level.x0.read(start, stop))
+                    ys.append(level.sum.read(start, stop) / level.span)
+                covered = stop * level.span
+        # raw points not yet in any complete block
+        xs.append(self.iters.read(covered, n))
+        ys.append(self.losses.read(covered, n))
+        return np.concatenate(xs), np.concatenate(ys)
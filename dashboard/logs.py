@@ -0,0 +1,74 @@
+import logging
+import os
+import threading
+import time
+
+
+# --- CONFIG ---
+LOG_LEVEL = os.environ.get("ICDASH_LOG_LEVEL", "INFO")   # DEBUG shows per-batch lines
+LOG_INTERVAL_S = 5.0     # at most one line per key per interval on hot paths
+
+
+class _Formatter(logging.Formatter):
+    # "[server] message", like the plain prints elsewhere in the project
+    def format(self, record):
+        text = f"[{record.name.rsplit('.', 1)[-1]}] {record.getMessage()}"
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+def configure(level=LOG_LEVEL):
+    """
+    Set up the "icdash" loggers once; safe to call more than once.
+    """
+    logger = logging.getLogger("icdash")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(_Formatter())
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    return logger
+
+
+def get_logger(name):
+    return logging.getLogger(f"icdash.{name}")
+
+
+class RateLimitedLogger:
+    """
+    Wraps a logger for hot paths: each key logs at most once per interval,
+    and the level check happens before any message formatting, so a
+    suppressed call costs a dict lookup and a clock read.
+    """
+    def __init__(self, logger, interval_s=LOG_INTERVAL_S):
+        self.logger = logger
+        self.interval_s = interval_s
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def log(self, level, key, msg, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last.get(key, -self.interval_s) < self.interval_s:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last[key] = now
+            skipped = self._suppressed.pop(key, 0)
+        if skipped:
+            msg += " (+%d similar suppressed)"
+            args = args + (skipped,)
+        self.logger.log(level, msg, *args)
+
+    def debug(self, key, msg, *args):
+        self.log(logging.DEBUG, key, msg, *args)
+
+    def info(self, key, msg, *args):
+        self.log(logging.INFO, key, msg, *args)
+
+    def warning(self, key, msg, *args):
+        self.log(logging.WARNING, key, msg, *args)
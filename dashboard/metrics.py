@@ -0,0 +1,252 @@
+import math
+import threading
+import time
+import weakref
+
+
+# --- CONFIG ---
+SUB_BUCKETS = 16         # linear sub-buckets per power of two (~4% resolution)
+MIN_EXPONENT = -20       # smallest tracked magnitude ~1e-6; below counts as 0
+MAX_EXPONENT = 40        # largest tracked magnitude ~1e12; above is clamped
+NUM_BUCKETS = (MAX_EXPONENT - MIN_EXPONENT) * SUB_BUCKETS + 1
+
+
+class _PerThread:
+    """
+    Base for metrics kept in per-thread cells. The writing thread only
+    touches its own cell, so recording takes no lock; readers merge all
+    cells (a merge may miss an increment that is in flight, which is fine
+    for statistics).
+
+    When a thread exits, its cell is folded into a retired aggregate
+    (_cells[0]) and dropped, so short-lived threads (one per stream, say)
+    do not grow the cell list.
+    """
+    def __init__(self, name, unit=""):
+        self.name = name
+        self.unit = unit
+        self._local = threading.local()
+        self._cells = [self._new_cell()]      # [retired aggregate, live cells...]
+        self._cells_lock = threading.Lock()   # taken once per thread start and exit
+
+    def _new_cell(self):
+        raise NotImplementedError
+
+    def _merge(self, a, b):
+        raise NotImplementedError
+
+    def _cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+            with self._cells_lock:
+                self._cells = self._cells + [cell]
+            self._local.cell = cell
+            # the thread-local dict dies with the thread, and the marker with it
+            self._local.marker = marker = _ThreadMarker()
+            weakref.finalize(marker, self._retire, cell)
+            return cell
+
+    def _retire(self, cell):
+        # build new objects instead of mutating, so a reader merging an older
+        # cell list never counts the exited thread twice
+        with self._cells_lock:
+            retired = self._merge(self._cells[0], cell)
+            self._cells = [retired] + [c for c in self._cells[1:] if c is not cell]
+
+
+class _ThreadMarker:
+    pass
+
+
+class Counter(_PerThread):
+    """
+    Monotonic count (batches, bytes, dropped frames, ...).
+    """
+    def _new_cell(self):
+        return [0]
+
+    def _merge(self, a, b):
+        return [a[0] + b[0]]
+
+    def inc(self, n=1):
+        self._cell()[0] += n
+
+    def value(self):
+        with self._cells_lock:
+            cells = list(self._cells)
+        return sum(cell[0] for cell in cells)
+
+
+class Gauge:
+    """
+    Last reported value plus the maximum ever seen (e.g. a queue depth).
+    """
+    def __init__(self, name, unit=""):
+        self.name = name
+        self.unit = unit
+        self.current = 0
+        self.max = 0
+
+    def set(self, value):
+        self.current = value
+        if value > self.max:
+            self.max = value
+
+    def value(self):
+        return self.current
+
+
+def _bucket_index(value):
+    """
+    HDR-style log-linear bucket: power-of-two magnitude, then SUB_BUCKETS
+    linear steps inside it.
+    """
+    if value <= 0:
+        return 0
+    mantissa, exponent = math.frexp(value)   # value = mantissa * 2**exponent, mantissa in [0.5, 1)
+    if exponent <= MIN_EXPONENT:
+        return 0
+    if exponent > MAX_EXPONENT:
+        return NUM_BUCKETS - 1
+    sub = int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+    return 1 + (exponent - MIN_EXPONENT - 1) * SUB_BUCKETS + sub
+
+
+def _bucket_value(index):
+    """
+    Representative (midpoint) value of a bucket.
+    """
+    if index == 0:
+        return 0.0
+    exponent, sub = divmod(index - 1, SUB_BUCKETS)
+    exponent += MIN_EXPONENT + 1
+    mantissa = 0.5 + (sub + 0.5) / (2 * SUB_BUCKETS)
+    return math.ldexp(mantissa, exponent)
+
+
+class Histogram(_PerThread):
+    """
+    Latency/size distribution with HDR-style log-linear buckets, so
+    percentiles stay within a few percent over many orders of magnitude
+    while recording is O(1) and allocation free.
+    """
+    def _new_cell(self):
+        # [bucket counts, count, sum, min, max]
+        return [[0] * NUM_BUCKETS, 0, 0.0, math.inf, -math.inf]
+
+    def _merge(self, a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2],
+                min(a[3], b[3]), max(a[4], b[4])]
+
+    def record(self, value):
+        cell = self._cell()
+        cell[0][_bucket_index(value)] += 1
+        cell[1] += 1
+        cell[2] += value
+        if value < cell[3]:
+            cell[3] = value
+        if value > cell[4]:
+            cell[4] = value
+
+    def time(self):
+        """
+        Context manager recording the elapsed wall time in milliseconds.
+        """
+        return _Timer(self)
+
+    def snapshot(self):
+        """
+        Merge all threads: dict with count, sum, mean, min, max, p50/p95/p99.
+        """
+        with self._cells_lock:
+            cells = list(self._cells)
+        counts = [0] * NUM_BUCKETS
+        count, total, lo, hi = 0, 0.0, math.inf, -math.inf
+        for buckets, n, s, mn, mx in cells:
+            for i, c in enumerate(buckets):
+                if c:
+                    counts[i] += c
+            count += n
+            total += s
+            lo = min(lo, mn)
+            hi = max(hi, mx)
+
+        summary = {"count": count, "sum": total, "mean": 0.0, "min": 0.0, "max": 0.0,
+                   "p50": 0.0, "p95": 0.0, "p99": 0.0}
+        if count == 0:
+            return summary
+        summary.update(mean=total / count, min=lo, max=hi)
+        targets = [("p50", 0.50), ("p95", 0.95), ("p99", 0.99)]
+        seen = 0
+        for i, c in enumerate(counts):
+            if not c:
+                continue
+            seen += c
+            while targets and seen >= targets[0][1] * count:
+                key, _ = targets.pop(0)
+                # clamp the bucket midpoint into the observed range
+                summary[key] = min(max(_bucket_value(i), lo), hi)
+            if not targets:
+                break
+        return summary
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record((time.perf_counter() - self.start) * 1000.0)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms, created on first use.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def _get(self, table, cls, name, unit):
+        metric = table.get(name)
+        if metric is None:
+            with self._lock:
+                metric = table.setdefault(name, cls(name, unit))
+        return metric
+
+    def counter(self, name, unit=""):
+        return self._get(self.counters, Counter, name, unit)
+
+    def gauge(self, name, unit=""):
+        return self._get(self.gauges, Gauge, name, unit)
+
+    def histogram(self, name, unit="ms"):
+        return self._get(self.histograms, Histogram, name, unit)
+
+    def snapshot(self):
+        """
+        Plain-dict view of every metric, e.g. for GetStats or JSON output.
+        """
+        with self._lock:
+            counters = list(self.counters.values())
+            gauges = list(self.gauges.values())
+            histograms = list(self.histograms.values())
+        return {
+            "counters": {c.name: c.value() for c in counters},
+            "gauges": {g.name: g.value() for g in gauges},
+            "gauges_max": {g.name: g.max for g in gauges},
+            "histograms": {h.name: dict(h.snapshot(), unit=h.unit) for h in histograms},
+        }
+
+
+# process-wide registry used by the server, renderer and GUI
+metrics = MetricsRegistry()
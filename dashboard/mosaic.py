@@ -0,0 +1,94 @@
+import threading
+
+from PIL import Image, ImageDraw
+
+
+# --- CONFIG ---
+BORDER_PX = 3                  # correctness border width on a 128 px tile
+CORRECT_COLOR = (40, 190, 70)
+WRONG_COLOR = (220, 45, 45)
+TEXT_COLOR = (255, 255, 255)
+TEXT_BACKGROUND = (0, 0, 0)
+MIN_TEXT_TILE = 48             # no text overlay on tiles smaller than this (px)
+NUM_BUFFERS = 3                # being composed, waiting for the GUI, on screen
+
+
+class Mosaic:
+    """
+    Composes a rows x cols grid of tiles, with optional "pred / true"
+    captions and green/red correctness borders, into one RGB image of
+    the given size, so the GUI needs a single PhotoImage and a single
+    paste per frame however large the grid is.
+
+    Images come from a small pool of preallocated buffers: compose()
+    takes one, release() returns it once it is no longer shown.
+    """
+    def __init__(self, rows, cols, size, overlays=True, borders=True):
+        self.rows = rows
+        self.cols = cols
+        self.size = size
+        self.tile_size = (size[0] // cols, size[1] // rows)
+        self.max_tiles = rows * cols
+        self.overlays = overlays and min(self.tile_size) >= MIN_TEXT_TILE
+        self.borders = borders
+        self.border_px = max(1, BORDER_PX * min(self.tile_size) // 128)
+
+        self._lock = threading.Lock()
+        self._free = [Image.new("RGB", size) for _ in range(NUM_BUFFERS)]
+        self._captions = {}    # (pred, true) -> rendered caption image
+
+    def _acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return Image.new("RGB", self.size)
+
+    def release(self, image):
+        with self._lock:
+            if len(self._free) < NUM_BUFFERS:
+                self._free.append(image)
+
+    def _caption(self, pred, true):
+        """
+        "pred / true" on a black strip, cut to the tile width. Text
+        rendering is slow, so each pair is rendered once and then pasted.
+        """
+        caption = self._captions.get((pred, true))
+        if caption is None:
+            draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+            text = f"{pred} / {true}"
+            width = self.tile_size[0] - 2 * self.border_px - 1
+            while len(text) > 1 and draw.textlength(text) > width:
+                text = text[:-2] + "~"
+            left, top, right, bottom = draw.textbbox((0, 0), text)
+            caption = Image.new("RGB", (right - left + 2, bottom - top + 2), TEXT_BACKGROUND)
+            ImageDraw.Draw(caption).text((1 - left, 1 - top), text, fill=TEXT_COLOR)
+            self._captions[(pred, true)] = caption
+        return caption
+
+    def compose(self, tiles, labels=None):
+        """
+        tiles: RGB images at tile_size; labels: optional (pred, true) name
+        pairs, one per tile. Cells without a tile are cleared.
+        """
+        canvas = self._acquire()
+        draw = ImageDraw.Draw(canvas)
+        tw, th = self.tile_size
+        for i in range(self.max_tiles):
+            row, col = divmod(i, self.cols)
+            x0, y0 = col * tw, row * th
+            x1, y1 = x0 + tw - 1, y0 + th - 1
+            if i >= len(tiles):
+                draw.rectangle((x0, y0, x1, y1), fill=TEXT_BACKGROUND)
+                continue
+            canvas.paste(tiles[i], (x0, y0))
+            if labels is None or i >= len(labels):
+                continue
+            pred, true = labels[i]
+            if self.borders and pred and true:
+                color = CORRECT_COLOR if pred == true else WRONG_COLOR
+                draw.rectangle((x0, y0, x1, y1), outline=color, width=self.border_px)
+            if self.overlays:
+                caption = self._caption(pred, true)
+                canvas.paste(caption, (x0 + self.border_px, y1 + 1 - self.border_px - caption.height))
+        return canvas
@@ -0,0 +1,209 @@
+import numpy as np
+
+from dashboard.class_stats import per_class_accuracy
+
+
+# --- CONFIG ---
+X_HEADROOM = 0.25   # when x has to grow, leave this fraction of room to the right
+Y_HEADROOM = 0.10   # when y has to grow, pad by this fraction of the data range
+HEATMAP_MIN_CHANGE = 0.02   # redraw the confusion heatmap once a cell moved this much
+HEATMAP_MAX_TICKS = 20      # label rows/columns up to this many classes
+
+
+class AutoscaleRenderer:
+    """
+    The original loss plot path: relim + autoscale_view and a full
+    canvas redraw (axes, ticks, labels, title) for every update.
+    """
+    def __init__(self, canvas, ax):
+        self.canvas = canvas
+        self.ax = ax
+
+    def add_line(self, line):
+        pass
+
+    def remove_line(self, line):
+        pass
+
+    def reset(self):
+        pass
+
+    def render(self):
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
+
+
+class BlitRenderer:
+    """
+    Loss plot renderer that only redraws the line artists.
+
+    The lines are animated, so a full draw renders just the static parts
+    (axes, ticks, labels, legend); that background is cached on every
+    draw_event. render() restores the cached background, draws the lines
+    on top and blits the axes area. A full redraw happens only when the
+    data leaves the current axis limits; limits then grow with some
+    headroom so that does not repeat on every new point.
+    """
+    def __init__(self, canvas, ax):
+        self.canvas = canvas
+        self.ax = ax
+        self.lines = []
+        self.background = None
+        self.full_draws = 0
+        self.blits = 0
+        self._fresh = True       # limits not fitted to any data yet
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def add_line(self, line):
+        line.set_animated(True)
+        self.lines.append(line)
+        self.background = None   # legend may change: next render is a full draw
+
+    def remove_line(self, line):
+        if line in self.lines:
+            self.lines.remove(line)
+            self.background = None
+
+    def reset(self):
+        """
+        Forget the current limits (e.g. after switching runs).
+        """
+        self._fresh = True
+        self.background = None
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.full_draws += 1
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def _grow_limits(self):
+        """
+        Extend the axis limits to fit all line data. Returns True if they changed.
+        """
+        xs_min, xs_max, ys_min, ys_max = [], [], [], []
+        for line in self.lines:
+            x, y = line.get_data(orig=True)
+            if len(x):
+                x = np.asarray(x)
+                y = np.asarray(y)
+                xs_min.append(x.min())
+                xs_max.append(x.max())
+                ys_min.append(np.nanmin(y))
+                ys_max.append(np.nanmax(y))
+        if not xs_min:
+            return False
+        x0, x1 = min(xs_min), max(xs_max)
+        y0, y1 = min(ys_min), max(ys_max)
+
+        cur_x0, cur_x1 = self.ax.get_xlim()
+        cur_y0, cur_y1 = self.ax.get_ylim()
+        if not self._fresh:
+            # only ever grow: keep whatever the current limits already cover
+            x0, x1 = min(x0, cur_x0), max(x1, cur_x1)
+            y0, y1 = min(y0, cur_y0), max(y1, cur_y1)
+
+        changed = self._fresh
+        if self._fresh or x0 < cur_x0 or x1 > cur_x1:
+            self.ax.set_xlim(x0, x1 + max(x1 - x0, 1) * X_HEADROOM)
+            changed = True
+        if self._fresh or y0 < cur_y0 or y1 > cur_y1:
+            pad = max(y1 - y0, abs(y1) * 0.01, 1e-6) * Y_HEADROOM
+            self.ax.set_ylim(y0 - pad, y1 + pad)
+            changed = True
+        self._fresh = False
+        return changed
+
+    def render(self):
+        if self._grow_limits() or self.background is None:
+            # full draw; _on_draw re-caches the background and draws the lines
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_lines()
+        self.canvas.blit(self.ax.bbox)
+        self.blits += 1
+
+
+class ConfusionHeatmap:
+    """
+    Row-normalized confusion matrix (rows: true class) drawn with imshow on
+    its own canvas, with the per-class accuracy in the row labels.
+
+    A redraw is a full canvas draw, so update() skips it unless the matrix
+    changed noticeably: a new class count or vocabulary, or some cell's
+    share moved by at least min_change since the drawn matrix. Small
+    drifts accumulate against the drawn matrix, so they show up eventually.
+    """
+    def __init__(self, canvas, ax, title="Confusion (recent)", min_change=HEATMAP_MIN_CHANGE):
+        self.canvas = canvas
+        self.ax = ax
+        self.title = title
+        self.min_change = min_change
+        self.image = None
+        self.redraws = 0
+        self._shown = None       # normalized matrix on screen
+        self._names = None
+
+    def reset(self):
+        """
+        Clear the heatmap (e.g. after switching runs).
+        """
+        self.ax.clear()
+        self.image = None
+        self._shown = None
+        self._names = None
+        self.canvas.draw_idle()
+
+    def update(self, confusion, label_names=(), overall=None):
+        """
+        confusion: the (n, n) counts to show; overall, if given, is the
+        run-wide matrix for the accuracy in the title. Returns True if it
+        redrew.
+        """
+        n = len(confusion)
+        if not n:
+            return False
+        totals = confusion.sum(axis=1, keepdims=True)
+        norm = confusion / np.maximum(totals, 1)
+        names = tuple(label_names[i] if i < len(label_names) else str(i) for i in range(n))
+        new_layout = self._shown is None or names != self._names
+        if not new_layout and np.abs(norm - self._shown).max() < self.min_change:
+            return False
+
+        if new_layout:
+            self.ax.clear()
+            self.image = self.ax.imshow(norm, vmin=0.0, vmax=1.0, cmap="viridis",
+                                        interpolation="nearest")
+            self.ax.set_xlabel("Predicted")
+            ticks = n <= HEATMAP_MAX_TICKS
+            self.ax.set_xticks(range(n) if ticks else [])
+            self.ax.set_xticklabels(names if ticks else [], rotation=90, fontsize=7)
+            self.ax.set_yticks(range(n) if ticks else [])
+            self._names = names
+        else:
+            self.image.set_data(norm)
+        if n <= HEATMAP_MAX_TICKS:
+            accuracy = per_class_accuracy(confusion)
+            self.ax.set_yticklabels(
+                [f"{name} {'-' if np.isnan(a) else f'{a * 100:.0f}%'}" for name, a in zip(names, accuracy)],
+                fontsize=7,
+            )
+        title = f"{self.title}: {np.trace(confusion) / max(confusion.sum(), 1) * 100:.1f}%"
+        if overall is not None:
+            title += f" (run: {np.trace(overall) / max(overall.sum(), 1) * 100:.1f}%)"
+        self.ax.set_title(title, fontsize=9)
+        self._shown = norm
+        self.redraws += 1
+        self.canvas.draw_idle()
+        return True
+
+
+RENDERERS = {
+    "autoscale": AutoscaleRenderer,
+    "blit": BlitRenderer,
+}
@@ -0,0 +1,406 @@
+import collections
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+
+from dashboard import logs
+from dashboard.shm_ring import StaleSlotError, materialize
+from dashboard.tile_cache import CACHE_BYTES
+from dashboard.tiles import tile_pixels
+from proto import dashboard_pb2
+
+
+# --- CONFIG ---
+SEGMENT_MAGIC = b"ICDREC01"
+INDEX_MAGIC = b"ICDIDX02"
+RECORD_HEADER = struct.Struct("<IQ")   # payload length, received time (ns)
+INDEX_HEADER = struct.Struct("<8s")    # magic
+INDEX_ENTRY = struct.Struct("<qq")     # iteration, record offset
+INDEX_DTYPE = np.dtype([("iteration", "<i8"), ("offset", "<i8")])
+FLUSH_INTERVAL_S = 1.0
+INDEX_PIXELS_BYTES = CACHE_BYTES       # all runs: covers every tile the cached run may omit
+
+log = logs.get_logger("recorder")
+
+
+def _safe_name(run_id):
+    # the readable part alone is ambiguous ("a/b" and "a_b"): add a hash of the raw id
+    digest = hashlib.sha1(run_id.encode("utf-8")).hexdigest()[:8]
+    return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', run_id) or 'default'}-{digest}"
+
+
+def _without_tiles(batch):
+    stripped = dashboard_pb2.TrainingBatch()
+    stripped.CopyFrom(batch)
+    for name in ("encoding", "images", "tile_shape", "tile_dtype", "tile_predicted_ids",
+                 "tile_true_ids", "shm_name", "shm_slot", "shm_seq"):
+        stripped.ClearField(name)
+    return stripped
+
+
+class IndexPixels:
+    """
+    LRU of tile pixels by (run id, dataset index) (encoded bytes, or
+    (H, W, C) arrays of RAW tiles), bounded by their bytes over all runs:
+    fills in tiles the trainer sent with pixels_cached. Thread-safe.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._pixels = collections.OrderedDict()
+
+    def get(self, run_id, dataset_index):
+        key = (run_id, dataset_index)
+        with self._lock:
+            data = self._pixels.get(key)
+            if data is not None:
+                self._pixels.move_to_end(key)
+        return data
+
+    def put(self, run_id, dataset_index, data):
+        key = (run_id, dataset_index)
+        with self._lock:
+            old = self._pixels.pop(key, None)
+            if old is not None:
+                self.bytes -= _size(old)
+            self._pixels[key] = data
+            self.bytes += _size(data)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._pixels.popitem(last=False)
+                self.bytes -= _size(evicted)
+
+    def forget(self, run_id):
+        """
+        Drop every tile of run_id.
+        """
+        with self._lock:
+            for key in [key for key in self._pixels if key[0] == run_id]:
+                self.bytes -= _size(self._pixels.pop(key))
+
+
+def _size(data):
+    return data.nbytes if isinstance(data, np.ndarray) else len(data)
+
+
+def fill_omitted(batch, index_pixels, remember=True):
+    """
+    Return the batch with the tiles the trainer omitted (pixels_cached)
+    put back from index_pixels: a copy if any were filled in, else batch
+    itself. A tile stays pixels_cached if its pixels are unknown (or, for
+    RAW, have another shape than the batch's other tiles). SHM batches
+    must be materialized first.
+
+    The pixels of tiles with a dataset index are remembered for later
+    batches if remember is set (the run may omit tiles) or this batch
+    omits some; otherwise nothing is copied.
+    """
+    omitted = any(img_msg.pixels_cached for img_msg in batch.images)
+    if not (omitted or (remember and batch.images)):
+        return batch
+    pixels = tile_pixels(batch)
+    for img_msg, p in zip(batch.images, pixels):
+        if p is not None and img_msg.HasField("dataset_index"):
+            # RAW tiles are views into the batch's buffer: keep a copy
+            data = p.copy() if isinstance(p, np.ndarray) else p
+            index_pixels.put(batch.run_id, img_msg.dataset_index, data)
+    if not omitted:
+        return batch
+
+    raw = batch.encoding == dashboard_pb2.TILE_ENCODING_RAW
+    shape = next((p.shape for p in pixels if p is not None), None) if raw else None
+    filled = dashboard_pb2.TrainingBatch()
+    filled.CopyFrom(batch)
+    packed = []
+    for img_msg, p in zip(filled.images, pixels):
+        if p is None and img_msg.HasField("dataset_index"):
+            p = index_pixels.get(batch.run_id, img_msg.dataset_index)
+            if raw:
+                if not isinstance(p, np.ndarray) or (shape is not None and p.shape != shape):
+                    continue
+                shape = p.shape
+            elif isinstance(p, bytes):
+                img_msg.image_data = p
+            else:
+                continue
+            img_msg.pixels_cached = False
+        if raw and p is not None:
+            packed.append(p)
+    if raw and packed:
+        tiles = np.stack(packed)
+        filled.tile_data = tiles.tobytes()
+        del filled.tile_shape[:]
+        filled.tile_shape.extend(tiles.shape)
+        filled.tile_dtype = "uint8"
+    return filled
+
+
+class SegmentWriter:
+    """
+    Appends TrainingBatch records of one run to <name>.rec and keeps a
+    sidecar <name>.idx for lookup by iteration.
+
+    .rec: SEGMENT_MAGIC, then per record RECORD_HEADER + serialized batch.
+    .idx: INDEX_HEADER, then one INDEX_ENTRY (iteration, byte offset in
+    .rec) per record, in recording order. An iteration may have several
+    records (a tile batch and a loss flush, say); none replaces another.
+    """
+    def __init__(self, path_prefix):
+        self.rec_path = path_prefix + ".rec"
+        self.idx_path = path_prefix + ".idx"
+        self._rec = open(self.rec_path, "wb")
+        self._rec.write(SEGMENT_MAGIC)
+        self._idx = open(self.idx_path, "wb")
+        self._idx.write(INDEX_HEADER.pack(INDEX_MAGIC))
+        self._offset = len(SEGMENT_MAGIC)
+        self.records = 0
+        self.last_flush = time.monotonic()
+
+    def append(self, batch, received_time_ns):
+        return self.append_payload(batch.SerializeToString(), batch.iteration, received_time_ns)
+
+    def append_payload(self, payload, iteration, received_time_ns):
+        """
+        Append an already serialized TrainingBatch; returns its offset.
+        """
+        offset = self._offset
+        self._rec.write(RECORD_HEADER.pack(len(payload), received_time_ns))
+        self._rec.write(payload)
+        self._offset += RECORD_HEADER.size + len(payload)
+        self.records += 1
+        self._idx.write(INDEX_ENTRY.pack(iteration, offset))
+        return offset
+
+    @property
+    def bytes_written(self):
+        """
+        Size of .rec plus .idx so far.
+        """
+        return self._offset + INDEX_HEADER.size + INDEX_ENTRY.size * self.records
+
+    def flush(self):
+        self._rec.flush()
+        self._idx.flush()
+        self.last_flush = time.monotonic()
+
+    def flush_if_due(self, now):
+        if self.records and now - self.last_flush >= FLUSH_INTERVAL_S:
+            self.flush()
+
+    def close(self):
+        self.flush()
+        self._rec.close()
+        self._idx.close()
+
+
+class SessionRecorder:
+    """
+    Records every received TrainingBatch, one segment per run, into a
+    directory. Tiles the trainer sent without pixels (pixels_cached) are
+    stored with the pixels it sent earlier, so a recording replays on its
+    own; those pixels are only kept for runs that may_omit(run_id) says
+    can omit tiles (all runs if it is None), within one budget for all
+    runs, and dropped by forget(run_id) when a run is evicted. Register
+    record() as a RunRegistry listener (and forget() as an evict
+    listener); each run's
+    writer has its own lock so runs do not serialize on disk writes.
+    Writers are flushed by time each on their own clock; a record() also
+    flushes other runs' overdue writers, so a run that went quiet still
+    reaches disk.
+    """
+    def __init__(self, directory, may_omit=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self._writers = {}
+        self._locks = {}
+        self._may_omit = may_omit
+        self._index_pixels = IndexPixels(INDEX_PIXELS_BYTES)
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._closed = False
+
+    def _writer(self, run_id):
+        writer = self._writers.get(run_id)
+        if writer is None:
+            with self._lock:
+                writer = self._writers.get(run_id)
+                if writer is None:
+                    prefix = os.path.join(
+                        self.directory, f"{self.session}-{_safe_name(run_id)}"
+                    )
+                    writer = SegmentWriter(prefix)
+                    self._locks[run_id] = threading.Lock()
+                    self._writers[run_id] = writer
+                    log.info("recording run %r to %s", run_id, writer.rec_path)
+        return writer
+
+    def record(self, batch, received_time):
+        if self._closed:
+            return
+        if batch.encoding == dashboard_pb2.TILE_ENCODING_SHM:
+            # pixels in a trainer's ring are gone after the run: store them in-band
+            try:
+                batch = materialize(batch)
+            except StaleSlotError:
+                batch = _without_tiles(batch)
+        writer = self._writer(batch.run_id)
+        with self._locks[batch.run_id]:
+            if self._closed:
+                return
+            remember = self._may_omit is None or self._may_omit(batch.run_id)
+            batch = fill_omitted(batch, self._index_pixels, remember)
+            writer.append(batch, int(received_time * 1e9))
+            now = time.monotonic()
+            writer.flush_if_due(now)
+        if now - self._last_sweep >= FLUSH_INTERVAL_S:
+            self._last_sweep = now
+            self._flush_idle(batch.run_id, now)
+
+    def _flush_idle(self, busy_run_id, now):
+        """
+        Flush the overdue writers of other runs, skipping any that is
+        being written to right now (it flushes itself).
+        """
+        with self._lock:
+            others = [(run_id, w) for run_id, w in self._writers.items() if run_id != busy_run_id]
+        for run_id, writer in others:
+            lock = self._locks[run_id]
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                if not self._closed:
+                    writer.flush_if_due(now)
+            finally:
+                lock.release()
+
+    def forget(self, run_id):
+        """
+        The run was evicted: drop the pixels kept for its omitted tiles.
+        """
+        self._index_pixels.forget(run_id)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for run_id, writer in self._writers.items():
+                with self._locks[run_id]:
+                    writer.close()
+                self._index_pixels.forget(run_id)
+
+
+class RecordingReader:
+    """
+    Memory-mapped reader for a .rec segment and its .idx sidecar.
+
+    offsets_for(iteration) is a binary search over the index (sorted by
+    iteration on first use); batches are parsed straight from the mapping.
+    Only data present when the reader was opened is visible.
+    """
+    def __init__(self, path):
+        prefix = path[:-4] if path.endswith((".rec", ".idx")) else path
+        self.rec_path = prefix + ".rec"
+        self.idx_path = prefix + ".idx"
+
+        self._rec_file = open(self.rec_path, "rb")
+        self._rec = mmap.mmap(self._rec_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._rec[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+            raise ValueError(f"{self.rec_path} is not a TrainingBatch recording")
+        self.size = len(self._rec)
+
+        self.entries = np.empty(0, dtype=INDEX_DTYPE)
+        self._sorted = None      # (iterations, offsets) sorted by iteration, built lazily
+        if os.path.exists(self.idx_path) and os.path.getsize(self.idx_path) >= INDEX_HEADER.size:
+            with open(self.idx_path, "rb") as f:
+                magic, = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"{self.idx_path} is not a recording index")
+            count = (os.path.getsize(self.idx_path) - INDEX_HEADER.size) // INDEX_ENTRY.size
+            if count:
+                self.entries = np.memmap(
+                    self.idx_path, dtype=INDEX_DTYPE, mode="r",
+                    offset=INDEX_HEADER.size, shape=(count,),
+                )
+
+    def close(self):
+        self.entries = None
+        self._sorted = None
+        self._rec.close()
+        self._rec_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def offsets_for(self, iteration):
+        """
+        Byte offsets of every record for iteration, in recording order
+        (empty if it was not recorded).
+        """
+        if self._sorted is None:
+            # stable, so records of one iteration keep their recording order
+            order = np.argsort(self.entries["iteration"], kind="stable")
+            self._sorted = (self.entries["iteration"][order], self.entries["offset"][order])
+        iterations, offsets = self._sorted
+        lo, hi = np.searchsorted(iterations, [iteration, iteration + 1])
+        return [int(o) for o in offsets[lo:hi] if o < self.size]
+
+    def offset_for(self, iteration):
+        """
+        Byte offset of the first record for iteration, or None if not recorded.
+        """
+        offsets = self.offsets_for(iteration)
+        return offsets[0] if offsets else None
+
+    def read_at(self, offset):
+        """
+        Parse the record at offset: (batch, received_time_ns, next_offset),
+        or None past the last complete record.
+        """
+        end = offset + RECORD_HEADER.size
+        if end > self.size:
+            return None
+        length, received_ns = RECORD_HEADER.unpack_from(self._rec, offset)
+        if end + length > self.size:
+            return None   # record still being written when we opened the file
+        batch = dashboard_pb2.TrainingBatch.FromString(self._rec[end:end + length])
+        return batch, received_ns, end + length
+
+    def get(self, iteration):
+        """
+        Every batch recorded for iteration, in recording order.
+        """
+        batches = []
+        for offset in self.offsets_for(iteration):
+            record = self.read_at(offset)
+            if record is not None:
+                batches.append(record[0])
+        return batches
+
+    def records(self, start_iteration=None):
+        """
+        Yield (batch, received_time_ns) in recording order, optionally
+        starting at the record of start_iteration.
+        """
+        offset = len(SEGMENT_MAGIC)
+        if start_iteration is not None:
+            offset = self.offset_for(start_iteration)
+            if offset is None:
+                raise KeyError(f"iteration {start_iteration} is not in {self.rec_path}")
+        while True:
+            record = self.read_at(offset)
+            if record is None:
+                return
+            batch, received_ns, offset = record
+            yield batch, received_ns
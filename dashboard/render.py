@@ -0,0 +1,215 @@
+import threading
+import time
+from concurrent import futures
+
+from PIL import Image
+
+from dashboard import logs
+from dashboard.metrics import metrics
+from dashboard.shm_ring import StaleSlotError, check_slot
+from dashboard.tile_cache import content_key, index_key, tile_cache
+from dashboard.tiles import decode_tile, tile_pixels
+from proto import dashboard_pb2
+
+
+log = logs.get_logger("render")
+
+decode_ms = metrics.histogram("decode_ms")
+latency_decode_ms = metrics.histogram("latency_decode_ms")   # received -> decoded
+frames_dropped = metrics.counter("frames_dropped")
+render_queue_depth = metrics.gauge("render_queue_depth")
+
+
+class RenderedBatch:
+    """
+    A batch whose tiles are already decoded, resized and converted to RGB,
+    so the Tk thread only has to paste them into its PhotoImages.
+    """
+    def __init__(self, batch, tiles, received_time, decoded_time, mosaic=None):
+        self.batch = batch
+        self.tiles = tiles                  # list of RGB PIL images at tile_size
+        self.mosaic = mosaic                # composed grid image (mosaic mode)
+        self.received_time = received_time  # time.time() when ingest got it
+        self.decoded_time = decoded_time    # time.time() when tiles were ready
+
+
+class TileRenderer:
+    """
+    Worker stage between the gRPC ingest threads and the Tk thread.
+
+    submit() is called for every incoming batch and only keeps the newest
+    one; the worker thread decodes/resizes it, and take_ready() hands the
+    finished result to the GUI. Batches that get superseded before the
+    worker (or the GUI) reached them are dropped and counted. on_ready, if
+    given, is called from the worker thread whenever a result is ready.
+
+    With a Mosaic, the worker also composes the tiles into one grid image
+    (captions from labels_for(batch), if given). That image stays valid
+    until the next take_ready() call, when its buffer is recycled.
+
+    Finished tiles go into a TileCache (pass cache=None to disable), so a
+    tile seen before is neither decoded nor resized again; tiles whose
+    pixels the trainer omitted can only come from there (black if not).
+    """
+    def __init__(self, tile_size, max_tiles, workers=4, on_ready=None,
+                 mosaic=None, labels_for=None, cache=tile_cache):
+        if mosaic is not None:
+            tile_size, max_tiles = mosaic.tile_size, mosaic.max_tiles
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.on_ready = on_ready
+        self.mosaic = mosaic
+        self.labels_for = labels_for
+        self.cache = cache
+        self._blank = Image.new("RGB", tile_size)
+
+        self._cond = threading.Condition()
+        self._pending = None     # (batch, received_time) waiting for the worker
+        self._ready = None       # RenderedBatch waiting for the GUI
+        self._taken = None       # RenderedBatch the GUI took last (on screen)
+        self._stopped = False
+
+        self.rendered = 0
+        self.dropped = 0         # superseded before render or before display
+
+        # PIL releases the GIL while decoding/resizing, so tiles of one batch
+        # can be processed in parallel.
+        self._pool = futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="tile-render"
+        ) if workers > 1 else None
+
+        self._thread = threading.Thread(
+            target=self._run, name="tile-renderer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, batch, received_time):
+        """
+        Queue a batch for rendering, replacing any batch still waiting.
+        Safe to call from any thread (used as a DashboardState listener).
+        """
+        with self._cond:
+            if self._pending is not None:
+                self.dropped += 1
+                frames_dropped.inc()
+            self._pending = (batch, received_time)
+            self._update_depth()
+            self._cond.notify()
+
+    def take_ready(self):
+        """
+        Return the newest RenderedBatch not yet taken, or None.
+        """
+        with self._cond:
+            ready, self._ready = self._ready, None
+            if ready is not None:
+                # the GUI has pasted the previous one by now
+                self._recycle(self._taken)
+                self._taken = ready
+            self._update_depth()
+        return ready
+
+    def _recycle(self, rendered):
+        if rendered is not None and rendered.mosaic is not None:
+            self.mosaic.release(rendered.mosaic)
+
+    def _update_depth(self):
+        # batches waiting for the worker or for the GUI; caller holds _cond
+        render_queue_depth.set((self._pending is not None) + (self._ready is not None))
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(1.0)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def _prepare_tile(self, img):
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != self.tile_size:
+            img = img.resize(self.tile_size)
+        return img
+
+    def _cache_key(self, batch, i, pixels):
+        if i < len(batch.images) and batch.images[i].HasField("dataset_index"):
+            return index_key(batch.run_id, batch.images[i].dataset_index)
+        if pixels is None:
+            return None
+        return content_key(pixels)
+
+    def _cached(self, key):
+        tile = self.cache.get(key) if key is not None else None
+        if tile is not None and tile.size != self.tile_size:
+            tile = tile.resize(self.tile_size)    # cached by a renderer with other tiles
+        return tile
+
+    def _render(self, batch, received_time):
+        start = time.perf_counter()
+        pixels = tile_pixels(batch)[:self.max_tiles]
+        tiles = [None] * len(pixels)
+        keys = [None] * len(pixels)
+        misses = []
+        for i, p in enumerate(pixels):
+            if self.cache is not None:
+                keys[i] = self._cache_key(batch, i, p)
+                tiles[i] = self._cached(keys[i])
+            if tiles[i] is None:
+                if p is None:
+                    tiles[i] = self._blank   # omitted, and no longer cached
+                else:
+                    misses.append(i)
+
+        decoded = [decode_tile(pixels[i]) for i in misses]
+        if self._pool is not None and len(decoded) > 1:
+            prepared = list(self._pool.map(self._prepare_tile, decoded))
+        else:
+            prepared = [self._prepare_tile(img) for img in decoded]
+        # tiles that needed no resize still point into the batch (or, for
+        # SHM, into the ring slot); cached ones must own their pixels
+        prepared = [t.copy() if t is d else t for t, d in zip(prepared, decoded)]
+        if batch.encoding == dashboard_pb2.TILE_ENCODING_SHM:
+            check_slot(batch)   # the trainer may have reused the slot meanwhile
+        for i, tile in zip(misses, prepared):
+            tiles[i] = tile
+            if keys[i] is not None:
+                self.cache.put(keys[i], tile)
+        mosaic = None
+        if self.mosaic is not None:
+            labels = self.labels_for(batch) if self.labels_for is not None else None
+            mosaic = self.mosaic.compose(tiles, labels)
+        decode_ms.record((time.perf_counter() - start) * 1000.0)
+        decoded_time = time.time()
+        latency_decode_ms.record(max(decoded_time - received_time, 0.0) * 1000.0)
+        return RenderedBatch(batch, tiles, received_time, decoded_time, mosaic)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                batch, received_time = self._pending
+                self._pending = None
+                self._update_depth()
+
+            try:
+                rendered = self._render(batch, received_time)
+            except StaleSlotError:
+                continue        # counted in shm_stale; the next batch has fresh tiles
+            except Exception as e:  # a bad batch must not kill the worker
+                log.warning("could not render batch iter=%d: %s", batch.iteration, e)
+                continue
+
+            with self._cond:
+                if self._ready is not None:
+                    self.dropped += 1   # GUI never displayed the previous one
+                    frames_dropped.inc()
+                    self._recycle(self._ready)
+                self._ready = rendered
+                self.rendered += 1
+                self._update_depth()
+            if self.on_ready is not None:
+                self.on_ready()
@@ -0,0 +1,80 @@
+#Streams a recorded session back into a dashboard as a repeatable load source.
+#  python -m dashboard.replay recordings/<session>-<run>.rec [--speed 1|N|max]
+import argparse
+import time
+
+import grpc
+
+from dashboard.recorder import SEGMENT_MAGIC, RecordingReader
+from proto import dashboard_pb2_grpc
+
+
+def replay_batches(reader, speed, start_iteration=None, run_id=None, loop=False):
+    """
+    Yield recorded batches paced by their original receive times divided
+    by speed (speed <= 0 means as fast as possible). send_time_ns is
+    re-stamped so the dashboard's latency numbers stay meaningful.
+    """
+    # the label vocabulary rides on the first recorded batch; resend it
+    # when starting later in the recording
+    label_names = ()
+    if start_iteration is not None:
+        first = reader.read_at(len(SEGMENT_MAGIC))
+        if first is not None:
+            label_names = first[0].label_names
+    while True:
+        first_ns = None
+        start = time.perf_counter()
+        for batch, received_ns in reader.records(start_iteration):
+            if speed > 0:
+                if first_ns is None:
+                    first_ns = received_ns
+                due = (received_ns - first_ns) / 1e9 / speed
+                delay = due - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            if label_names and not batch.label_names:
+                batch.label_names.extend(label_names)
+                label_names = ()
+            if run_id is not None:
+                batch.run_id = run_id
+            batch.send_time_ns = time.time_ns()
+            yield batch
+        if not loop:
+            return
+
+
+def parse_speed(text):
+    return 0.0 if text == "max" else float(text.rstrip("x"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded TrainingBatch stream")
+    parser.add_argument("recording", help="path to a .rec file (its .idx must sit next to it)")
+    parser.add_argument("--addr", default="localhost:50051")
+    parser.add_argument("--speed", default="1", help='1 for real time, N for N times faster, or "max"')
+    parser.add_argument("--start-iteration", type=int, default=None)
+    parser.add_argument("--run-id", default=None, help="override the recorded run_id")
+    parser.add_argument("--loop", action="store_true", help="start over at the end")
+    args = parser.parse_args()
+
+    speed = parse_speed(args.speed)
+    stub = dashboard_pb2_grpc.DashboardServiceStub(grpc.insecure_channel(args.addr))
+    with RecordingReader(args.recording) as reader:
+        sent = 0
+        start = time.perf_counter()
+
+        def counted():
+            nonlocal sent
+            for batch in replay_batches(reader, speed, args.start_iteration, args.run_id, args.loop):
+                sent += 1
+                yield batch
+
+        ack = stub.StreamTraining(counted())
+        elapsed = time.perf_counter() - start
+        print(f"[replay] sent {sent} batches in {elapsed:.2f}s "
+              f"({sent / max(elapsed, 1e-9):.1f} batches/s): {ack.message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,588 @@
+#Bounded per-run scrollback of tile batches for the GUI's time scrubber.
+#Every tile batch is compacted on a worker thread (pixels as PNG, losses and
+#batch ids dropped) and kept serialized in RAM. Once a run's RAM budget is
+#used, the oldest batches spill to segment files in the recorder's format
+#(.rec/.idx, so dashboard.replay can read them) in a scratch directory, and
+#the oldest segments are deleted once the disk budget is used. Both budgets
+#cover all runs together (the oldest batches go first, whichever run they
+#belong to), so RAM and disk stay bounded however long and however many the
+#runs are: scrolling back far enough runs out of history, not out of memory.
+import atexit
+import bisect
+import collections
+import io
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from dashboard import logs
+from dashboard.metrics import metrics
+from dashboard.recorder import IndexPixels, RecordingReader, SegmentWriter, _safe_name
+from dashboard.shm_ring import StaleSlotError, materialize
+from dashboard.tiles import tile_pixels
+from proto import dashboard_pb2
+
+
+# --- CONFIG ---
+RAM_BYTES = int(os.environ.get("ICDASH_SCROLLBACK_RAM_MB", "64")) * 2**20      # all runs
+DISK_BYTES = int(os.environ.get("ICDASH_SCROLLBACK_DISK_MB", "1024")) * 2**20  # all runs
+SEGMENT_BYTES = 64 * 2**20       # spill file size before starting the next one
+MIN_SEGMENTS = 32                # segments are smaller if fewer fit the disk budget
+INDEX_PIXELS_BYTES = 16 * 2**20  # per run: tile PNGs by dataset index, for omitted pixels
+PNG_COMPRESS_LEVEL = 3           # RAW/SHM tiles are re-encoded at this zlib level
+COMPACT_QUEUE_SIZE = 64          # tile batches waiting for compaction before some are skipped
+PREFETCH_BATCHES = 8             # stored batches read ahead in the scrub direction
+PREFETCH_CACHE = 64              # parsed batches kept from read-ahead
+
+log = logs.get_logger("scrollback")
+
+scrollback_batches = metrics.counter("scrollback_batches")
+scrollback_skipped = metrics.counter("scrollback_skipped")   # compaction fell behind
+scrollback_ram_bytes = metrics.gauge("scrollback_ram_bytes")
+scrollback_disk_bytes = metrics.gauge("scrollback_disk_bytes")
+scrollback_seek_ms = metrics.histogram("scrollback_seek_ms")
+
+
+def _png(pixels):
+    if pixels.shape[2] == 1:
+        pixels = pixels[:, :, 0]
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return buf.getvalue()
+
+
+def compact_batch(batch, index_pixels=None):
+    """
+    Copy of a tile batch with only what the scrubber shows: iteration,
+    loss, the tiles and their labels. Every tile carries its pixels in
+    image_data, PNG for RAW/SHM, as sent for PNG/JPEG; omitted pixels come
+    from index_pixels if it has them (else the tile stays pixels_cached).
+    SHM batches must be materialized first.
+    """
+    compact = dashboard_pb2.TrainingBatch()
+    compact.run_id = batch.run_id
+    compact.iteration = batch.iteration
+    compact.loss = batch.loss
+    compact.encoding = batch.encoding
+    if batch.encoding not in (dashboard_pb2.TILE_ENCODING_PNG, dashboard_pb2.TILE_ENCODING_JPEG):
+        compact.encoding = dashboard_pb2.TILE_ENCODING_PNG
+    compact.tile_true_ids.extend(batch.tile_true_ids)
+    compact.tile_predicted_ids.extend(batch.tile_predicted_ids)
+    for i, pixels in enumerate(tile_pixels(batch)):
+        img_msg = compact.images.add()
+        if i < len(batch.images):
+            img_msg.CopyFrom(batch.images[i])
+        else:
+            img_msg.id = i       # packed tiles without TrainingImages
+        index = img_msg.dataset_index if img_msg.HasField("dataset_index") else None
+        if pixels is None:
+            data = None
+            if index is not None and index_pixels is not None:
+                data = index_pixels.get(batch.run_id, index)
+        else:
+            data = _png(pixels) if isinstance(pixels, np.ndarray) else pixels
+            if index is not None and index_pixels is not None:
+                index_pixels.put(batch.run_id, index, data)
+        img_msg.pixels_cached = data is None
+        img_msg.image_data = data or b""
+    return compact
+
+
+class _Segment:
+    """
+    One spill file: a SegmentWriter while it is the newest, plus the
+    iteration and offset of each record for lookups. Reads take only the
+    segment's own lock, so they do not hold up the history; sealing and
+    deleting wait for a read in progress.
+    """
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.writer = SegmentWriter(prefix)
+        self.iterations = []
+        self.offsets = []
+        self.bytes = 0
+        self.first_ns = None     # received time of its oldest batch
+        self.reader = None
+        self.deleted = False
+        self._lock = threading.Lock()
+
+    def append(self, iteration, received_ns, payload):
+        if self.first_ns is None:
+            self.first_ns = received_ns
+        self.offsets.append(self.writer.append_payload(payload, iteration, received_ns))
+        self.iterations.append(iteration)
+        self.bytes = self.writer.bytes_written
+
+    def seal(self):
+        with self._lock:
+            self.writer.close()
+            self.writer = None
+        self.iterations = np.array(self.iterations, dtype=np.int64)
+        self.offsets = np.array(self.offsets, dtype=np.int64)
+
+    def read(self, offset):
+        """
+        The batch at offset (parsed), or None if the segment was deleted.
+        """
+        with self._lock:
+            if self.deleted:
+                return None
+            if self.reader is None or offset >= self.reader.size:
+                # the newest segment grows: remap it to see the record
+                if self.writer is not None:
+                    self.writer.flush()
+                if self.reader is not None:
+                    self.reader.close()
+                self.reader = RecordingReader(self.prefix + ".rec")
+            return self.reader.read_at(offset)[0]
+
+    def delete(self):
+        with self._lock:
+            self.deleted = True
+            if self.writer is not None:
+                self.writer.close()
+            if self.reader is not None:
+                self.reader.close()
+        for path in (self.prefix + ".rec", self.prefix + ".idx"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class TileHistory:
+    """
+    Scrollback of one run: compacted tile batches by iteration, the newest
+    in RAM (serialized), older ones in spill segments, oldest dropped.
+    Thread-safe; lookups find the stored batch at or before an iteration.
+    If the iterations go backwards (the trainer restarted under the same
+    run id), the history starts over.
+
+    The budgets are not its own: Scrollback decides, across all runs,
+    when to spill_oldest() and drop_oldest_segment().
+    """
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.index_pixels = IndexPixels(INDEX_PIXELS_BYTES)
+        self._lock = threading.Lock()
+        self._ram = collections.deque()        # (iteration, received_ns, payload), oldest first
+        self._ram_iterations = collections.deque()
+        self._segments = collections.deque()   # oldest first; only the last one is open
+        self._next_segment = 0
+        self.ram_bytes = 0
+        self.disk_bytes = 0
+        self.generation = 0    # bumped when the history starts over
+        self.dropped = 0       # batches that fell off the end of the disk budget
+
+    def add(self, compact, received_ns):
+        payload = compact.SerializeToString()
+        with self._lock:
+            if self._ram_iterations and compact.iteration < self._ram_iterations[-1]:
+                self._clear()
+            self._ram.append((compact.iteration, received_ns, payload))
+            self._ram_iterations.append(compact.iteration)
+            self.ram_bytes += len(payload)
+
+    def oldest_ram_ns(self):
+        """
+        Received time of the oldest batch in RAM, or None.
+        """
+        with self._lock:
+            return self._ram[0][1] if self._ram else None
+
+    def oldest_disk_ns(self):
+        """
+        Received time of the oldest batch on disk, or None.
+        """
+        with self._lock:
+            return self._segments[0].first_ns if self._segments else None
+
+    def spill_oldest(self, to_disk=True):
+        """
+        Move the oldest RAM batch to the newest segment (or drop it).
+        """
+        with self._lock:
+            if not self._ram:
+                return
+            iteration, received_ns, payload = self._ram.popleft()
+            self._ram_iterations.popleft()
+            self.ram_bytes -= len(payload)
+            if not to_disk:
+                self.dropped += 1
+                return
+            segment = self._segments[-1] if self._segments else None
+            if segment is None or segment.writer is None:
+                segment = _Segment(os.path.join(self.directory, f"scrollback-{self._next_segment:06d}"))
+                self._next_segment += 1
+                self._segments.append(segment)
+            before = segment.bytes
+            segment.append(iteration, received_ns, payload)
+            if segment.bytes >= self.segment_bytes:
+                segment.seal()
+            self.disk_bytes += segment.bytes - before
+
+    def drop_oldest_segment(self):
+        """
+        Delete the oldest segment (even the one being written, so that
+        many runs cannot each keep one over the budget).
+        """
+        with self._lock:
+            if not self._segments:
+                return
+            oldest = self._segments.popleft()
+            self.disk_bytes -= oldest.bytes
+            self.dropped += len(oldest.iterations)
+            oldest.delete()
+
+    def _clear(self):
+        for segment in self._segments:
+            segment.delete()
+        self._segments.clear()
+        self._ram.clear()
+        self._ram_iterations.clear()
+        self.ram_bytes = 0
+        self.disk_bytes = 0
+        self.generation += 1
+
+    def _blocks(self):
+        # oldest first: each segment, then RAM; (iterations, block) pairs
+        return [(s.iterations, s) for s in self._segments] + [(self._ram_iterations, None)]
+
+    def _locate(self, iteration):
+        """
+        (blocks, block number, position) of the batch at or before
+        iteration (the oldest one if iteration is older), or None.
+        """
+        blocks = [b for b in self._blocks() if len(b[0])]
+        if not blocks:
+            return None
+        for n in range(len(blocks) - 1, -1, -1):
+            iterations = blocks[n][0]
+            if iterations[0] <= iteration or n == 0:
+                return blocks, n, max(bisect.bisect_right(iterations, iteration) - 1, 0)
+
+    def bounds(self):
+        """
+        (first, last) stored iteration, or None if nothing is stored.
+        """
+        with self._lock:
+            blocks = [iterations for iterations, _ in self._blocks() if len(iterations)]
+            if not blocks:
+                return None
+            return int(blocks[0][0]), int(blocks[-1][-1])
+
+    def nearest(self, iteration):
+        """
+        The stored iteration at or before iteration, or None.
+        """
+        with self._lock:
+            located = self._locate(iteration)
+            if located is None:
+                return None
+            blocks, n, pos = located
+            return int(blocks[n][0][pos])
+
+    def neighbors(self, iteration, direction, count):
+        """
+        Stored iterations of the next count batches after (direction > 0)
+        or before (direction < 0) the one at or before iteration.
+        """
+        with self._lock:
+            located = self._locate(iteration)
+            if located is None:
+                return []
+            blocks, n, pos = located
+            step = 1 if direction > 0 else -1
+            found = []
+            while len(found) < count:
+                pos += step
+                if pos < 0:
+                    n -= 1
+                    if n < 0:
+                        break
+                    pos = len(blocks[n][0]) - 1
+                elif pos >= len(blocks[n][0]):
+                    n += 1
+                    if n >= len(blocks):
+                        break
+                    pos = 0
+                found.append(int(blocks[n][0][pos]))
+            return found
+
+    def get(self, iteration):
+        """
+        The stored batch at or before iteration (parsed), or None. Only
+        the lookup holds the lock; the disk read and parsing do not, so
+        bounds() and friends on the Tk thread never wait for the disk.
+        """
+        with self._lock:
+            located = self._locate(iteration)
+            if located is None:
+                return None
+            blocks, n, pos = located
+            segment = blocks[n][1]
+            if segment is None:
+                payload = self._ram[pos][2]
+            else:
+                offset = int(segment.offsets[pos])
+        if segment is None:
+            return dashboard_pb2.TrainingBatch.FromString(payload)
+        return segment.read(offset)
+
+    def close(self):
+        with self._lock:
+            self._clear()
+
+
+def _oldest(histories, received_ns):
+    """
+    The history whose received_ns(history) is earliest, or None.
+    """
+    best = best_ns = None
+    for history in histories:
+        ns = received_ns(history)
+        if ns is not None and (best_ns is None or ns < best_ns):
+            best, best_ns = history, ns
+    return best
+
+
+class Scrollback:
+    """
+    Tile history of every run. Register record() as a RunRegistry
+    listener: it only queues tile batches (materializing SHM tiles while
+    they still exist); a worker thread compacts them into each run's
+    TileHistory. ram_bytes and disk_bytes bound all runs together: over
+    budget, the oldest batches of any run spill (RAM) or are deleted
+    (disk) first.
+
+    seek() serves the GUI's scrubber, and a prefetch thread reads the next
+    batches in the scrub direction ahead of it; seek_async() runs the seek
+    itself on that thread too, for callers that must not wait on disk.
+    """
+    def __init__(self, directory=None, ram_bytes=RAM_BYTES, disk_bytes=DISK_BYTES,
+                 segment_bytes=SEGMENT_BYTES):
+        self._owns_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix="icdash-scrollback-")
+        self.ram_budget = ram_bytes
+        self.disk_budget = disk_bytes
+        # whole segments are deleted: keep them small against the budget
+        self.segment_bytes = max(min(segment_bytes, disk_bytes // MIN_SEGMENTS), 2**20)
+        self._histories = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._queue = queue.Queue(maxsize=COMPACT_QUEUE_SIZE)
+        self._compact_thread = threading.Thread(
+            target=self._compact_loop, name="scrollback-compact", daemon=True
+        )
+        self._compact_thread.start()
+
+        self._prefetch_cond = threading.Condition()
+        self._prefetch_request = None   # (run_id, generation, iterations)
+        self._seek_request = None       # (run_id, iteration, direction, on_found)
+        self._prefetched = collections.OrderedDict()   # (run_id, generation, iteration) -> batch
+        self._prefetch_thread = threading.Thread(
+            target=self._prefetch_loop, name="scrollback-prefetch", daemon=True
+        )
+        self._prefetch_thread.start()
+        atexit.register(self.close)
+
+    def record(self, batch, received_time):
+        if self._closed or not batch.images:
+            return
+        if batch.encoding == dashboard_pb2.TILE_ENCODING_SHM:
+            try:
+                batch = materialize(batch)
+            except StaleSlotError:
+                return
+        try:
+            self._queue.put_nowait((batch, received_time))
+        except queue.Full:
+            scrollback_skipped.inc()
+
+    def history(self, run_id):
+        with self._lock:
+            return self._histories.get(run_id)
+
+    def _history_for(self, run_id):
+        with self._lock:
+            history = self._histories.get(run_id)
+            if history is None:
+                directory = os.path.join(
+                    self.directory, f"{len(self._histories):04d}-{_safe_name(run_id)}"
+                )
+                history = TileHistory(directory, self.segment_bytes)
+                self._histories[run_id] = history
+            return history
+
+    def _compact_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, received_time = item
+            try:
+                self.add(batch, received_time)
+            except Exception as e:   # a bad batch must not stop the history
+                log.warning("could not keep batch iter=%d: %s", batch.iteration, e)
+
+    def add(self, batch, received_time):
+        """
+        Compact and store a tile batch now, on the calling thread (what the
+        worker does with the batches record() queues).
+        """
+        history = self._history_for(batch.run_id)
+        history.add(compact_batch(batch, history.index_pixels), int(received_time * 1e9))
+        scrollback_batches.inc()
+        self._enforce_budgets()
+
+    def _histories_list(self):
+        with self._lock:
+            return list(self._histories.values())
+
+    @property
+    def ram_used(self):
+        return sum(h.ram_bytes for h in self._histories_list())
+
+    @property
+    def disk_used(self):
+        return sum(h.disk_bytes for h in self._histories_list())
+
+    def _enforce_budgets(self):
+        """
+        Spill, then delete, the oldest stored batches of any run until all
+        runs together fit ram_budget and disk_budget.
+        """
+        histories = self._histories_list()
+        while sum(h.ram_bytes for h in histories) > self.ram_budget:
+            oldest = _oldest(histories, TileHistory.oldest_ram_ns)
+            if oldest is None:
+                break
+            oldest.spill_oldest(to_disk=self.disk_budget > 0)
+        while sum(h.disk_bytes for h in histories) > self.disk_budget:
+            oldest = _oldest(histories, TileHistory.oldest_disk_ns)
+            if oldest is None:
+                break
+            oldest.drop_oldest_segment()
+        self._update_gauges(histories)
+
+    def _update_gauges(self, histories=None):
+        histories = self._histories_list() if histories is None else histories
+        scrollback_ram_bytes.set(sum(h.ram_bytes for h in histories))
+        scrollback_disk_bytes.set(sum(h.disk_bytes for h in histories))
+
+    def bounds(self, run_id):
+        history = self.history(run_id)
+        return None if history is None else history.bounds()
+
+    def seek(self, run_id, iteration, direction=0):
+        """
+        The run's stored batch at or before iteration, or None. With
+        direction +1/-1 (the way the scrubber moves), the next
+        PREFETCH_BATCHES batches that way are read in the background.
+        """
+        start = time.perf_counter()
+        history = self.history(run_id)
+        if history is None:
+            return None
+        stored = history.nearest(iteration)
+        if stored is None:
+            return None
+        generation = history.generation
+        with self._prefetch_cond:
+            batch = self._prefetched.get((run_id, generation, stored))
+        if batch is None:
+            batch = history.get(stored)
+        if direction:
+            ahead = history.neighbors(stored, direction, PREFETCH_BATCHES)
+            with self._prefetch_cond:
+                self._prefetch_request = (run_id, generation, ahead)
+                self._prefetch_cond.notify()
+        scrollback_seek_ms.record((time.perf_counter() - start) * 1000.0)
+        return batch
+
+    def seek_async(self, run_id, iteration, direction, on_found):
+        """
+        seek() on the prefetch thread, so the caller (the GUI's Tk thread)
+        never waits for a spill segment to be read: on_found(batch) is
+        called from that thread with the result. A request that has not
+        started yet is replaced by a newer one.
+        """
+        with self._prefetch_cond:
+            self._seek_request = (run_id, iteration, direction, on_found)
+            self._prefetch_cond.notify()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._prefetch_cond:
+                while (self._seek_request is None and self._prefetch_request is None
+                       and not self._closed):
+                    self._prefetch_cond.wait()
+                if self._closed:
+                    return
+                seek, self._seek_request = self._seek_request, None
+                if seek is None:
+                    run_id, generation, ahead = self._prefetch_request
+                    self._prefetch_request = None
+            if seek is not None:
+                run_id, iteration, direction, on_found = seek
+                try:
+                    batch = self.seek(run_id, iteration, direction)   # queues the read-ahead
+                except Exception as e:
+                    log.warning("could not seek to iter=%d: %s", iteration, e)
+                    continue
+                on_found(batch)
+                continue
+            history = self.history(run_id)
+            for iteration in ahead:
+                key = (run_id, generation, iteration)
+                with self._prefetch_cond:
+                    if self._prefetch_request is not None or self._seek_request is not None:
+                        break      # the scrubber moved on: follow it instead
+                    if key in self._prefetched:
+                        self._prefetched.move_to_end(key)
+                        continue
+                if history is None or history.generation != generation:
+                    break
+                try:
+                    batch = history.get(iteration)
+                except Exception as e:
+                    log.warning("could not prefetch iter=%d: %s", iteration, e)
+                    break
+                with self._prefetch_cond:
+                    self._prefetched[key] = batch
+                    while len(self._prefetched) > PREFETCH_CACHE:
+                        self._prefetched.popitem(last=False)
+
+    def forget(self, run_id):
+        """
+        Drop a run's history (e.g. once the registry evicted the run).
+        """
+        with self._lock:
+            history = self._histories.pop(run_id, None)
+        if history is not None:
+            history.close()
+            self._update_gauges()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        with self._prefetch_cond:
+            self._prefetch_cond.notify_all()
+        self._compact_thread.join(1.0)
+        with self._lock:
+            histories, self._histories = list(self._histories.values()), {}
+        for history in histories:
+            history.close()
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -1,85 +1,443 @@
 from concurrent import futures
+import asyncio
+import atexit
+import os
 import time
 import threading
 
 import grpc
 from proto import dashboard_pb2, dashboard_pb2_grpc
+from dashboard import logs
+from dashboard.flow import FlowPolicy
+from dashboard.metrics import metrics
+from dashboard.recorder import SessionRecorder
+from dashboard.shm_ring import can_read
+from dashboard.state import RunRegistry
+from dashboard.tile_cache import index_key, tile_cache
+from dashboard.tiles import SUPPORTED_ENCODINGS
 
 
-class DashboardState:
+# --- CONFIG ---
+PORT = 50051
+EVICT_CHECK_S = 60        # how often idle runs are looked for
+RECORD_DIR = os.environ.get("ICDASH_RECORD_DIR")  # record all batches here if set
+SERVER_MODE = os.environ.get("ICDASH_SERVER_MODE", "threads")  # "threads" or "aio"
+THREAD_WORKERS = 10       # threads mode: at most this many streams at once
+AIO_MAX_RPCS = 1000       # aio mode: further calls are rejected, not queued
+
+# one DashboardState per training run (TrainingBatch.run_id)
+registry = RunRegistry()
+# tile rates requested from StreamTelemetry trainers; the GUI focuses it
+flow = FlowPolicy(tile_cache_entries=tile_cache.expected_entries())
+
+log = logs.get_logger("server")
+hot_log = logs.RateLimitedLogger(log)
+
+# ingest metrics, readable through GetStats
+batches_received = metrics.counter("batches_received")
+batches_rejected = metrics.counter("batches_rejected")   # malformed, skipped
+bytes_received = metrics.counter("bytes_received", "bytes")
+ingest_ms = metrics.histogram("ingest_ms")
+batch_bytes = metrics.histogram("batch_bytes", "bytes")
+active_streams = metrics.gauge("active_streams")
+
+# end-to-end latency stages (trainer clock vs dashboard clock: only
+# meaningful when both run on the same host or have synced clocks)
+latency_transport_ms = metrics.histogram("latency_transport_ms")
+trainer_step_ms = metrics.histogram("trainer_step_ms")
+trainer_encode_ms = metrics.histogram("trainer_encode_ms")
+
+
+def stats_to_proto(snapshot):
     """
-    Shared state where we keep the most recent batch and loss history.
-    The GUI will read from here.
+    Convert MetricsRegistry.snapshot() into a Stats message.
     """
-    def __init__(self, max_points=500):
-        self.lock = threading.Lock()
-        self.last_batch = None
-        self.loss_history = []        # list of (iteration, loss)
-        self.last_update_time = None  # when we last received a batch (time.time())
-        self.max_points = max_points
-
-    def update(self, batch):
-        now = time.time()
-        with self.lock:
-            self.last_batch = batch
-            self.last_update_time = now
-            self.loss_history.append((batch.iteration, batch.loss))
-            # keep only the last N points
-            if len(self.loss_history) > self.max_points:
-                self.loss_history = self.loss_history[-self.max_points:]
-
-    def get_snapshot(self):
+    stats = dashboard_pb2.Stats(timestamp_ms=int(time.time() * 1000))
+    stats.counters.update(snapshot["counters"])
+    stats.gauges.update(snapshot["gauges"])
+    stats.gauges_max.update(snapshot["gauges_max"])
+    for name, h in sorted(snapshot["histograms"].items()):
+        stats.histograms.add(
+            name=name, unit=h["unit"], count=h["count"], mean=h["mean"],
+            min=h["min"], max=h["max"], p50=h["p50"], p95=h["p95"], p99=h["p99"],
+        )
+    return stats
+
+
+class DashboardServiceImpl(dashboard_pb2_grpc.DashboardServiceServicer):
+    def __init__(self):
+        self._streams_lock = threading.Lock()
+        self._streams = 0
+        # bidi streams ingest on a pool thread: the server runs at most
+        # THREAD_WORKERS streams, so one is always free, and reconnects reuse
+        # threads instead of starting (and leaving metric cells behind) new ones
+        self._ingest_pool = futures.ThreadPoolExecutor(
+            max_workers=THREAD_WORKERS, thread_name_prefix="grpc-ingest-bidi"
+        )
+
+    def _track_stream(self, delta):
+        with self._streams_lock:
+            self._streams += delta
+            active_streams.set(self._streams)
+
+    def _ingest(self, batch, state):
         """
-        Return a copy of the current state for the GUI: (batch, history, last_time).
+        Apply one received batch; returns the DashboardState of its run.
+        The state is looked up again only when a stream switches runs.
+        A malformed batch (ValueError from the state) is logged, counted
+        and skipped; the stream goes on with the next one.
         """
-        with self.lock:
-            batch = self.last_batch
-            history = list(self.loss_history)
-            last_time = self.last_update_time
-        return batch, history, last_time
+        start = time.perf_counter()
+        if batch.send_time_ns:
+            latency_transport_ms.record(
+                max(time.time_ns() - batch.send_time_ns, 0) / 1e6
+            )
+        if batch.step_time_ms:
+            trainer_step_ms.record(batch.step_time_ms)
+        if batch.encode_time_ms:
+            trainer_encode_ms.record(batch.encode_time_ms)
+        if state is None or batch.run_id != state.run_id:
+            if state is not None:
+                state.detach_stream()
+            state = registry.get_or_create(batch.run_id)
+            state.attach_stream()
+        try:
+            state.update(batch)
+        except ValueError as e:
+            batches_rejected.inc()
+            hot_log.warning(
+                "rejected", "run=%s: skipped malformed batch iter=%d: %s",
+                batch.run_id or "-", batch.iteration, e,
+            )
+            return state
 
+        size = batch.ByteSize()
+        batches_received.inc()
+        bytes_received.inc(size)
+        batch_bytes.record(size)
+        ingest_ms.record((time.perf_counter() - start) * 1000.0)
+        # no per-batch I/O on the hot path: one line per interval at DEBUG
+        hot_log.debug(
+            "batch", "run=%s batch iter=%d, images=%d, loss=%.4f",
+            batch.run_id or "-", batch.iteration, len(batch.images), batch.loss,
+        )
+        return state
 
-state = DashboardState()
+    def _missing_tiles(self, batch):
+        """
+        Dataset indices whose pixels the trainer omitted although they are
+        not (or no longer) in the tile cache: asked for again in FlowControl.
+        """
+        return [
+            img_msg.dataset_index for img_msg in batch.images
+            if img_msg.pixels_cached
+            and index_key(batch.run_id, img_msg.dataset_index) not in tile_cache
+        ]
 
+    def _flow_message(self, control, resend):
+        if not resend:
+            return control
+        message = dashboard_pb2.FlowControl()
+        message.CopyFrom(control)
+        message.resend_dataset_indices.extend(resend)
+        return message
+
+    def _end_stream(self, state):
+        self._track_stream(-1)
+        if state is not None:
+            state.detach_stream()
+        return dashboard_pb2.Ack(ok=True, message="stream ended on server")
+
+    def _pong(self, request):
+        log.debug("Ping received, timestamp=%d", request.timestamp_ms)
+        return dashboard_pb2.Ack(
+            ok=True,
+            message="pong from dashboard server",
+            supported_encodings=SUPPORTED_ENCODINGS,
+            # the trainer only uses SHM if we can map its ring
+            shm_readable=bool(request.shm_probe) and can_read(request.shm_probe),
+        )
 
-class DashboardServiceImpl(dashboard_pb2_grpc.DashboardServiceServicer):
     def StreamTraining(self, request_iterator, context):
         """
         Receives a stream of TrainingBatch messages from the training client.
+        Batches go to the state of their run_id.
         """
-        for batch in request_iterator:
-            state.update(batch)
-            print(
-                f"[server] batch iter={batch.iteration}, "
-                f"images={len(batch.images)}, loss={batch.loss:.4f}"
-            )
+        state = None
+        self._track_stream(+1)
+        try:
+            for batch in request_iterator:
+                state = self._ingest(batch, state)
+        finally:
+            ack = self._end_stream(state)
+        return ack
 
-        return dashboard_pb2.Ack(ok=True, message="stream ended on server")
+    def StreamTelemetry(self, request_iterator, context):
+        """
+        Bidi version of StreamTraining: batches are ingested on an ingest
+        pool thread while this generator sends the run's FlowControl, first
+        once the run is known and then whenever the flow policy changes or
+        omitted tiles turn out not to be cached. If ingest fails, the call
+        is aborted with INTERNAL rather than ending as OK.
+        """
+        wake = threading.Event()
+        current = [None]         # state of the run this stream feeds
+        done = threading.Event()
+        failure = [None]         # unexpected ingest error, reported to the client
+        resend = []              # dataset indices to ask for again
+        resend_lock = threading.Lock()
+
+        def consume():
+            state = None
+            try:
+                for batch in request_iterator:
+                    previous = state
+                    state = self._ingest(batch, state)
+                    current[0] = state
+                    missing = self._missing_tiles(batch)
+                    if missing:
+                        with resend_lock:
+                            resend.extend(missing)
+                    if state is not previous or missing:
+                        wake.set()
+            except grpc.RpcError:
+                pass             # client went away; the stream just ends
+            except Exception as e:
+                log.exception("ingest failed on run %r", state.run_id if state else "-")
+                failure[0] = e
+            finally:
+                self._end_stream(state)
+                done.set()
+                wake.set()
+
+        self._track_stream(+1)
+        flow.subscribe(wake.set)
+        self._ingest_pool.submit(consume)
+        try:
+            sent = None
+            while True:
+                wake.wait()
+                wake.clear()
+                if done.is_set():
+                    if failure[0] is not None:
+                        context.abort(grpc.StatusCode.INTERNAL, f"ingest failed: {failure[0]!r}")
+                    return
+                if current[0] is not None:
+                    control = flow.for_run(current[0].run_id)
+                    with resend_lock:
+                        missing = resend[:]
+                        del resend[:]
+                    if control != sent or missing:
+                        sent = control
+                        yield self._flow_message(control, missing)
+        finally:
+            flow.unsubscribe(wake.set)
 
     def Ping(self, request, context):
         """
-        Simple ping RPC to test connectivity.
+        Simple ping RPC to test connectivity. The Ack also advertises which
+        tile encodings this dashboard can display.
         """
-        print(f"[server] Ping received, timestamp={request.timestamp_ms}")
-        return dashboard_pb2.Ack(ok=True, message="pong from dashboard server")
+        return self._pong(request)
 
+    def GetStats(self, request, context):
+        """
+        Counters, gauges and latency/size histograms of this dashboard.
+        """
+        return stats_to_proto(metrics.snapshot())
 
-def _make_server():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+
+class AioDashboardServiceImpl(DashboardServiceImpl):
+    """
+    Same service for grpc.aio: every stream is a coroutine on one event
+    loop thread instead of a pool thread, so open streams cost no thread
+    and all state updates (and the listeners feeding the GUI) run on that
+    single thread. gRPC flow control keeps at most one window of unread
+    messages buffered per stream.
+    """
+    async def StreamTraining(self, request_iterator, context):
+        state = None
+        self._track_stream(+1)
+        try:
+            async for batch in request_iterator:
+                state = self._ingest(batch, state)
+        finally:
+            ack = self._end_stream(state)
+        return ack
+
+    async def StreamTelemetry(self, request_iterator, context):
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        current = [None]
+        resend = []
+
+        def on_flow_change():
+            # called from the GUI thread
+            loop.call_soon_threadsafe(wake.set)
+
+        async def consume():
+            state = None
+            try:
+                async for batch in request_iterator:
+                    previous = state
+                    state = self._ingest(batch, state)
+                    current[0] = state
+                    missing = self._missing_tiles(batch)
+                    resend.extend(missing)
+                    if state is not previous or missing:
+                        wake.set()
+            finally:
+                self._end_stream(state)
+                wake.set()
+
+        self._track_stream(+1)
+        flow.subscribe(on_flow_change)
+        task = asyncio.ensure_future(consume())
+        try:
+            sent = None
+            while True:
+                await wake.wait()
+                wake.clear()
+                if task.done():
+                    error = task.exception()
+                    if error is not None:
+                        log.error("ingest failed on run %r", current[0].run_id if current[0] else "-",
+                                  exc_info=error)
+                        await context.abort(grpc.StatusCode.INTERNAL, f"ingest failed: {error!r}")
+                    return
+                if current[0] is not None:
+                    control = flow.for_run(current[0].run_id)
+                    missing = resend[:]
+                    del resend[:]
+                    if control != sent or missing:
+                        sent = control
+                        yield self._flow_message(control, missing)
+        finally:
+            flow.unsubscribe(on_flow_change)
+            if task.done():
+                if not task.cancelled():
+                    task.exception()   # retrieved, even if the call ended first
+            else:
+                task.cancel()
+
+    async def Ping(self, request, context):
+        return self._pong(request)
+
+    async def GetStats(self, request, context):
+        return stats_to_proto(metrics.snapshot())
+
+
+def _make_server(port=PORT):
+    logs.configure()
+    # named threads, so profilers/benchmarks can attribute CPU to ingest
+    server = grpc.server(futures.ThreadPoolExecutor(
+        max_workers=THREAD_WORKERS, thread_name_prefix="grpc-ingest"
+    ))
     dashboard_pb2_grpc.add_DashboardServiceServicer_to_server(
         DashboardServiceImpl(), server
     )
-    server.add_insecure_port("[::]:50051")
+    server.add_insecure_port(f"[::]:{port}")
     return server
 
 
-def serve():
+class AioServerThread:
     """
-    Blocking version: run only the gRPC server (no GUI).
+    Runs a grpc.aio server on its own event loop thread. start() and
+    stop(grace) mirror grpc.Server, so callers do not care which mode runs.
     """
-    server = _make_server()
+    def __init__(self, port=PORT):
+        self.port = port
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._error = None
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="grpc-aio", daemon=True)
+
+    async def _start(self):
+        self._server = grpc.aio.server(maximum_concurrent_rpcs=AIO_MAX_RPCS)
+        dashboard_pb2_grpc.add_DashboardServiceServicer_to_server(
+            AioDashboardServiceImpl(), self._server
+        )
+        self._server.add_insecure_port(f"[::]:{self.port}")
+        await self._server.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start())
+        except Exception as e:
+            self._error = e
+            return
+        finally:
+            self._started.set()
+        self._loop.run_forever()
+
+    def start(self):
+        logs.configure()
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self, grace=None):
+        if self._server is None or not self._loop.is_running():
+            return
+        done = asyncio.run_coroutine_threadsafe(self._server.stop(grace), self._loop)
+        done.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def _start_server(port, mode):
+    if mode == "aio":
+        server = AioServerThread(port)
+    elif mode == "threads":
+        server = _make_server(port)
+    else:
+        raise ValueError(f"unknown server mode {mode!r}, expected 'threads' or 'aio'")
     server.start()
-    print("[server] Dashboard server listening on port 50051")
+    return server
+
+
+def _start_evictor():
+    """
+    Daemon thread that periodically forgets runs that went idle.
+    """
+    def evict_loop():
+        while True:
+            time.sleep(EVICT_CHECK_S)
+            registry.evict_idle()
+
+    t = threading.Thread(target=evict_loop, name="run-evictor", daemon=True)
+    t.start()
+    return t
+
+
+def start_recording(directory):
+    """
+    Persist every received batch (one segment per run) under directory.
+    Replay with: python -m dashboard.replay <file>.rec
+    """
+    recorder = SessionRecorder(directory, may_omit=flow.may_omit)
+    registry.add_listener(recorder.record)
+    registry.add_evict_listener(recorder.forget)
+    # a recording should have every run's tiles, not just the one on screen
+    flow.set_rates(background_image_rate=flow.image_rate)
+    atexit.register(recorder.close)
+    print(f"[server] Recording batches to {directory}")
+    return recorder
+
+
+def serve(record_dir=RECORD_DIR, port=PORT, mode=SERVER_MODE):
+    """
+    Blocking version: run only the gRPC server (no GUI).
+    mode is "threads" (one pool thread per stream) or "aio" (event loop).
+    """
+    server = _start_server(port, mode)
+    _start_evictor()
+    if record_dir:
+        start_recording(record_dir)
+    print(f"[server] Dashboard server listening on port {port} ({mode})")
 
     try:
         while True:
@@ -89,14 +447,16 @@ def serve():
         server.stop(0)
 
 
-def start_server_in_thread():
+def start_server_in_thread(record_dir=RECORD_DIR, port=PORT, mode=SERVER_MODE):
     """
     Non-blocking version: start gRPC server in a background thread.
-    Used by the GUI.
+    Used by the GUI. mode is "threads" or "aio", as for serve().
     """
-    server = _make_server()
-    server.start()
-    print("[server] Dashboard server listening on port 50051 (background)")
+    server = _start_server(port, mode)
+    _start_evictor()
+    if record_dir:
+        start_recording(record_dir)
+    print(f"[server] Dashboard server listening on port {port} ({mode}, background)")
 
     def keep_alive():
         try:
@@ -0,0 +1,115 @@
+#Dashboard side of the shared-memory tile ring (TILE_ENCODING_SHM).
+#The ring layout and the trainer's writer live in training.shm_ring; this
+#module maps trainers' segments (a few at a time), checks slots before and
+#after their pixels are used, answers the SHM probe of a trainer's Ping and
+#copies tiles in-band for the recorder.
+import atexit
+import threading
+
+from dashboard import logs
+from dashboard.metrics import metrics
+from proto import dashboard_pb2
+from training.shm_ring import ShmTileReader, StaleSlotError
+
+
+# --- CONFIG ---
+MAX_OPEN_RINGS = 8                     # segments kept mapped
+
+shm_stale = metrics.counter("shm_stale")   # tile batches whose slot was reused first
+
+log = logs.get_logger("shm")
+
+
+_readers = {}
+_evicted = []     # readers whose close() waits for tile views still in use
+_readers_lock = threading.Lock()
+
+
+def _reader(name):
+    with _readers_lock:
+        reader = _readers.get(name)
+        if reader is None:
+            _evicted[:] = [r for r in _evicted if not r.close()]
+            if len(_readers) >= MAX_OPEN_RINGS:
+                # oldest first
+                evicted = _readers.pop(next(iter(_readers)))
+                if not evicted.close():
+                    _evicted.append(evicted)
+            try:
+                reader = ShmTileReader(name)
+            except FileNotFoundError:
+                raise StaleSlotError(f"no shared memory segment {name!r} on this host") from None
+            except OSError as e:   # e.g. another user's segment
+                raise StaleSlotError(f"cannot map shared memory segment {name!r}: {e}") from None
+            _readers[name] = reader
+        return reader
+
+
+def _close_all():
+    with _readers_lock:
+        for reader in list(_readers.values()) + _evicted:
+            reader.close(detach=True)
+        _readers.clear()
+        del _evicted[:]
+
+
+atexit.register(_close_all)
+
+
+def can_read(name):
+    """
+    Answer a trainer's Heartbeat.shm_probe: True if this process can map
+    the ring (it then stays mapped for the batches to come).
+    """
+    try:
+        _reader(name)
+    except (StaleSlotError, ValueError) as e:
+        log.info("trainer ring not readable here, it will send tiles in-band: %s", e)
+        return False
+    return True
+
+
+def shm_tiles_array(batch):
+    """
+    Zero-copy (N, H, W, C) uint8 view of an SHM batch's tiles. Only valid
+    while check_slot(batch) passes: check again after using it.
+    """
+    if batch.tile_dtype not in ("", "uint8"):
+        raise ValueError(f"unsupported shm tile dtype {batch.tile_dtype!r}")
+    shape = tuple(batch.tile_shape)
+    if len(shape) != 4:
+        raise ValueError(f"shm tile_shape must be [N, H, W, C], got {list(shape)}")
+    reader = _reader(batch.shm_name)
+    check_slot(batch, reader)
+    return reader.slot_view(batch.shm_slot, shape)
+
+
+def check_slot(batch, reader=None):
+    """
+    Raise StaleSlotError if the batch's slot has been reused.
+    """
+    reader = reader or _reader(batch.shm_name)
+    seqs = reader.seqs   # None once the reader was evicted
+    if seqs is None or not 0 <= batch.shm_slot < reader.num_slots or seqs[batch.shm_slot] != batch.shm_seq:
+        shm_stale.inc()
+        raise StaleSlotError(
+            f"slot {batch.shm_slot} of {batch.shm_name!r} no longer holds seq {batch.shm_seq}"
+        )
+
+
+def materialize(batch):
+    """
+    Copy of an SHM batch with its tiles moved in-band as RAW (for the
+    recorder: a recording must not point into a ring). Raises
+    StaleSlotError if the tiles are already gone.
+    """
+    pixels = shm_tiles_array(batch).tobytes()
+    check_slot(batch)
+    copy = dashboard_pb2.TrainingBatch()
+    copy.CopyFrom(batch)
+    copy.encoding = dashboard_pb2.TILE_ENCODING_RAW
+    copy.tile_data = pixels
+    copy.ClearField("shm_name")
+    copy.ClearField("shm_slot")
+    copy.ClearField("shm_seq")
+    return copy
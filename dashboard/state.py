@@ -0,0 +1,195 @@
+import itertools
+import threading
+import time
+
+from dashboard.class_stats import ClassStats, batch_class_ids
+from dashboard.history import LossHistory
+
+
+# --- CONFIG ---
+DEFAULT_RUN_ID = ""       # run id of trainers that do not set one
+NUM_STRIPES = 16          # registry lock stripes
+IDLE_EVICT_S = 15 * 60    # forget runs without traffic for this long
+
+
+class DashboardState:
+    """
+    Shared state where we keep the most recent batch and loss history of
+    one training run. The GUI will read from here.
+    """
+    def __init__(self, run_id=DEFAULT_RUN_ID, listeners=None):
+        self.run_id = run_id
+        self.lock = threading.Lock()
+        self.last_batch = None
+        self.last_tile_batch = None   # newest batch that carried tiles
+        self.last_tile_time = None
+        self.loss_history = LossHistory(self.lock)  # full series + min/max pyramid
+        self.last_update_time = None  # when we last received a batch (time.time())
+        self.created_time = time.time()
+        self.active_streams = 0       # open StreamTraining calls feeding this run
+        self.label_names = ()         # class vocabulary sent by the trainer
+        self.class_stats = ClassStats()   # confusion matrix from the full-batch ids
+        # callables(batch, received_time); shared with the registry so
+        # listeners added there also see runs created later
+        self.listeners = listeners if listeners is not None else []
+
+    def add_listener(self, callback):
+        """
+        Register callback(batch, received_time), called from the ingest
+        thread after every update (outside the lock). Used by the GUI to
+        start decoding tiles as soon as a batch arrives.
+        """
+        self.listeners.append(callback)
+
+    def update(self, batch):
+        """
+        Apply a batch. Raises ValueError, before changing anything, if its
+        class ids do not fit the run's vocabulary.
+        """
+        now = time.time()
+        with self.lock:
+            label_names = tuple(batch.label_names) or self.label_names
+            class_ids = batch_class_ids(batch, len(label_names))
+            self.last_batch = batch
+            self.last_update_time = now
+            if batch.images:
+                # loss-only batches (flow control) must not blank the tiles
+                self.last_tile_batch = batch
+                self.last_tile_time = now
+            self.label_names = label_names
+            # amortized O(1); the whole run is kept, nothing is trimmed
+            if batch.loss_iterations:
+                for iteration, loss in zip(batch.loss_iterations, batch.losses):
+                    self.loss_history.append(iteration, loss)
+            elif batch.losses:
+                first = batch.iteration - len(batch.losses) + 1
+                for i, loss in enumerate(batch.losses):
+                    self.loss_history.append(first + i, loss)
+            elif not batch.tiles_only:
+                self.loss_history.append(batch.iteration, batch.loss)
+            if class_ids is not None:
+                self.class_stats.update(batch.iteration, *class_ids, len(self.label_names))
+        for callback in self.listeners:
+            callback(batch, now)
+
+    def get_snapshot(self, plot_points=None):
+        """
+        Return the current state for the GUI: (batch, history, last_time),
+        where history is a pair of read-only (iters, losses) NumPy arrays.
+        With plot_points set, the history is min/max decimated to about that
+        many points (e.g. the plot width in pixels). The lock is only held
+        to read references and sizes; the history is read outside of it,
+        and only rebuilt when it changed since the last snapshot.
+        """
+        with self.lock:
+            batch = self.last_batch
+            last_time = self.last_update_time
+        history = self.loss_history.snapshot(plot_points)
+        return batch, history, last_time
+
+    def get_class_stats(self, since_version=None):
+        """
+        (version, total, window) confusion matrices (see ClassStats), or
+        None if nothing changed since since_version.
+        """
+        with self.lock:
+            if self.class_stats.version == since_version:
+                return None
+            return self.class_stats.snapshot()
+
+    def attach_stream(self):
+        with self.lock:
+            self.active_streams += 1
+
+    def detach_stream(self):
+        with self.lock:
+            self.active_streams -= 1
+
+    def idle_seconds(self, now=None):
+        now = time.time() if now is None else now
+        last = self.last_update_time or self.created_time
+        return now - last
+
+
+class RunRegistry:
+    """
+    Per-run DashboardStates keyed by TrainingBatch.run_id.
+
+    The run table is split into NUM_STRIPES shards, each behind its own
+    lock, so streams of different runs do not serialize on one registry
+    lock; once a stream has its run's state it only takes that state's
+    lock. Runs without an open stream that stayed idle for idle_evict_s
+    are dropped by evict_idle().
+    """
+    def __init__(self, num_stripes=NUM_STRIPES, idle_evict_s=IDLE_EVICT_S):
+        self.idle_evict_s = idle_evict_s
+        self._locks = [threading.Lock() for _ in range(num_stripes)]
+        self._shards = [{} for _ in range(num_stripes)]
+        self.listeners = []   # shared by every run's DashboardState
+        self.evict_listeners = []
+        self._versions = itertools.count(1)
+        self.version = 0      # bumped whenever a run is added or evicted
+
+    def _stripe(self, run_id):
+        return hash(run_id) % len(self._shards)
+
+    def add_listener(self, callback):
+        """
+        Register callback(batch, received_time) for batches of every run,
+        including runs created later. batch.run_id tells them apart.
+        """
+        self.listeners.append(callback)
+
+    def add_evict_listener(self, callback):
+        """
+        Register callback(run_id), called for every run evict_idle() drops.
+        """
+        self.evict_listeners.append(callback)
+
+    def get(self, run_id):
+        k = self._stripe(run_id)
+        with self._locks[k]:
+            return self._shards[k].get(run_id)
+
+    def get_or_create(self, run_id):
+        k = self._stripe(run_id)
+        with self._locks[k]:
+            state = self._shards[k].get(run_id)
+            if state is None:
+                state = DashboardState(run_id, self.listeners)
+                self._shards[k][run_id] = state
+                self.version = next(self._versions)
+                print(f"[server] new run {run_id or '(default)'!r}")
+        return state
+
+    def runs(self):
+        """
+        All current states, most recently updated first.
+        """
+        states = []
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                states.extend(shard.values())
+        states.sort(key=lambda s: s.last_update_time or s.created_time, reverse=True)
+        return states
+
+    def evict_idle(self, now=None):
+        """
+        Drop runs that have no open stream and were idle too long.
+        Returns the evicted run ids.
+        """
+        now = time.time() if now is None else now
+        evicted = []
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                for run_id, state in list(shard.items()):
+                    if state.active_streams == 0 and state.idle_seconds(now) > self.idle_evict_s:
+                        del shard[run_id]
+                        evicted.append(run_id)
+        if evicted:
+            self.version = next(self._versions)
+            print(f"[server] evicted idle runs: {evicted}")
+        for run_id in evicted:
+            for callback in self.evict_listeners:
+                callback(run_id)
+        return evicted
@@ -0,0 +1,45 @@
+#Prints the metrics of a running dashboard via the GetStats RPC.
+#  python -m dashboard.stats [--addr localhost:50051] [--watch 2]
+import argparse
+import time
+
+import grpc
+
+from proto import dashboard_pb2, dashboard_pb2_grpc
+
+
+def format_stats(stats):
+    lines = []
+    for name in sorted(stats.counters):
+        lines.append(f"  {name:<24} {stats.counters[name]:>14,.0f}")
+    for name in sorted(stats.gauges):
+        lines.append(
+            f"  {name:<24} {stats.gauges[name]:>14,.0f}  (max {stats.gauges_max[name]:,.0f})"
+        )
+    for h in stats.histograms:
+        lines.append(
+            f"  {h.name:<24} n={h.count:<8} mean={h.mean:9.3f}  p50={h.p50:9.3f}  "
+            f"p95={h.p95:9.3f}  p99={h.p99:9.3f}  max={h.max:9.3f} {h.unit}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print dashboard metrics")
+    parser.add_argument("--addr", default="localhost:50051")
+    parser.add_argument("--watch", type=float, default=0.0,
+                        help="repeat every N seconds (0 = print once)")
+    args = parser.parse_args()
+
+    stub = dashboard_pb2_grpc.DashboardServiceStub(grpc.insecure_channel(args.addr))
+    while True:
+        stats = stub.GetStats(dashboard_pb2.Empty())
+        print(f"[stats] {time.strftime('%H:%M:%S')}")
+        print(format_stats(stats))
+        if args.watch <= 0:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#Decoded-tile cache for the renderer.
+#Tiles that come back (CIFAR-10 has 50k training images, sampled 16 at a
+#time) are decoded and resized once: the renderer keeps the finished RGB
+#tile under the trainer's TrainingImage.dataset_index (per run) or, without
+#one, under a hash of the tile's bytes. Trainers on StreamTelemetry can then
+#omit the pixels of tiles the dashboard still has (pixels_cached); a miss on
+#such a tile is reported back in FlowControl.resend_dataset_indices.
+import collections
+import hashlib
+import os
+import threading
+
+from dashboard.metrics import metrics
+
+
+# --- CONFIG ---
+CACHE_BYTES = int(os.environ.get("ICDASH_TILE_CACHE_MB", "256")) * 2**20
+EXPECTED_TILE_BYTES = 128 * 128 * 3    # an RGB tile at the GUI's tile size
+
+cache_hits = metrics.counter("tile_cache_hits")
+cache_misses = metrics.counter("tile_cache_misses")
+cache_bytes = metrics.gauge("tile_cache_bytes")
+cache_hit_rate = metrics.gauge("tile_cache_hit_rate_pct")
+
+
+def index_key(run_id, dataset_index):
+    return ("index", run_id, dataset_index)
+
+
+def content_key(data):
+    """
+    Key for a tile without a dataset index: a hash of its encoded or raw
+    bytes (much cheaper than decoding and resizing it again).
+    """
+    return ("content", hashlib.blake2b(data, digest_size=16).digest())
+
+
+class TileCache:
+    """
+    LRU of rendered tiles (RGB PIL images) bounded by their pixel bytes.
+    Thread-safe: render workers fill it, ingest threads check it.
+    """
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._tiles = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def expected_entries(self, tile_bytes=EXPECTED_TILE_BYTES):
+        """
+        How many tiles fit, advertised to trainers as
+        FlowControl.tile_cache_entries.
+        """
+        return self.max_bytes // tile_bytes
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                self.misses += 1
+                cache_misses.inc()
+            else:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                cache_hits.inc()
+            cache_hit_rate.set(100.0 * self.hits / (self.hits + self.misses))
+        return tile
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._tiles
+
+    def put(self, key, tile):
+        size = len(tile.getbands()) * tile.width * tile.height
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old.getbands()) * old.width * old.height
+            self._tiles[key] = tile
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self.bytes -= len(evicted.getbands()) * evicted.width * evicted.height
+            cache_bytes.set(self.bytes)
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self.bytes = 0
+            cache_bytes.set(0)
+
+
+tile_cache = TileCache()
@@ -0,0 +1,86 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from dashboard.shm_ring import shm_tiles_array
+from proto import dashboard_pb2
+
+
+# encodings this dashboard can display, advertised to clients in Ping
+SUPPORTED_ENCODINGS = (
+    dashboard_pb2.TILE_ENCODING_PNG,
+    dashboard_pb2.TILE_ENCODING_JPEG,
+    dashboard_pb2.TILE_ENCODING_RAW,
+    dashboard_pb2.TILE_ENCODING_SHM,   # only chosen once a trainer's SHM probe succeeds
+)
+
+_RAW_MODES = {1: "L", 3: "RGB", 4: "RGBA"}  # channels -> PIL mode
+
+
+def raw_tiles_array(batch):
+    """
+    Zero-copy (N, H, W, C) uint8 view over a RAW batch's tile_data.
+    """
+    if batch.tile_dtype not in ("", "uint8"):
+        raise ValueError(f"unsupported raw tile dtype {batch.tile_dtype!r}")
+    shape = tuple(batch.tile_shape)
+    if len(shape) != 4:
+        raise ValueError(f"raw tile_shape must be [N, H, W, C], got {list(shape)}")
+    return np.frombuffer(batch.tile_data, dtype=np.uint8).reshape(shape)
+
+
+def tile_labels(batch, label_names=()):
+    """
+    (predicted, true) per tile: class ids resolved through label_names,
+    or the per-image strings of clients that send names. Ids without a
+    known name show up as "#<id>".
+    """
+    n = len(batch.images)
+    if len(batch.tile_predicted_ids) == n and len(batch.tile_true_ids) == n and n:
+        def name(i):
+            return label_names[i] if 0 <= i < len(label_names) else f"#{i}"
+        return [
+            (name(p), name(t))
+            for p, t in zip(batch.tile_predicted_ids, batch.tile_true_ids)
+        ]
+    return [(img_msg.predicted_label, img_msg.true_label) for img_msg in batch.images]
+
+
+def tile_pixels(batch):
+    """
+    One entry per TrainingImage: its encoded bytes (PNG/JPEG), its
+    (H, W, C) uint8 array (RAW/SHM, packed in order over the tiles that
+    carry pixels), or None when the trainer omitted them (pixels_cached).
+    """
+    if batch.encoding in (dashboard_pb2.TILE_ENCODING_RAW, dashboard_pb2.TILE_ENCODING_SHM):
+        if batch.encoding == dashboard_pb2.TILE_ENCODING_SHM:
+            packed = iter(shm_tiles_array(batch))
+        else:
+            packed = iter(raw_tiles_array(batch))
+        if not batch.images:           # packed tiles without TrainingImages
+            return list(packed)
+        return [None if img_msg.pixels_cached else next(packed) for img_msg in batch.images]
+    return [None if img_msg.pixels_cached else img_msg.image_data for img_msg in batch.images]
+
+
+def decode_tile(pixels):
+    """
+    PIL image for one tile_pixels() entry. Arrays are wrapped with
+    Image.frombuffer, so no decode step runs; for SHM the image points
+    into the ring slot and is only valid until the slot is reused (see
+    shm_ring.check_slot).
+    """
+    if isinstance(pixels, np.ndarray):
+        h, w, c = pixels.shape
+        mode = _RAW_MODES[c]
+        return Image.frombuffer(mode, (w, h), pixels, "raw", mode, 0, 1)
+    return Image.open(io.BytesIO(pixels))
+
+
+def decode_tiles(batch):
+    """
+    Return one PIL image per tile of a TrainingBatch, whatever its
+    encoding (None for tiles whose pixels were omitted).
+    """
+    return [None if p is None else decode_tile(p) for p in tile_pixels(batch)]
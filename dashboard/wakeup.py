@@ -0,0 +1,68 @@
+import threading
+import time
+import tkinter as tk
+
+
+STARTUP_RETRIES = 10    # notifications may arrive before mainloop() runs
+
+
+class TkWakeup:
+    """
+    Lets any thread ask the Tk thread to run a callback soon.
+
+    notify() never blocks: it only sets a flag. A helper thread turns the
+    flag into one <<DashboardWakeup>> virtual event on the Tk event queue,
+    so a burst of notifications coalesces into a single callback and the
+    gRPC ingest threads never wait on Tk. If this Tcl build cannot take
+    events from other threads, failed becomes True and the caller should
+    fall back to polling.
+    """
+    EVENT = "<<DashboardWakeup>>"
+
+    def __init__(self, root, callback):
+        self.root = root
+        self.failed = False
+        self._pending = threading.Event()
+        self._closed = False
+        root.bind(self.EVENT, lambda event: callback())
+
+        self._thread = threading.Thread(target=self._run, name="tk-wakeup", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        self._pending.set()
+
+    def close(self):
+        self._closed = True
+        self._pending.set()
+
+    def _run(self):
+        retries = STARTUP_RETRIES
+        while True:
+            self._pending.wait()
+            if self._closed:
+                return
+            # clear before posting so a notify() racing with us is not lost
+            self._pending.clear()
+            try:
+                # with a threaded Tcl this is marshalled to the Tk thread and
+                # returns once queued, which also paces us to the GUI
+                self.root.event_generate(self.EVENT, when="tail")
+                retries = 0
+            except RuntimeError as e:
+                # "main thread is not in main loop": fine during startup only
+                if retries > 0 and not self._closed:
+                    retries -= 1
+                    self._pending.set()
+                    time.sleep(0.2)
+                    continue
+                self._fail(e)
+                return
+            except tk.TclError as e:   # root destroyed, or no thread support
+                self._fail(e)
+                return
+
+    def _fail(self, error):
+        if not self._closed:
+            print(f"[gui] cross-thread wakeup unavailable, polling instead: {error}")
+            self.failed = True
@@ -24,23 +24,43 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x64\x61shboard.proto\x12\x06icdash\"\\\n\rTrainingImage\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x12\n\nimage_data\x18\x02 \x01(\x0c\x12\x17\n\x0fpredicted_label\x18\x03 \x01(\t\x12\x12\n\ntrue_label\x18\x04 \x01(\t\"d\n\rTrainingBatch\x12\x11\n\titeration\x18\x01 \x01(\x05\x12%\n\x06images\x18\x02 \x03(\x0b\x32\x15.icdash.TrainingImage\x12\x0c\n\x04loss\x18\x03 \x01(\x02\x12\x0b\n\x03\x66ps\x18\x04 \x01(\x02\"\x07\n\x05\x45mpty\"\"\n\x03\x41\x63k\x12\n\n\x02ok\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"!\n\tHeartbeat\x12\x14\n\x0ctimestamp_ms\x18\x01 \x01(\x03\x32r\n\x10\x44\x61shboardService\x12\x36\n\x0eStreamTraining\x12\x15.icdash.TrainingBatch\x1a\x0b.icdash.Ack(\x01\x12&\n\x04Ping\x12\x11.icdash.Heartbeat\x1a\x0b.icdash.Ackb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x64\x61shboard.proto\x12\x06icdash\"\xa1\x01\n\rTrainingImage\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x12\n\nimage_data\x18\x02 \x01(\x0c\x12\x17\n\x0fpredicted_label\x18\x03 \x01(\t\x12\x12\n\ntrue_label\x18\x04 \x01(\t\x12\x1a\n\rdataset_index\x18\x05 \x01(\x03H\x00\x88\x01\x01\x12\x15\n\rpixels_cached\x18\x06 \x01(\x08\x42\x10\n\x0e_dataset_index\"\xa3\x04\n\rTrainingBatch\x12\x11\n\titeration\x18\x01 \x01(\x05\x12%\n\x06images\x18\x02 \x03(\x0b\x32\x15.icdash.TrainingImage\x12\x0c\n\x04loss\x18\x03 \x01(\x02\x12\x0b\n\x03\x66ps\x18\x04 \x01(\x02\x12&\n\x08\x65ncoding\x18\x05 \x01(\x0e\x32\x14.icdash.TileEncoding\x12\x11\n\ttile_data\x18\x06 \x01(\x0c\x12\x12\n\ntile_shape\x18\x07 \x03(\x05\x12\x12\n\ntile_dtype\x18\x08 \x01(\t\x12\x0e\n\x06run_id\x18\t \x01(\t\x12\x14\n\x0csend_time_ns\x18\n \x01(\x03\x12\x14\n\x0cstep_time_ms\x18\x0b \x01(\x02\x12\x16\n\x0e\x65ncode_time_ms\x18\x0c \x01(\x02\x12\x13\n\x0blabel_names\x18\r \x03(\t\x12\x1a\n\x12tile_predicted_ids\x18\x0e \x03(\x05\x12\x15\n\rtile_true_ids\x18\x0f \x03(\x05\x12\x0e\n\x06losses\x18\x10 \x03(\x02\x12\x12\n\ntiles_only\x18\x11 \x01(\x08\x12\x10\n\x08shm_name\x18\x12 \x01(\t\x12\x10\n\x08shm_slot\x18\x13 \x01(\x05\x12\x0f\n\x07shm_seq\x18\x14 \x01(\x03\x12\x16\n\x0e\x62\x61tch_true_ids\x18\x15 \x01(\x0c\x12\x1b\n\x13\x62\x61tch_predicted_ids\x18\x16 \x01(\x0c\x12\x17\n\x0f\x62\x61tch_ids_dtype\x18\x17 \x01(\t\x12\x17\n\x0floss_iterations\x18\x18 \x03(\x03\"\x80\x01\n\x0b\x46lowControl\x12\x1f\n\x17max_image_batches_per_s\x18\x01 \x01(\x02\x12\x14\n\x0closs_every_n\x18\x02 \x01(\x05\x12\x1a\n\x12tile_cache_entries\x18\x03 \x01(\x05\x12\x1e\n\x16resend_dataset_indices\x18\x04 \x03(\x03\"\x07\n\x05\x45mpty\"k\n\x03\x41\x63k\x12\n\n\x02ok\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x31\n\x13supported_encodings\x18\x03 \x03(\x0e\x32\x14.icdash.TileEncoding\x12\x14\n\x0cshm_readable\x18\x04 \x01(\x08\"4\n\tHeartbeat\x12\x14\n\x0ctimestamp_ms\x18\x01 \x01(\x03\x12\x11\n\tshm_probe\x18\x02 \x01(\t\"\x8c\x01\n\x10HistogramSummary\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0c\n\x04unit\x18\x02 \x01(\t\x12\r\n\x05\x63ount\x18\x03 \x01(\x03\x12\x0c\n\x04mean\x18\x04 \x01(\x01\x12\x0b\n\x03min\x18\x05 \x01(\x01\x12\x0b\n\x03max\x18\x06 \x01(\x01\x12\x0b\n\x03p50\x18\x07 \x01(\x01\x12\x0b\n\x03p95\x18\x08 \x01(\x01\x12\x0b\n\x03p99\x18\t \x01(\x01\"\xe9\x02\n\x05Stats\x12\x14\n\x0ctimestamp_ms\x18\x01 \x01(\x03\x12-\n\x08\x63ounters\x18\x02 \x03(\x0b\x32\x1b.icdash.Stats.CountersEntry\x12)\n\x06gauges\x18\x03 \x03(\x0b\x32\x19.icdash.Stats.GaugesEntry\x12\x30\n\ngauges_max\x18\x04 \x03(\x0b\x32\x1c.icdash.Stats.GaugesMaxEntry\x12,\n\nhistograms\x18\x05 \x03(\x0b\x32\x18.icdash.HistogramSummary\x1a/\n\rCountersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01\x1a-\n\x0bGaugesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01\x1a\x30\n\x0eGaugesMaxEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01*k\n\x0cTileEncoding\x12\x15\n\x11TILE_ENCODING_PNG\x10\x00\x12\x16\n\x12TILE_ENCODING_JPEG\x10\x01\x12\x15\n\x11TILE_ENCODING_RAW\x10\x02\x12\x15\n\x11TILE_ENCODING_SHM\x10\x03\x32\xdf\x01\n\x10\x44\x61shboardService\x12\x36\n\x0eStreamTraining\x12\x15.icdash.TrainingBatch\x1a\x0b.icdash.Ack(\x01\x12\x41\n\x0fStreamTelemetry\x12\x15.icdash.TrainingBatch\x1a\x13.icdash.FlowControl(\x01\x30\x01\x12&\n\x04Ping\x12\x11.icdash.Heartbeat\x1a\x0b.icdash.Ack\x12(\n\x08GetStats\x12\r.icdash.Empty\x1a\r.icdash.Statsb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'dashboard_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_TRAININGIMAGE']._serialized_start=27
-  _globals['_TRAININGIMAGE']._serialized_end=119
-  _globals['_TRAININGBATCH']._serialized_start=121
-  _globals['_TRAININGBATCH']._serialized_end=221
-  _globals['_EMPTY']._serialized_start=223
-  _globals['_EMPTY']._serialized_end=230
-  _globals['_ACK']._serialized_start=232
-  _globals['_ACK']._serialized_end=266
-  _globals['_HEARTBEAT']._serialized_start=268
-  _globals['_HEARTBEAT']._serialized_end=301
-  _globals['_DASHBOARDSERVICE']._serialized_start=303
-  _globals['_DASHBOARDSERVICE']._serialized_end=417
+  _globals['_STATS_COUNTERSENTRY']._loaded_options = None
+  _globals['_STATS_COUNTERSENTRY']._serialized_options = b'8\001'
+  _globals['_STATS_GAUGESENTRY']._loaded_options = None
+  _globals['_STATS_GAUGESENTRY']._serialized_options = b'8\001'
+  _globals['_STATS_GAUGESMAXENTRY']._loaded_options = None
+  _globals['_STATS_GAUGESMAXENTRY']._serialized_options = b'8\001'
+  _globals['_TILEENCODING']._serialized_start=1551
+  _globals['_TILEENCODING']._serialized_end=1658
+  _globals['_TRAININGIMAGE']._serialized_start=28
+  _globals['_TRAININGIMAGE']._serialized_end=189
+  _globals['_TRAININGBATCH']._serialized_start=192
+  _globals['_TRAININGBATCH']._serialized_end=739
+  _globals['_FLOWCONTROL']._serialized_start=742
+  _globals['_FLOWCONTROL']._serialized_end=870
+  _globals['_EMPTY']._serialized_start=872
+  _globals['_EMPTY']._serialized_end=879
+  _globals['_ACK']._serialized_start=881
+  _globals['_ACK']._serialized_end=988
+  _globals['_HEARTBEAT']._serialized_start=990
+  _globals['_HEARTBEAT']._serialized_end=1042
+  _globals['_HISTOGRAMSUMMARY']._serialized_start=1045
+  _globals['_HISTOGRAMSUMMARY']._serialized_end=1185
+  _globals['_STATS']._serialized_start=1188
+  _globals['_STATS']._serialized_end=1549
+  _globals['_STATS_COUNTERSENTRY']._serialized_start=1405
+  _globals['_STATS_COUNTERSENTRY']._serialized_end=1452
+  _globals['_STATS_GAUGESENTRY']._serialized_start=1454
+  _globals['_STATS_GAUGESENTRY']._serialized_end=1499
+  _globals['_STATS_GAUGESMAXENTRY']._serialized_start=1501
+  _globals['_STATS_GAUGESMAXENTRY']._serialized_end=1549
+  _globals['_DASHBOARDSERVICE']._serialized_start=1661
+  _globals['_DASHBOARDSERVICE']._serialized_end=1884
 # @@protoc_insertion_point(module_scope)
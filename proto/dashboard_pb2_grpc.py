@@ -41,11 +41,21 @@ class DashboardServiceStub(object):
                 request_serializer=dashboard__pb2.TrainingBatch.SerializeToString,
                 response_deserializer=dashboard__pb2.Ack.FromString,
                 _registered_method=True)
+        self.StreamTelemetry = channel.stream_stream(
+                '/icdash.DashboardService/StreamTelemetry',
+                request_serializer=dashboard__pb2.TrainingBatch.SerializeToString,
+                response_deserializer=dashboard__pb2.FlowControl.FromString,
+                _registered_method=True)
         self.Ping = channel.unary_unary(
                 '/icdash.DashboardService/Ping',
                 request_serializer=dashboard__pb2.Heartbeat.SerializeToString,
                 response_deserializer=dashboard__pb2.Ack.FromString,
                 _registered_method=True)
+        self.GetStats = channel.unary_unary(
+                '/icdash.DashboardService/GetStats',
+                request_serializer=dashboard__pb2.Empty.SerializeToString,
+                response_deserializer=dashboard__pb2.Stats.FromString,
+                _registered_method=True)
 
 
 class DashboardServiceServicer(object):
@@ -60,6 +70,14 @@ class DashboardServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamTelemetry(self, request_iterator, context):
+        """Same stream of batches, but the dashboard answers with FlowControl
+        updates so the trainer can skip tile work nobody will look at.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def Ping(self, request, context):
         """Optional: simple ping to check connectivity.
         """
@@ -67,6 +85,13 @@ class DashboardServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetStats(self, request, context):
+        """Read the dashboard's ingest/render metrics.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_DashboardServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -75,11 +100,21 @@ def add_DashboardServiceServicer_to_server(servicer, server):
                     request_deserializer=dashboard__pb2.TrainingBatch.FromString,
                     response_serializer=dashboard__pb2.Ack.SerializeToString,
             ),
+            'StreamTelemetry': grpc.stream_stream_rpc_method_handler(
+                    servicer.StreamTelemetry,
+                    request_deserializer=dashboard__pb2.TrainingBatch.FromString,
+                    response_serializer=dashboard__pb2.FlowControl.SerializeToString,
+            ),
             'Ping': grpc.unary_unary_rpc_method_handler(
                     servicer.Ping,
                     request_deserializer=dashboard__pb2.Heartbeat.FromString,
                     response_serializer=dashboard__pb2.Ack.SerializeToString,
             ),
+            'GetStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetStats,
+                    request_deserializer=dashboard__pb2.Empty.FromString,
+                    response_serializer=dashboard__pb2.Stats.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'icdash.DashboardService', rpc_method_handlers)
@@ -120,6 +155,33 @@ class DashboardService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def StreamTelemetry(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/icdash.DashboardService/StreamTelemetry',
+            dashboard__pb2.TrainingBatch.SerializeToString,
+            dashboard__pb2.FlowControl.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def Ping(request,
             target,
@@ -146,3 +208,30 @@ class DashboardService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/icdash.DashboardService/GetStats',
+            dashboard__pb2.Empty.SerializeToString,
+            dashboard__pb2.Stats.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,127 @@
+#Preprocessed CIFAR-10 for train_real.
+#Converts the dataset once into contiguous uint8 NCHW .npy files, then
+#serves whole batches by vectorized index slicing of a memory map instead
+#of decoding every sample through PIL and ToTensor.
+import os
+
+import numpy as np
+import torch
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
+
+
+def memmap_paths(root, train=True):
+    split = "train" if train else "test"
+    prefix = os.path.join(root, f"cifar10-{split}")
+    return prefix + "-images-u8-nchw.npy", prefix + "-labels.npy", prefix + "-classes.txt"
+
+
+def _save_atomic(path, array):
+    # a crash halfway through must not leave a truncated cache behind
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def write_memmap(root, images_nhwc, labels, classes, train=True):
+    """
+    Store (N, H, W, C) uint8 images and their labels in the memmap layout.
+    """
+    os.makedirs(root, exist_ok=True)
+    images_path, labels_path, classes_path = memmap_paths(root, train)
+    _save_atomic(labels_path, np.asarray(labels, dtype=np.int64))
+    with open(classes_path, "w") as f:
+        f.write("\n".join(classes) + "\n")
+    # images last: their presence marks a complete cache
+    _save_atomic(images_path, np.ascontiguousarray(np.asarray(images_nhwc).transpose(0, 3, 1, 2)))
+
+
+def prepare_cifar_memmap(root, train=True, download=True):
+    """
+    Build the memmap files from torchvision's CIFAR-10 once; later calls
+    only check that they exist. Returns the three paths.
+    """
+    paths = memmap_paths(root, train)
+    if all(os.path.exists(p) for p in paths):
+        return paths
+    from torchvision import datasets
+    print("[data] Converting CIFAR-10 to a uint8 memmap (one-time)...")
+    raw = datasets.CIFAR10(root=root, train=train, download=download)
+    # raw.data is already (N, 32, 32, 3) uint8: no per-sample decoding needed
+    write_memmap(root, raw.data, raw.targets, raw.classes, train)
+    return paths
+
+
+class MemmapCIFAR(Dataset):
+    """
+    CIFAR-10 from the memmap files, indexed by a list of sample indices
+    (use it with a BatchSampler and batch_size=None): returns a whole
+    (B, 3, 32, 32) uint8 image tensor and (B,) int64 labels per call, plus
+    the (B,) sample indices with return_indices. Convert to float on the
+    batch, ideally on the device (batch_to_device).
+    """
+    def __init__(self, root, train=True, download=True, return_indices=False):
+        self.images_path, labels_path, classes_path = prepare_cifar_memmap(root, train, download)
+        self.labels = np.load(labels_path)
+        with open(classes_path) as f:
+            self.classes = [line.strip() for line in f if line.strip()]
+        self.return_indices = return_indices
+        self._images = None      # opened lazily, once per worker process
+
+    def __getstate__(self):
+        # never pickle the mapping itself (spawned workers would copy it)
+        state = dict(self.__dict__)
+        state["_images"] = None
+        return state
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(self.images_path, mmap_mode="r")
+        return self._images
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, indices):
+        # sorted indices read the file front to back; a batch is a set anyway
+        idx = np.sort(np.asarray(indices, dtype=np.int64))
+        batch = torch.from_numpy(self.images[idx]), torch.from_numpy(self.labels[idx])
+        if self.return_indices:
+            return batch + (torch.from_numpy(idx),)
+        return batch
+
+
+def make_memmap_loader(root, batch_size, shuffle=True, num_workers=2,
+                       persistent_workers=True, prefetch_factor=4, pin_memory=False,
+                       make_sampler=None, return_indices=False):
+    """
+    make_sampler(dataset), if given, returns the per-sample index sampler
+    (e.g. a DistributedSampler); shuffle is then up to that sampler.
+    With return_indices, batches are (images, labels, dataset indices).
+    """
+    dataset = MemmapCIFAR(root, return_indices=return_indices)
+    if make_sampler is not None:
+        index_sampler = make_sampler(dataset)
+    else:
+        index_sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    sampler = BatchSampler(index_sampler, batch_size, drop_last=False)
+    worker_options = {}
+    if num_workers > 0:
+        worker_options = dict(persistent_workers=persistent_workers, prefetch_factor=prefetch_factor)
+    loader = DataLoader(
+        dataset, sampler=sampler, batch_size=None,
+        num_workers=num_workers, pin_memory=pin_memory, **worker_options,
+    )
+    return loader, dataset.classes
+
+
+def batch_to_device(images, labels, device):
+    """
+    Move a batch to the device; uint8 images become float in [0, 1] there
+    (4x less data to copy than converting first).
+    """
+    images = images.to(device, non_blocking=True)
+    if images.dtype == torch.uint8:
+        images = images.float().div_(255)
+    return images, labels.to(device, non_blocking=True)
@@ -0,0 +1,111 @@
+#CPU execution modes for SimpleCNN training.
+#A mode is eager fp32 plus any "+"-joined set of options:
+#  channels_last  NHWC memory format for the weights and the input batches
+#  bf16           torch.autocast("cpu", bfloat16) around forward and loss
+#  compile        torch.compile(model)
+#e.g. "channels_last+bf16". Intra-op threads are tuned separately.
+#benchmarks.cpu_modes measures the modes on this host and saves the fastest
+#one whose loss matches eager fp32; train_real uses it with CPU_MODE="auto".
+import contextlib
+import json
+import os
+
+import torch
+
+
+# --- CONFIG ---
+CPU_OPTIONS = ("channels_last", "bf16", "compile")
+CPU_MODES = (
+    "eager",
+    "channels_last",
+    "bf16",
+    "channels_last+bf16",
+    "compile",
+    "channels_last+compile",
+    "channels_last+bf16+compile",
+)
+CPU_MODE_FILE = "./data/cpu_mode.json"   # written by benchmarks.cpu_modes
+
+
+class CPUMode:
+    """
+    One execution mode: prepares the model and the input batches, and
+    wraps forward + loss in the matching autocast context.
+    """
+    def __init__(self, name="eager"):
+        options = set(name.split("+")) - {"eager", ""}
+        unknown = options - set(CPU_OPTIONS)
+        if unknown:
+            raise ValueError(
+                f"unknown CPU mode option(s) {sorted(unknown)}, expected {CPU_OPTIONS}"
+            )
+        self.channels_last = "channels_last" in options
+        self.bf16 = "bf16" in options
+        self.compile = "compile" in options
+        self.name = "+".join(o for o in CPU_OPTIONS if o in options) or "eager"
+
+    def prepare_model(self, model):
+        """
+        Call after model.to(device). The parameters stay the same objects,
+        so the optimizer can be created before or after.
+        """
+        if self.channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        if self.compile:
+            model = torch.compile(model)
+        return model
+
+    def prepare_input(self, images):
+        if self.channels_last:
+            return images.contiguous(memory_format=torch.channels_last)
+        return images
+
+    def autocast(self):
+        # backward runs outside the context, as autocast expects
+        if self.bf16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+    def __repr__(self):
+        return f"CPUMode({self.name!r})"
+
+
+def set_threads(num_threads):
+    """
+    Set the intra-op thread count (0 keeps torch's default).
+    Returns the count in effect.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
+
+
+def save_best(mode, num_threads, path=CPU_MODE_FILE, results=None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"mode": mode, "threads": num_threads, "results": results or []}, f, indent=2)
+
+
+def load_best(path=CPU_MODE_FILE):
+    """
+    (mode, threads) saved by benchmarks.cpu_modes, or None.
+    """
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+        return saved["mode"], int(saved.get("threads", 0))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def resolve_cpu_mode(mode="auto", num_threads=0, path=CPU_MODE_FILE):
+    """
+    Turn train_real's CPU_MODE / CPU_THREADS into (CPUMode, threads).
+    "auto" uses the saved benchmark result, or eager fp32 without one;
+    an explicit num_threads always wins over the saved count.
+    """
+    if mode == "auto":
+        saved = load_best(path)
+        mode, saved_threads = saved if saved is not None else ("eager", 0)
+        num_threads = num_threads or saved_threads
+    return CPUMode(mode), set_threads(num_threads)
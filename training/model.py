@@ -18,7 +18,7 @@ class SimpleCNN(nn.Module):
     def forward(self, x):
         x = self.pool(F.relu(self.conv1(x)))  # 32x32 -> 16x16
         x = self.pool(F.relu(self.conv2(x)))  # 16x16 -> 8x8
-        x = x.view(x.size(0), -1)
+        x = torch.flatten(x, 1)               # also works on channels_last activations
         x = F.relu(self.fc1(x))
         x = self.fc2(x)
         return x
@@ -0,0 +1,158 @@
+#Shared-memory ring for same-host tile pixels (TILE_ENCODING_SHM).
+#The trainer owns the ring (ShmTileWriter); the dashboard maps it with
+#ShmTileReader via dashboard.shm_ring. Only NumPy is needed here, so the
+#dashboard can import it without the training dependencies. The trainer writes packed uint8 (N, H, W, C) tiles into a slot
+#of a multiprocessing.shared_memory segment and sends only the segment
+#name, slot and sequence number in its TrainingBatch; the dashboard maps
+#the same segment and reads the pixels in place.
+#
+#Layout: RING_HEADER (magic, num_slots, slot_bytes), then one int64 sequence
+#number per slot, then num_slots slots of slot_bytes each. A slot is reused
+#num_slots batches later, so a reader checks the slot's sequence number
+#before and after using the pixels (a seqlock) and drops tiles whose slot
+#has been rewritten meanwhile.
+#
+#Whether the dashboard can map a trainer's segment at all (another
+#container, user or /dev/shm) is settled per connection: the trainer names
+#its ring in Heartbeat.shm_probe and only uses SHM if Ack.shm_readable.
+import secrets
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+# --- CONFIG ---
+RING_MAGIC = b"ICDSHM01"
+RING_HEADER = struct.Struct("<8sqq")   # magic, num_slots, slot_bytes
+NUM_SLOTS = 16                         # ~1 s of tile batches at the default rates
+SLOT_BYTES = 1 << 20                   # 16 tiles of 128x128 RGB fit with room to spare
+WRITING = -1                           # sequence number of a slot being rewritten
+
+_tracker_lock = threading.Lock()   # serializes segment opens while register is patched
+
+
+class StaleSlotError(LookupError):
+    """
+    The ring slot no longer holds the batch's tiles (or never did).
+    """
+
+
+class _Ring:
+    # views come from np.frombuffer, which holds a buffer export until the
+    # array dies: shm.close() then refuses (BufferError) instead of
+    # unmapping memory a view still points into
+    def __init__(self, shm, num_slots, slot_bytes):
+        self.shm = shm
+        self.num_slots = num_slots
+        self.slot_bytes = slot_bytes
+        self.seqs = np.frombuffer(shm.buf, dtype=np.int64, count=num_slots, offset=RING_HEADER.size)
+        self.data_offset = RING_HEADER.size + 8 * num_slots
+
+    def slot_view(self, slot, shape):
+        if self.seqs is None:
+            raise StaleSlotError(f"ring {self.shm.name!r} is closed")
+        count = int(np.prod(shape))
+        if count > self.slot_bytes:
+            raise ValueError(f"{count} tile bytes do not fit a {self.slot_bytes}-byte slot")
+        offset = self.data_offset + slot * self.slot_bytes
+        return np.frombuffer(self.shm.buf, dtype=np.uint8, count=count, offset=offset).reshape(shape)
+
+
+class ShmTileWriter(_Ring):
+    """
+    Trainer side: owns the segment and unlinks it on close(). Thread-safe;
+    reserve() hands out slots round-robin, commit() publishes one.
+    """
+    def __init__(self, num_slots=NUM_SLOTS, slot_bytes=SLOT_BYTES):
+        size = RING_HEADER.size + num_slots * (8 + slot_bytes)
+        with _tracker_lock:
+            shm = shared_memory.SharedMemory(
+                name=f"icdash_{secrets.token_hex(6)}", create=True, size=size
+            )
+        RING_HEADER.pack_into(shm.buf, 0, RING_MAGIC, num_slots, slot_bytes)
+        super().__init__(shm, num_slots, slot_bytes)
+        self.seqs[:] = 0
+        self.name = shm.name
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._closed = False
+
+    def fits(self, shape):
+        return int(np.prod(shape)) <= self.slot_bytes
+
+    def reserve(self, shape):
+        """
+        Claim the next slot for tiles of the given (N, H, W, C) shape.
+        Returns (slot, seq, view); fill view, then commit(slot, seq).
+        """
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            slot = seq % self.num_slots
+            self.seqs[slot] = WRITING
+        return slot, seq, self.slot_view(slot, shape)
+
+    def commit(self, slot, seq):
+        self.seqs[slot] = seq
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.seqs = None
+        try:
+            self.shm.close()
+        except BufferError:   # a tile view is still alive; the mapping goes with it
+            pass
+        self.shm.unlink()
+
+
+class ShmTileReader(_Ring):
+    """
+    Dashboard side: maps an existing segment without taking ownership, so
+    it is never registered with a resource tracker. (Registering and then
+    unregistering is not enough: a trainer started from the dashboard's
+    process tree shares its tracker, and the trainer's own unregister on
+    unlink would then fail.)
+    """
+    def __init__(self, name):
+        shm = _open_untracked(name)
+        magic, num_slots, slot_bytes = RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != RING_MAGIC:
+            shm.close()
+            raise ValueError(f"{name!r} is not a tile ring")
+        super().__init__(shm, num_slots, slot_bytes)
+
+    def close(self, detach=False):
+        """
+        Unmap the segment. While a tile view handed out by slot_view() is
+        still alive this returns False and the reader stays open (call
+        again later), or with detach=True leaves the mapping to those
+        views, which unmap it when they go away.
+        """
+        self.seqs = None
+        try:
+            self.shm.close()
+        except BufferError:
+            if not detach:
+                return False
+            self.shm._buf = self.shm._mmap = None
+            self.shm.close()   # only the file descriptor is left
+        return True
+
+
+def _open_untracked(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)   # Python 3.13+
+    except TypeError:
+        pass
+    with _tracker_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
@@ -0,0 +1,441 @@
+#Per-step telemetry producers for the training loop.
+#Both turn (loss, images, labels, preds) of one step into TrainingBatch
+#messages for a TelemetrySender; train_real picks one with TELEMETRY_MODE.
+#Besides the tiles, the class ids of every sample go out with the losses
+#(batch_true_ids / batch_predicted_ids) for the dashboard's confusion matrix.
+import queue
+import random
+import threading
+import time
+
+import torch
+import torch.distributed as dist
+
+from proto import dashboard_pb2
+from training.tiles import add_batch_ids, add_tiles, batch_ids_dtype
+
+
+# --- CONFIG ---
+NUM_TILES = 16
+LOSS_FLUSH_STEPS = 10     # low_overhead: losses go to the host every N steps
+ENCODE_QUEUE_SIZE = 4     # low_overhead: pending copy/encode jobs before tiles are skipped
+
+
+class PerStepTelemetry:
+    """
+    The straightforward path: loss.item() every step (a device sync), the
+    whole batch copied to the host to pick the tiles, and the tiles
+    encoded on the training thread. The class ids of steps without a
+    batch wait on the host for the next one.
+    """
+    def __init__(self, sender, encoding, run_id="", num_tiles=NUM_TILES, batch_ids=True):
+        self.sender = sender
+        self._encoding = encoding
+        self.run_id = run_id
+        self.num_tiles = num_tiles
+        self.batch_ids = batch_ids
+        self.num_classes = len(sender.label_names)
+        self._ids = []     # (2, B) true/predicted ids of steps not sent yet
+        self._last_iteration = 0
+        self.last_loss = None
+
+    @property
+    def encoding(self):
+        # None: whatever the sender chose from the dashboard's last Ping
+        return self.sender.encoding if self._encoding is None else self._encoding
+
+    def step(self, iteration, loss, images, labels, preds, step_time_ms, indices=None):
+        """
+        indices: optional dataset index of every sample in the batch, so
+        the dashboard can cache the tiles (and we can skip their pixels).
+        Returns the number of tiles sent with this step.
+        """
+        self.last_loss = float(loss.item())
+        self._last_iteration = iteration
+        if self.batch_ids:
+            self._ids.append(torch.stack([labels, preds]).detach().cpu())
+        send_tiles = self.sender.take_image_slot()
+        if not (send_tiles or self.sender.wants_loss(iteration)):
+            return 0
+
+        batch_msg = dashboard_pb2.TrainingBatch()
+        batch_msg.run_id = self.run_id
+        batch_msg.iteration = iteration
+        batch_msg.loss = self.last_loss
+        batch_msg.fps = 0.0  # dashboard computes its own FPS
+        batch_msg.step_time_ms = step_time_ms
+        if self._ids:
+            ids = torch.cat(self._ids, dim=1)
+            add_batch_ids(batch_msg, ids[0], ids[1], self.num_classes)
+            self._ids.clear()
+
+        num_tiles = 0
+        if send_tiles:
+            # choose up to num_tiles images
+            batch_size = images.size(0)
+            num_tiles = min(self.num_tiles, batch_size)
+            tile_ids = random.sample(range(batch_size), k=num_tiles)
+
+            images_cpu = images.detach().cpu()
+            labels_cpu = labels.detach().cpu()
+            preds_cpu = preds.detach().cpu()
+
+            encode_start = time.time()
+            # class ids only; the names went out once with the first batch
+            add_tiles(
+                batch_msg,
+                images_cpu[tile_ids],
+                tile_ids,
+                labels_cpu[tile_ids].tolist(),
+                preds_cpu[tile_ids].tolist(),
+                self.encoding,
+                dataset_indices=None if indices is None else indices[tile_ids].tolist(),
+                sent_tiles=self.sender.sent_tiles,
+            )
+            batch_msg.encode_time_ms = (time.time() - encode_start) * 1000.0
+
+        self.sender.send(batch_msg)
+        return num_tiles
+
+    def close(self):
+        if not self._ids:
+            return
+        # the last steps' ids, in a batch that adds no loss point
+        batch_msg = dashboard_pb2.TrainingBatch()
+        batch_msg.run_id = self.run_id
+        batch_msg.iteration = self._last_iteration
+        batch_msg.tiles_only = True
+        batch_msg.loss = self.last_loss
+        ids = torch.cat(self._ids, dim=1)
+        add_batch_ids(batch_msg, ids[0], ids[1], self.num_classes)
+        self._ids.clear()
+        self.sender.send(batch_msg)
+
+
+class LowOverheadTelemetry:
+    """
+    Telemetry that does not stall the training step:
+
+    - losses are accumulated in a device buffer and copied to the host
+      every flush_steps steps (one batch carrying all of them in
+      TrainingBatch.losses) instead of a loss.item() sync per step, and
+      so are the window's class ids, narrowed to uint8 on the device;
+    - tile indices are drawn on the device and only the selected images,
+      labels and predictions are gathered and copied, into pinned memory
+      with non_blocking copies on CUDA;
+    - waiting for those copies and encoding the tiles happens on a worker
+      thread, overlapping with the next training steps.
+
+    Tile batches are marked tiles_only, so their loss is not added to the
+    history twice. If the worker falls behind, tile jobs are skipped.
+    """
+    def __init__(self, sender, encoding, device, run_id="", num_tiles=NUM_TILES,
+                 flush_steps=LOSS_FLUSH_STEPS, batch_ids=True):
+        self.sender = sender
+        self._encoding = encoding
+        self.device = torch.device(device)
+        self.run_id = run_id
+        self.num_tiles = num_tiles
+        self.flush_steps = flush_steps
+        self.cuda = self.device.type == "cuda"
+
+        self._losses = torch.zeros(flush_steps, device=self.device)
+        self.batch_ids = batch_ids
+        self.num_classes = len(sender.label_names)
+        self._ids_dtype = batch_ids_dtype(self.num_classes)[0]
+        self._ids = []     # (2, B) device tensors of the current window
+        self._count = 0
+        self._last_iteration = None
+        self._last_step_ms = 0.0
+
+        self.last_loss = None      # host value of the newest flushed loss
+        self.tile_jobs_skipped = 0
+
+        self._jobs = queue.Queue(maxsize=ENCODE_QUEUE_SIZE)
+        self._thread = threading.Thread(
+            target=self._run, name="telemetry-encode", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def encoding(self):
+        return self.sender.encoding if self._encoding is None else self._encoding
+
+    def _to_host(self, tensor):
+        """
+        Start copying tensor to the host; returns the host tensor, which is
+        only valid once the job's event has completed.
+        """
+        if not self.cuda:
+            return tensor
+        host = torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=True)
+        host.copy_(tensor, non_blocking=True)
+        return host
+
+    def _submit(self, job, block):
+        event = None
+        if self.cuda:
+            event = torch.cuda.Event()
+            event.record()
+        try:
+            self._jobs.put((event,) + job, block=block)
+            return True
+        except queue.Full:
+            return False
+
+    def step(self, iteration, loss, images, labels, preds, step_time_ms, indices=None):
+        """
+        Record one step without synchronizing with the device.
+        indices: optional dataset index of every sample (host tensor).
+        Returns the number of tiles queued for this step.
+        """
+        self._losses[self._count] = loss.detach()   # device-side copy
+        if self.batch_ids:
+            self._ids.append(torch.stack([labels, preds]).detach().to(self._ids_dtype))
+        self._count += 1
+        self._last_iteration = iteration
+        self._last_step_ms = step_time_ms
+
+        num_tiles = 0
+        if self.sender.take_image_slot():
+            batch_size = images.size(0)
+            num_tiles = min(self.num_tiles, batch_size)
+            with torch.no_grad():
+                idx = torch.randperm(batch_size, device=images.device)[:num_tiles]
+                tiles = images.detach().index_select(0, idx)
+                # ids, true and predicted classes (and dataset indices)
+                # in one small int64 copy
+                rows = [idx, labels.index_select(0, idx), preds.index_select(0, idx)]
+                if indices is not None:
+                    rows.append(indices.to(idx.device, non_blocking=True).index_select(0, idx))
+                meta = torch.stack(rows)
+                job = (
+                    "tiles", iteration, step_time_ms,
+                    self._to_host(tiles), self._to_host(meta),
+                    self._to_host(loss.detach().reshape(1)),
+                )
+            if not self._submit(job, block=False):
+                self.tile_jobs_skipped += 1
+                num_tiles = 0
+
+        if self._count == self.flush_steps:
+            self.flush()
+        return num_tiles
+
+    def flush(self):
+        """
+        Send the accumulated losses (asynchronously).
+        """
+        if not self._count:
+            return
+        losses = self._losses[:self._count]
+        # on CUDA the copy is queued before any later write to the buffer;
+        # on the CPU the buffer is reused right away, so take a copy
+        losses = self._to_host(losses) if self.cuda else losses.clone()
+        ids = None
+        if self._ids:
+            ids = self._to_host(torch.cat(self._ids, dim=1))   # a new tensor: no reuse
+            self._ids = []
+        self._submit(("losses", self._last_iteration, self._last_step_ms, losses, ids), block=True)
+        self._count = 0
+
+    def close(self, timeout=10.0):
+        self.flush()
+        self._jobs.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                self._send(*job)
+            except Exception as e:  # a bad job must not stall the training loop
+                print("[telemetry] Could not build a telemetry batch:", e)
+
+    def _send(self, event, kind, iteration, step_time_ms, *payload):
+        if event is not None:
+            event.synchronize()   # copies done; the GIL is released meanwhile
+
+        batch_msg = dashboard_pb2.TrainingBatch()
+        batch_msg.run_id = self.run_id
+        batch_msg.iteration = iteration
+        batch_msg.step_time_ms = step_time_ms
+        if kind == "losses":
+            losses, ids = payload
+            losses = losses.tolist()
+            batch_msg.losses.extend(losses)
+            batch_msg.loss = losses[-1]
+            self.last_loss = losses[-1]
+            if ids is not None:
+                add_batch_ids(batch_msg, ids[0], ids[1], self.num_classes)
+        else:
+            tiles, meta, loss = payload
+            ids, true_ids, pred_ids, *dataset_ids = meta.tolist()
+            batch_msg.loss = loss.item()
+            batch_msg.tiles_only = True
+            encode_start = time.time()
+            add_tiles(
+                batch_msg, tiles, ids, true_ids, pred_ids, self.encoding,
+                dataset_indices=dataset_ids[0] if dataset_ids else None,
+                sent_tiles=self.sender.sent_tiles,
+            )
+            batch_msg.encode_time_ms = (time.time() - encode_start) * 1000.0
+        self.sender.send(batch_msg)
+
+
+class DistributedTelemetry:
+    """
+    Telemetry for data-parallel training: every rank calls step(), only
+    rank 0 has a sender, so the dashboard sees one stream per run however
+    many processes train it.
+
+    Losses are buffered per rank and, every flush_steps steps, all-reduced
+    into the mean loss across ranks (one batch carrying the window in
+    TrainingBatch.losses). Rank 0 folds "the dashboard wants tiles" into
+    that same all-reduce; when it is set, every rank contributes
+    ceil(num_tiles / world_size) tiles of its current batch to a gather on
+    rank 0. The window's class ids of every sample (batch_true_ids /
+    batch_predicted_ids, for the confusion matrix) are gathered on rank 0
+    with the losses. That is one small all-reduce and one ids gather per
+    window (plus the tile gathers when asked for), on top of DDP's own
+    gradient all-reduce per step.
+
+    Tile ids are positions in the concatenated global batch
+    (rank * batch_size + index). Collectives run on CPU tensors (gloo).
+    num_classes must be the same on every rank; it picks the ids' dtype.
+    """
+    def __init__(self, sender, encoding, rank, world_size, run_id="",
+                 num_tiles=NUM_TILES, flush_steps=LOSS_FLUSH_STEPS,
+                 num_classes=0, batch_ids=True):
+        if (sender is not None) != (rank == 0):
+            raise ValueError("exactly rank 0 must have a sender")
+        self.sender = sender
+        self._encoding = encoding
+        self.rank = rank
+        self.world_size = world_size
+        self.run_id = run_id
+        self.tiles_per_rank = -(-num_tiles // world_size)
+        self.flush_steps = flush_steps
+        self.batch_ids = batch_ids
+        self.num_classes = num_classes
+        self._ids_dtype = batch_ids_dtype(num_classes)[0]
+        self._ids = []     # (2, B) CPU tensors of the current window
+
+        # flush_steps losses + rank 0's tile request in the last slot
+        self._window = torch.zeros(flush_steps + 1)
+        self._count = 0
+        self._last_iteration = None
+        self._last_step_ms = 0.0
+        self.last_loss = None
+
+    @property
+    def encoding(self):
+        # rank 0 only; None follows the sender across reconnects
+        return self.sender.encoding if self._encoding is None else self._encoding
+
+    def step(self, iteration, loss, images, labels, preds, step_time_ms, indices=None):
+        """
+        Must be called on every rank for every step (it runs collectives).
+        indices is accepted for interface parity; gathered tiles carry none.
+        Returns the number of tiles sent (rank 0) or contributed.
+        """
+        self._window[self._count] = loss.detach().float()
+        if self.batch_ids:
+            self._ids.append(torch.stack([labels, preds]).detach().cpu().to(self._ids_dtype))
+        self._count += 1
+        self._last_iteration = iteration
+        self._last_step_ms = step_time_ms
+        if self._count < self.flush_steps:
+            return 0
+        return self._flush((images, labels, preds))
+
+    def _flush(self, batch=None):
+        """
+        Collective: all-reduce the window, gather tiles if rank 0 asked
+        for them and batch (images, labels, preds) is given.
+        """
+        count = self._count
+        self._count = 0
+        window = self._window
+        want = batch is not None and self.rank == 0 and self.sender.take_image_slot()
+        window[-1] = 1.0 if want else 0.0
+        dist.all_reduce(window)        # sum over ranks; the flag only comes from rank 0
+        losses = (window[:count] / self.world_size).tolist()
+        want_tiles = window[-1].item() > 0
+        window.zero_()
+        self.last_loss = losses[-1]
+
+        class_ids = self._gather_ids() if self.batch_ids else None
+        tiles = meta = None
+        if want_tiles:
+            tiles, meta = self._gather_tiles(*batch)
+
+        if self.rank != 0:
+            return 0 if tiles is None else len(tiles)
+        batch_msg = dashboard_pb2.TrainingBatch()
+        batch_msg.run_id = self.run_id
+        batch_msg.iteration = self._last_iteration
+        batch_msg.step_time_ms = self._last_step_ms
+        batch_msg.losses.extend(losses)
+        batch_msg.loss = losses[-1]
+        if class_ids is not None and class_ids.size(1):
+            add_batch_ids(batch_msg, class_ids[0], class_ids[1], self.num_classes)
+        if tiles is not None:
+            ids, true_ids, pred_ids = meta.tolist()
+            encode_start = time.time()
+            add_tiles(batch_msg, tiles, ids, true_ids, pred_ids, self.encoding)
+            batch_msg.encode_time_ms = (time.time() - encode_start) * 1000.0
+        self.sender.send(batch_msg)
+        return 0 if tiles is None else len(tiles)
+
+    def _gather_ids(self):
+        # every rank ran the same steps on equally sized batches (DistributedSampler)
+        ids = torch.cat(self._ids, dim=1) if self._ids else torch.empty((2, 0), dtype=self._ids_dtype)
+        self._ids = []
+        id_list = [torch.empty_like(ids) for _ in range(self.world_size)] if self.rank == 0 else None
+        dist.gather(ids, id_list, dst=0)
+        return torch.cat(id_list, dim=1) if self.rank == 0 else None
+
+    def _gather_tiles(self, images, labels, preds):
+        batch_size = images.size(0)   # equal on all ranks with a DistributedSampler
+        k = min(self.tiles_per_rank, batch_size)
+        with torch.no_grad():
+            idx = torch.randperm(batch_size)[:k]
+            tiles = images.detach().cpu().index_select(0, idx).contiguous()
+            meta = torch.stack([
+                idx + self.rank * batch_size,
+                labels.cpu().index_select(0, idx),
+                preds.cpu().index_select(0, idx),
+            ])
+        tile_list = meta_list = None
+        if self.rank == 0:
+            tile_list = [torch.empty_like(tiles) for _ in range(self.world_size)]
+            meta_list = [torch.empty_like(meta) for _ in range(self.world_size)]
+        dist.gather(tiles, tile_list, dst=0)
+        dist.gather(meta, meta_list, dst=0)
+        if self.rank != 0:
+            return tiles, None
+        return torch.cat(tile_list), torch.cat(meta_list, dim=1)
+
+    def close(self):
+        """
+        Collective too: every rank closes after the same number of steps
+        (a DistributedSampler gives all ranks equally many batches).
+        """
+        if self._count:
+            self._flush()
+
+
+TELEMETRY_MODES = ("low_overhead", "per_step")
+
+
+def make_step_telemetry(mode, sender, encoding, device, run_id="", num_tiles=NUM_TILES,
+                        batch_ids=True):
+    if mode == "low_overhead":
+        return LowOverheadTelemetry(sender, encoding, device, run_id, num_tiles,
+                                    batch_ids=batch_ids)
+    if mode == "per_step":
+        return PerStepTelemetry(sender, encoding, run_id, num_tiles, batch_ids=batch_ids)
+    raise ValueError(f"unknown telemetry mode {mode!r}, expected one of {TELEMETRY_MODES}")
@@ -0,0 +1,455 @@
+#Background telemetry sender for the training scripts.
+#Keeps one StreamTelemetry (or StreamTraining) call open for the whole run
+#and feeds it from a bounded queue, so the training step only enqueues and
+#returns. Connecting, health checks (Ping) and reconnecting with backoff all
+#happen on the sender's thread; while the dashboard is away, loss points are
+#kept in a bounded buffer and sent in one batch once it is back.
+import collections
+import random
+import threading
+import time
+
+import grpc
+
+from proto import dashboard_pb2, dashboard_pb2_grpc
+from training.tiles import COMPRESSIONS, choose_encoding, ping_heartbeat
+
+
+# --- CONFIG ---
+DEFAULT_QUEUE_SIZE = 8
+DROP_OLDEST = "drop_oldest"   # full queue: discard the oldest pending batch
+LATEST_WINS = "latest_wins"   # only the newest pending batch is ever sent
+POLICIES = (DROP_OLDEST, LATEST_WINS)
+PING_TIMEOUT_S = 2.0          # health check before (re)opening the stream
+RECONNECT_MIN_S = 0.5         # first retry delay; doubles per failed attempt
+RECONNECT_MAX_S = 30.0
+RECONNECT_JITTER = 0.2        # +-20% on each delay, so trainers do not retry in lockstep
+CATCHUP_POINTS = 10_000       # loss points kept while offline (the newest win)
+
+
+class SentTiles:
+    """
+    The trainer's picture of the dashboard's tile cache: the dataset
+    indices whose pixels went out most recently, at most capacity of them
+    (FlowControl.tile_cache_entries; 0, the default and the value on
+    StreamTraining, never omits pixels). Thread-safe.
+    """
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.omitted = 0
+        self._lock = threading.Lock()
+        self._indices = collections.OrderedDict()
+
+    def omit(self, dataset_index):
+        """
+        True if the pixels of dataset_index can be left out of a batch;
+        otherwise it is recorded as sent (the caller must send them).
+        """
+        with self._lock:
+            if self.capacity <= 0:
+                return False
+            if dataset_index in self._indices:
+                self._indices.move_to_end(dataset_index)
+                self.omitted += 1
+                return True
+            self._indices[dataset_index] = None
+            while len(self._indices) > self.capacity:
+                self._indices.popitem(last=False)
+            return False
+
+    def forget(self, dataset_indices):
+        """
+        The dashboard does not have these after all: send pixels next time.
+        """
+        with self._lock:
+            for dataset_index in dataset_indices:
+                self._indices.pop(dataset_index, None)
+
+    def resize(self, capacity):
+        with self._lock:
+            self.capacity = capacity
+            while len(self._indices) > max(capacity, 0):
+                self._indices.popitem(last=False)
+
+
+def _sent_pixels(batch_msg):
+    return [
+        img_msg.dataset_index for img_msg in batch_msg.images
+        if img_msg.HasField("dataset_index") and not img_msg.pixels_cached
+    ]
+
+
+class TelemetrySender:
+    """
+    Streams TrainingBatch messages to the dashboard over a single long-lived
+    StreamTelemetry RPC, falling back to client-streaming StreamTraining on
+    dashboards that do not have it (or with flow_control=False).
+
+    send() never blocks on the network: it puts the message into a bounded
+    queue and a background thread hands queued messages to gRPC. When the
+    dashboard falls behind, the queue policy decides what gets dropped.
+
+    On StreamTelemetry the dashboard answers with FlowControl messages;
+    the training loop asks take_image_slot() and wants_loss() before
+    building a batch, so steps the dashboard would not show cost nothing.
+
+    label_names, if given, is the class vocabulary: it rides on the first
+    batch of every stream, so later batches only need class ids.
+
+    sent_tiles tracks which dataset tiles the dashboard has cached, so
+    add_tiles can leave their pixels out (StreamTelemetry only).
+
+    The background thread also owns the connection. It Pings the dashboard
+    (with a timeout) before opening a stream, and when the stream fails or
+    the channel (if given) reports TRANSIENT_FAILURE it goes offline and
+    retries with exponential backoff (a channel turning READY cuts the wait
+    short). Offline, send() keeps only the batches' loss points, at most
+    catchup_points of them; the first batch on the next stream carries them
+    all (with TrainingBatch.loss_iterations), so the loss plot has no gap.
+    Tiles are not buffered. With reconnect=False the first failure ends
+    streaming for good.
+
+    encoding is re-chosen from every Ping answer (see choose_encoding)
+    for target and the preferred encoding.
+    """
+    def __init__(self, stub, max_queue=DEFAULT_QUEUE_SIZE, policy=DROP_OLDEST,
+                 label_names=None, flow_control=True, channel=None, target="",
+                 preferred_encoding="auto", reconnect=True, catchup_points=CATCHUP_POINTS):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown telemetry policy {policy!r}, expected one of {POLICIES}")
+        if max_queue < 1:
+            raise ValueError("max_queue must be >= 1")
+
+        self.stub = stub
+        self.channel = channel
+        self.target = target
+        self.preferred_encoding = preferred_encoding
+        self.policy = policy
+        self.max_queue = 1 if policy == LATEST_WINS else max_queue
+        self.label_names = list(label_names or [])
+        self.flow_control = flow_control
+        self.reconnect = reconnect
+
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._closed = False
+        self._catchup = collections.deque(maxlen=catchup_points)   # (iteration, loss)
+        self._catchup_msg = None   # batch of buffered losses, sent before the queue
+        self._run_id = ""       # of the batches sent, for the catch-up batch
+        self._call = None       # the open streaming call, cancelled on channel failure
+        self._stream_id = 0     # bumped per stream: iterators of dead calls stop
+        self._channel_ready = False
+
+        self.online = False    # True while a stream is open
+        self.error = None      # the last grpc.RpcError that ended a stream or Ping
+        self.ack = None        # Ack returned by the server when the stream ends
+        self.ping_ack = None   # Ack of the last successful health check
+        self.flow = None       # latest FlowControl from the dashboard, if any
+        self.encoding = dashboard_pb2.TILE_ENCODING_PNG   # until a Ping says more
+        self.sent_tiles = SentTiles()
+        self.sent = 0
+        self.dropped = 0
+        self.connects = 0      # streams opened (1 + reconnects)
+        self.catchup_sent = 0  # loss points delivered in catch-up batches
+        self._last_images = None   # time.monotonic() of the last tile batch
+
+        if channel is not None:
+            channel.subscribe(self._on_connectivity)
+
+        self._thread = threading.Thread(
+            target=self._run, name="telemetry-sender", daemon=True
+        )
+        self._thread.start()
+
+    def send(self, batch_msg):
+        """
+        Enqueue a TrainingBatch for the dashboard and return immediately.
+        Returns False if the message was not queued: offline, only its
+        loss points are kept for the catch-up batch; closed, nothing is.
+        """
+        # stamped on hand-over, so the dashboard's transport latency also
+        # covers time spent waiting in our queue
+        if not batch_msg.send_time_ns:
+            batch_msg.send_time_ns = time.time_ns()
+        with self._cond:
+            if self._closed:
+                return False
+            self._run_id = batch_msg.run_id
+            if not self.online:
+                self._keep_losses(batch_msg)
+                return False
+            if len(self._queue) >= self.max_queue:
+                # both policies prefer fresh data: evict from the old end
+                evicted = self._queue.popleft()
+                self.dropped += 1
+                # its pixels never reach the dashboard's cache
+                self.sent_tiles.forget(_sent_pixels(evicted))
+            self._queue.append(batch_msg)
+            self._cond.notify()
+        return True
+
+    def _keep_losses(self, batch_msg):
+        # caller holds _cond
+        if batch_msg.loss_iterations:
+            self._catchup.extend(zip(batch_msg.loss_iterations, batch_msg.losses))
+        elif batch_msg.losses:
+            first = batch_msg.iteration - len(batch_msg.losses) + 1
+            self._catchup.extend((first + i, loss) for i, loss in enumerate(batch_msg.losses))
+        elif not batch_msg.tiles_only:
+            self._catchup.append((batch_msg.iteration, batch_msg.loss))
+
+    def take_image_slot(self, now=None):
+        """
+        True if this step's batch should carry tiles under the dashboard's
+        max_image_batches_per_s (always True until it sent a FlowControl,
+        never while offline). A True answer uses up the slot.
+        """
+        if not self.online:
+            return False
+        flow = self.flow
+        if flow is None:
+            return True
+        if flow.max_image_batches_per_s <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        if (self._last_images is not None
+                and now - self._last_images < 1.0 / flow.max_image_batches_per_s):
+            return False
+        self._last_images = now
+        return True
+
+    def wants_loss(self, iteration):
+        """
+        True if the dashboard wants the scalar loss of this iteration.
+        """
+        flow = self.flow
+        if flow is None or flow.loss_every_n <= 1:
+            return True
+        return iteration % flow.loss_every_n == 0
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    def wait_online(self, timeout=None):
+        """
+        Block until a stream is open (or closed/timeout); returns online.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.online or self._closed, timeout)
+            return self.online
+
+    def close(self, timeout=5.0):
+        """
+        Stop accepting batches, flush what is queued and end the stream.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self.channel is not None:
+            self.channel.unsubscribe(self._on_connectivity)
+        return self.ack
+
+    def _on_connectivity(self, state):
+        # gRPC thread: only flag and wake, the sender thread does the work
+        with self._cond:
+            self._channel_ready = state == grpc.ChannelConnectivity.READY
+            call = self._call if state in (
+                grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.SHUTDOWN
+            ) else None
+            self._cond.notify_all()
+        if call is not None:
+            call.cancel()    # fail the stream now rather than on the next write
+
+    def _request_iterator(self, taken=None):
+        """
+        Generator consumed by gRPC: yields queued batches until close()
+        (or until its stream is replaced; gRPC may still be pulling on a
+        failed call's iterator). taken, if given, collects (batch,
+        is_catchup) for what it yields before the first FlowControl, so
+        _take_back() can requeue them if the call is rejected.
+        """
+        first = True
+        stream_id = self._stream_id
+        while True:
+            with self._cond:
+                while (not (self._queue or self._catchup_msg) and not self._closed
+                       and stream_id == self._stream_id):
+                    self._cond.wait()
+                if stream_id != self._stream_id:
+                    return
+                catchup = self._catchup_msg is not None
+                if catchup:
+                    # never evicted by the queue policy
+                    batch_msg, self._catchup_msg = self._catchup_msg, None
+                    self.catchup_sent += len(batch_msg.losses)
+                elif self._queue:
+                    batch_msg = self._queue.popleft()
+                else:
+                    return
+                if taken is not None and self.flow is None:
+                    taken.append((batch_msg, catchup))
+            if first and self.label_names and not batch_msg.label_names:
+                batch_msg.label_names.extend(self.label_names)
+            first = False
+            self.sent += 1
+            yield batch_msg
+
+    def _stream_with_flow_control(self):
+        """
+        Run StreamTelemetry; returns False if the dashboard does not have it.
+        """
+        taken = []
+        try:
+            call = self.stub.StreamTelemetry(self._request_iterator(taken))
+            with self._cond:
+                self._call = call
+            for control in call:
+                self.flow = control
+                self.sent_tiles.resize(control.tile_cache_entries)
+                self.sent_tiles.forget(control.resend_dataset_indices)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            print("[telemetry] Dashboard has no StreamTelemetry, using StreamTraining.")
+            self.flow_control = False
+            self._take_back(taken)
+            return False
+        self.ack = dashboard_pb2.Ack(ok=True, message="telemetry stream ended")
+        return True
+
+    def _take_back(self, taken):
+        """
+        The dashboard rejected the call without reading it: stop its
+        request iterator and put what it took back in front, in order.
+        """
+        with self._cond:
+            self._stream_id += 1
+            for batch_msg, catchup in reversed(taken):
+                self.sent -= 1
+                if catchup:
+                    self.catchup_sent -= len(batch_msg.losses)
+                    self._catchup_msg = batch_msg
+                else:
+                    self._queue.appendleft(batch_msg)
+            del taken[:]
+            self._cond.notify_all()
+
+    def _stream(self):
+        if not (self.flow_control and self._stream_with_flow_control()):
+            future = self.stub.StreamTraining.future(self._request_iterator())
+            with self._cond:
+                self._call = future
+            self.ack = future.result()
+
+    def _health_check(self):
+        """
+        Ping the dashboard; on success, pick the tile encoding from its Ack
+        (SHM only if it could map our ring this time).
+        """
+        try:
+            ack = self.stub.Ping(
+                ping_heartbeat(self.target, self.preferred_encoding),
+                timeout=PING_TIMEOUT_S,
+            )
+        except grpc.RpcError as e:
+            self.error = e
+            return False
+        self.ping_ack = ack
+        self.encoding = choose_encoding(ack, self.target, self.preferred_encoding)
+        return True
+
+    def _go_online(self):
+        """
+        A new stream starts: the dashboard may be a fresh process, so its
+        tile cache and flow control start over; buffered losses go first.
+        """
+        self.flow = None
+        self.sent_tiles.resize(0)
+        with self._cond:
+            if self._catchup:
+                iterations, losses = zip(*self._catchup)
+                self._catchup.clear()
+                batch_msg = dashboard_pb2.TrainingBatch(run_id=self._run_id)
+                batch_msg.iteration = iterations[-1]
+                batch_msg.loss = losses[-1]
+                batch_msg.losses.extend(losses)
+                batch_msg.loss_iterations.extend(iterations)
+                batch_msg.send_time_ns = time.time_ns()
+                self._catchup_msg = batch_msg
+            self.online = True
+            self.connects += 1
+            self._stream_id += 1
+            self._cond.notify_all()
+
+    def _go_offline(self):
+        with self._cond:
+            self.online = False
+            self._call = None
+            # what did not make it goes back into the buffer, oldest first
+            unsent = [self._catchup_msg] if self._catchup_msg is not None else []
+            self._catchup_msg = None
+            buffered = list(self._catchup)
+            self._catchup.clear()
+            for batch_msg in unsent + list(self._queue):
+                self._keep_losses(batch_msg)
+            self._catchup.extend(buffered)
+            self._queue.clear()
+            self._stream_id += 1      # the failed call's iterator must not take more
+            self._cond.notify_all()
+
+    def _wait_retry(self, delay):
+        """
+        Sleep until the next attempt, the channel turning READY, or close().
+        """
+        delay *= 1.0 + random.uniform(-RECONNECT_JITTER, RECONNECT_JITTER)
+        with self._cond:
+            self._channel_ready = False
+            self._cond.wait_for(lambda: self._closed or self._channel_ready, delay)
+
+    def _run(self):
+        delay = RECONNECT_MIN_S
+        reported = False     # one "offline" line per outage, not per attempt
+        while not self._closed:
+            if not self._health_check():
+                if not reported:
+                    print("[telemetry] Dashboard not reachable, retrying in the background.")
+                    print("            Error:", self.error)
+                    reported = True
+                if not self.reconnect:
+                    return
+                self._wait_retry(delay)
+                delay = min(delay * 2, RECONNECT_MAX_S)
+                continue
+            delay = RECONNECT_MIN_S
+            if reported or self.connects:
+                print(f"[telemetry] Dashboard back, streaming again "
+                      f"({len(self._catchup)} buffered loss points).")
+            reported = False
+            self._go_online()
+            try:
+                self._stream()
+                error = "stream ended by the dashboard"
+            except (grpc.RpcError, grpc.FutureCancelledError) as e:
+                self.error = error = e
+            finally:
+                self._go_offline()
+            if self._closed:
+                return
+            print("[telemetry] Dashboard stream lost, reconnecting in the background.")
+            print("            Error:", error)
+            reported = True
+            if not self.reconnect:
+                return
+
+
+def open_sender(target, compression="none", **kwargs):
+    """
+    TelemetrySender on a new channel to target (a "host:port"), watching
+    the channel's connectivity. Returns at once: the sender connects, and
+    reconnects, in the background. kwargs go to TelemetrySender.
+    """
+    channel = grpc.insecure_channel(target, compression=COMPRESSIONS[compression])
+    stub = dashboard_pb2_grpc.DashboardServiceStub(channel)
+    return TelemetrySender(stub, channel=channel, target=target, **kwargs)
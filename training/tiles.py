@@ -0,0 +1,261 @@
+#Tile encoders shared by the training scripts.
+#Turns (N, C, H, W) float tensors in [0, 1] into the pixel payload of a
+#TrainingBatch, using whichever TileEncoding the dashboard negotiated.
+import atexit
+import io
+import threading
+import time
+
+import grpc
+import torch
+from PIL import Image
+from torchvision.utils import save_image
+
+from proto import dashboard_pb2
+from training.shm_ring import ShmTileWriter
+
+
+# --- CONFIG ---
+JPEG_QUALITY = 90
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+# names accepted by the training scripts' TILE_ENCODING setting
+ENCODINGS = {
+    "png": dashboard_pb2.TILE_ENCODING_PNG,
+    "jpeg": dashboard_pb2.TILE_ENCODING_JPEG,
+    "raw": dashboard_pb2.TILE_ENCODING_RAW,
+    "shm": dashboard_pb2.TILE_ENCODING_SHM,
+}
+
+# names accepted by the training scripts' COMPRESSION setting; worth it for
+# raw tiles or label strings over a real network, not for PNG/JPEG tiles
+COMPRESSIONS = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+def tensor_to_png_bytes(tensor):
+    """
+    Convert a (C, H, W) tensor in [0, 1] to PNG bytes.
+    """
+    buf = io.BytesIO()
+    save_image(tensor, buf, format="PNG")
+    return buf.getvalue()
+
+
+def tensor_to_jpeg_bytes(tensor, quality=JPEG_QUALITY):
+    """
+    Convert a (C, H, W) tensor in [0, 1] to JPEG bytes.
+    """
+    pixels = tensors_to_uint8_hwc(tensor.unsqueeze(0))[0].numpy()
+    if pixels.shape[2] == 1:
+        pixels = pixels[:, :, 0]
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def tensors_to_uint8_hwc(tensors):
+    """
+    Convert an (N, C, H, W) float tensor in [0, 1] to a contiguous
+    (N, H, W, C) uint8 tensor, rounding the same way save_image does.
+    """
+    return (
+        tensors.detach()
+        .mul(255).add_(0.5).clamp_(0, 255)
+        .to(torch.uint8)
+        .permute(0, 2, 3, 1)
+        .contiguous()
+        .cpu()
+    )
+
+
+_shm_writer = None
+_shm_lock = threading.Lock()
+
+
+def shm_writer():
+    """
+    This process's tile ring, created on first use and unlinked at exit.
+    """
+    global _shm_writer
+    with _shm_lock:
+        if _shm_writer is None:
+            _shm_writer = ShmTileWriter()
+            atexit.register(_shm_writer.close)
+        return _shm_writer
+
+
+def write_shm_tiles(batch_msg, tensors):
+    """
+    Convert the tiles straight into a ring slot and point batch_msg at it.
+    Returns False (nothing written) if they do not fit in a slot.
+    """
+    n, c, h, w = tensors.shape
+    ring = shm_writer()
+    if not ring.fits((n, h, w, c)):
+        return False
+    pixels = (
+        tensors.detach()
+        .mul(255).add_(0.5).clamp_(0, 255)
+        .to(torch.uint8)
+        .cpu()
+    )
+    slot, seq, view = ring.reserve((n, h, w, c))
+    # the NCHW -> NHWC permute happens in this one copy, into the slot
+    torch.from_numpy(view).copy_(pixels.permute(0, 2, 3, 1))
+    ring.commit(slot, seq)
+    batch_msg.shm_name = ring.name
+    batch_msg.shm_slot = slot
+    batch_msg.shm_seq = seq
+    batch_msg.tile_shape.extend((n, h, w, c))
+    batch_msg.tile_dtype = "uint8"
+    return True
+
+
+def is_local_target(target):
+    """
+    True if a gRPC target such as "localhost:50051" points at this host.
+    """
+    host = target.split("///")[-1]   # strip an optional "dns:///" scheme
+    if host.startswith("["):
+        host = host[1:host.index("]")]
+    else:
+        host = host.rsplit(":", 1)[0]
+    return host in LOCAL_HOSTS
+
+
+def wants_shm(target, preferred="auto"):
+    """
+    True if SHM is worth probing for: asked for, or "auto" on a local target.
+    """
+    return preferred == "shm" or (preferred == "auto" and is_local_target(target))
+
+
+def ping_heartbeat(target, preferred="auto"):
+    """
+    Heartbeat for the Ping before a stream. When SHM is a candidate it
+    names this process's ring (creating it), so the dashboard can say in
+    Ack.shm_readable whether it can actually map it.
+    """
+    heartbeat = dashboard_pb2.Heartbeat(timestamp_ms=int(time.time() * 1000))
+    if wants_shm(target, preferred):
+        heartbeat.shm_probe = shm_writer().name
+    return heartbeat
+
+
+def choose_encoding(ping_ack, target, preferred="auto"):
+    """
+    Pick the TileEncoding to use for a dashboard.
+
+    preferred is one of ENCODINGS or "auto". "auto" uses SHM, else RAW, for
+    a local dashboard that advertised it in its Ping Ack (older servers send
+    an empty list) and PNG otherwise, since PNG is smaller on a real network
+    link. SHM is only used when the Ack confirms the dashboard could map
+    our ring (see ping_heartbeat); a hostname alone does not tell whether
+    it shares our /dev/shm. Otherwise a request for SHM falls back to
+    in-band RAW.
+    """
+    supported = set(ping_ack.supported_encodings) if ping_ack is not None else set()
+    shm_ok = ping_ack is not None and ping_ack.shm_readable
+    if preferred != "auto":
+        encoding = ENCODINGS[preferred]
+        if encoding == dashboard_pb2.TILE_ENCODING_SHM and not shm_ok:
+            encoding = dashboard_pb2.TILE_ENCODING_RAW
+        if encoding == dashboard_pb2.TILE_ENCODING_PNG or encoding in supported:
+            return encoding
+        return dashboard_pb2.TILE_ENCODING_PNG
+    if is_local_target(target):
+        if shm_ok and dashboard_pb2.TILE_ENCODING_SHM in supported:
+            return dashboard_pb2.TILE_ENCODING_SHM
+        if dashboard_pb2.TILE_ENCODING_RAW in supported:
+            return dashboard_pb2.TILE_ENCODING_RAW
+    return dashboard_pb2.TILE_ENCODING_PNG
+
+
+def batch_ids_dtype(num_classes):
+    """
+    (torch dtype, TrainingBatch.batch_ids_dtype) that packs class ids
+    below num_classes (0: unknown vocabulary) most compactly.
+    """
+    if 0 < num_classes <= 256:
+        return torch.uint8, "uint8"
+    if 0 < num_classes <= 2**15:
+        return torch.int16, "int16"
+    return torch.int32, "int32"
+
+
+def add_batch_ids(batch_msg, true_ids, pred_ids, num_classes=0):
+    """
+    Attach the true and predicted class id of every sample (1-D CPU
+    tensors, already in batch_ids_dtype's type or converted here), so the
+    dashboard can keep a confusion matrix over all samples, not just the
+    tiles. 64 samples with 10 classes are 128 bytes.
+    """
+    dtype, name = batch_ids_dtype(num_classes)
+    batch_msg.batch_true_ids = true_ids.to(dtype).numpy().tobytes()
+    batch_msg.batch_predicted_ids = pred_ids.to(dtype).numpy().tobytes()
+    batch_msg.batch_ids_dtype = name
+    return batch_msg
+
+
+def add_tiles(batch_msg, tensors, ids, true_labels, predicted_labels, encoding,
+              dataset_indices=None, sent_tiles=None):
+    """
+    Append one TrainingImage per tile to batch_msg and attach the pixels.
+
+    tensors is an (N, C, H, W) float tensor in [0, 1]; ids and the two label
+    lists have N entries. Labels are either class ids, packed into
+    tile_true_ids/tile_predicted_ids (the stream must have sent label_names),
+    or label strings, stored per image. For RAW, tile i's pixels live in
+    slice i of the packed tile_data buffer instead of in images[i].image_data;
+    SHM packs them the same way into a shared memory ring slot (and sends
+    them as RAW if they are too large for a slot).
+
+    dataset_indices, if given, are the tiles' indices in the training set,
+    so the dashboard can cache them; tiles that sent_tiles (the sender's
+    SentTiles) says the dashboard still has go out without pixels.
+    """
+    cached = [False] * len(ids)
+    if dataset_indices is not None:
+        dataset_indices = [int(d) for d in dataset_indices]
+        if sent_tiles is not None:
+            cached = [sent_tiles.omit(d) for d in dataset_indices]
+    if any(cached):
+        keep = [i for i, c in enumerate(cached) if not c]
+        tensors = tensors[keep]       # only these are converted and packed
+        if not keep and encoding == dashboard_pb2.TILE_ENCODING_SHM:
+            encoding = dashboard_pb2.TILE_ENCODING_RAW   # no slot for nothing
+    if encoding == dashboard_pb2.TILE_ENCODING_SHM and not write_shm_tiles(batch_msg, tensors):
+        encoding = dashboard_pb2.TILE_ENCODING_RAW
+    batch_msg.encoding = encoding
+    named = len(ids) > 0 and isinstance(true_labels[0], str)
+    if not named:
+        batch_msg.tile_true_ids.extend(int(t) for t in true_labels)
+        batch_msg.tile_predicted_ids.extend(int(p) for p in predicted_labels)
+    with_pixels = 0    # position in tensors of the next tile that has pixels
+    for i, idx in enumerate(ids):
+        img_msg = batch_msg.images.add()
+        img_msg.id = idx
+        if named:
+            img_msg.true_label = true_labels[i]
+            img_msg.predicted_label = predicted_labels[i]
+        if dataset_indices is not None:
+            img_msg.dataset_index = dataset_indices[i]
+        if cached[i]:
+            img_msg.pixels_cached = True
+            continue
+        if encoding == dashboard_pb2.TILE_ENCODING_PNG:
+            img_msg.image_data = tensor_to_png_bytes(tensors[with_pixels])
+        elif encoding == dashboard_pb2.TILE_ENCODING_JPEG:
+            img_msg.image_data = tensor_to_jpeg_bytes(tensors[with_pixels])
+        with_pixels += 1
+
+    if encoding == dashboard_pb2.TILE_ENCODING_RAW:
+        packed = tensors_to_uint8_hwc(tensors)
+        batch_msg.tile_data = packed.numpy().tobytes()
+        batch_msg.tile_shape.extend(packed.shape)
+        batch_msg.tile_dtype = "uint8"
+    return batch_msg
@@ -1,71 +1,144 @@
 #Simulates training script.
-#Currently sends fake batches (random images + labels) for testing
-import io
+#Currently sends fake batches (random images + labels) for testing.
+#The generator is also the load source of benchmarks/e2e_throughput.py.
+import argparse
 import random
 import time
 
-import grpc
 import torch
-from torchvision.utils import save_image
 
-from proto import dashboard_pb2, dashboard_pb2_grpc
+from proto import dashboard_pb2
+from training.telemetry import open_sender
+from training.tiles import COMPRESSIONS, add_batch_ids, add_tiles
 
 
 LABELS = ["cat", "dog", "car", "plane"]  # example label names
-
-
-def tensor_to_png_bytes(tensor):
-    """
-    Convert a (C, H, W) tensor in [0, 1] to PNG bytes.
-    """
-    buf = io.BytesIO()
-    save_image(tensor, buf, format="PNG")
-    return buf.getvalue()
-
-
-def generate_fake_batches(num_batches=10, batch_size=32):
+DASHBOARD_ADDR = "localhost:50051"
+RUN_ID = ""             # set per trainer when several share one dashboard
+TILE_ENCODING = "auto"  # "auto", "shm", "raw", "png" or "jpeg"
+COMPRESSION = "none"    # "none", "gzip" or "deflate" (remote dashboards)
+LOG_INTERVAL_S = 2.0    # progress line at most this often
+BATCH_RATE = 1 / 0.3    # batches per second (simulated training speed)
+NUM_TILES = 16          # images per batch shown on the dashboard
+TILE_RES = 64           # generated images are TILE_RES x TILE_RES
+DATASET_SIZE = 0        # > 0: tiles come from a fixed pool of this many images
+CONNECT_WAIT_S = 5.0    # wait this long for the dashboard before sending anyway
+
+
+def generate_fake_batches(num_batches=10, batch_size=32,
+                          encoding=dashboard_pb2.TILE_ENCODING_PNG,
+                          rate=BATCH_RATE, num_tiles=NUM_TILES, tile_res=TILE_RES,
+                          run_id=None, stop_event=None, verbose=True,
+                          dataset_size=DATASET_SIZE):
     """
     Generator that yields TrainingBatch messages with random data.
+
+    rate is in batches per second (0 = as fast as the stream accepts them);
+    batches are paced against a fixed schedule, so encode time does not
+    lower the rate. num_batches=None keeps going until stop_event is set.
+    encoding is a TileEncoding, or a callable returning the one to use
+    for each batch (e.g. a sender's, which a reconnect may change).
+    With dataset_size, batches are drawn from a fixed pool of that many
+    noise images and tiles carry their dataset_index, like a real dataset
+    (StreamTraining has no FlowControl, so pixels are always sent).
     """
-    for iteration in range(num_batches):
+    run_id = RUN_ID if run_id is None else run_id
+    pool = None
+    if dataset_size:
+        pool = torch.rand(dataset_size, 3, tile_res, tile_res)
+    encoding_of = encoding if callable(encoding) else lambda: encoding
+    interval = 1.0 / rate if rate > 0 else 0.0
+    next_time = time.perf_counter()
+    last_log_time = 0.0
+    iteration = 0
+    while num_batches is None or iteration < num_batches:
+        if stop_event is not None and stop_event.is_set():
+            return
         # fake images: random noise
-        images = torch.rand(batch_size, 3, 64, 64)
+        dataset_indices = None
+        if pool is not None:
+            dataset_indices = torch.randint(0, dataset_size, (batch_size,))
+            images = pool[dataset_indices]
+        else:
+            images = torch.rand(batch_size, 3, tile_res, tile_res)
         labels = torch.randint(0, len(LABELS), (batch_size,))
         preds = torch.randint(0, len(LABELS), (batch_size,))
 
         batch_msg = dashboard_pb2.TrainingBatch()
+        batch_msg.run_id = run_id
         batch_msg.iteration = iteration
         batch_msg.loss = random.random()
         batch_msg.fps = 0.0  # we'll fill real FPS later
-
-        # pick up to 16 indices to send to the dashboard
-        num_tiles = min(16, batch_size)
-        indices = random.sample(range(batch_size), k=num_tiles)
-
-        for idx in indices:
-            img_msg = batch_msg.images.add()
-            img_msg.id = idx
-            img_msg.true_label = LABELS[labels[idx]]
-            img_msg.predicted_label = LABELS[preds[idx]]
-            img_msg.image_data = tensor_to_png_bytes(images[idx])
-
-        print(f"[client] sending batch iter={iteration}, tiles={num_tiles}")
+        if iteration == 0:
+            # one generator = one stream: send the vocabulary up front
+            batch_msg.label_names.extend(LABELS)
+        add_batch_ids(batch_msg, labels, preds, len(LABELS))
+
+        # pick up to num_tiles indices to send to the dashboard
+        indices = random.sample(range(batch_size), k=min(num_tiles, batch_size))
+
+        encode_start = time.perf_counter()
+        add_tiles(
+            batch_msg,
+            images[indices],
+            indices,
+            labels[indices].tolist(),
+            preds[indices].tolist(),
+            encoding_of(),
+            dataset_indices=None if dataset_indices is None else dataset_indices[indices].tolist(),
+        )
+        batch_msg.encode_time_ms = (time.perf_counter() - encode_start) * 1000.0
+
+        now = time.time()
+        if verbose and now - last_log_time >= LOG_INTERVAL_S:
+            print(f"[client] sending batch iter={iteration}, tiles={len(indices)}")
+            last_log_time = now
+        batch_msg.send_time_ns = time.time_ns()
         yield batch_msg
-        time.sleep(0.3)  # simulate training time per iteration
+        iteration += 1
 
+        # simulate training time per iteration
+        if interval:
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.perf_counter()   # fell behind: don't burst to catch up
 
-def main():
-    channel = grpc.insecure_channel("localhost:50051")
-    stub = dashboard_pb2_grpc.DashboardServiceStub(channel)
-
-    # Optional: test Ping first
-    hb = dashboard_pb2.Heartbeat(timestamp_ms=int(time.time() * 1000))
-    ack = stub.Ping(hb)
-    print("[client] Ping ack:", ack.ok, ack.message)
 
-    # Send the stream of batches
-    ack2 = stub.StreamTraining(generate_fake_batches())
-    print("[client] StreamTraining finished:", ack2.ok, ack2.message)
+def main():
+    parser = argparse.ArgumentParser(description="Send fake training batches")
+    parser.add_argument("--addr", default=DASHBOARD_ADDR)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=BATCH_RATE,
+                        help="batches per second (0 = unthrottled)")
+    parser.add_argument("--tiles", type=int, default=NUM_TILES)
+    parser.add_argument("--tile-res", type=int, default=TILE_RES)
+    parser.add_argument("--encoding", default=TILE_ENCODING,
+                        choices=["auto", "shm", "raw", "png", "jpeg"])
+    parser.add_argument("--compression", default=COMPRESSION, choices=sorted(COMPRESSIONS))
+    parser.add_argument("--dataset-size", type=int, default=DATASET_SIZE,
+                        help="draw tiles from a fixed pool of N images (0 = fresh noise)")
+    args = parser.parse_args()
+
+    # connects (and reconnects after a dashboard restart) in the background;
+    # each Ping answer decides the tile encoding until the next reconnect
+    sender = open_sender(
+        args.addr, args.compression, label_names=LABELS, preferred_encoding=args.encoding,
+    )
+    if not sender.wait_online(CONNECT_WAIT_S):
+        print("[client] Dashboard not up yet, sending anyway (losses are kept for it).")
+    print("[client] Tile encoding:", dashboard_pb2.TileEncoding.Name(sender.encoding))
+
+    for batch_msg in generate_fake_batches(
+        num_batches=args.batches, encoding=lambda: sender.encoding, rate=args.rate,
+        num_tiles=args.tiles, tile_res=args.tile_res, dataset_size=args.dataset_size,
+    ):
+        sender.send(batch_msg)
+    sender.close()
+    print(f"[client] Stream finished: sent={sender.sent}, dropped={sender.dropped}, "
+          f"connects={sender.connects}, catch-up points={sender.catchup_sent}")
 
 
 if __name__ == "__main__":
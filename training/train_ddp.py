@@ -0,0 +1,205 @@
+#Data-parallel CIFAR-10 training on CPU: N processes, gloo backend.
+#Each rank trains SimpleCNN under DistributedDataParallel on its own shard
+#(DistributedSampler over the memmap dataset). Only rank 0 talks to the
+#dashboard: losses are all-reduced and tiles gathered from all ranks (see
+#step_telemetry.DistributedTelemetry), so a run is one stream, not N.
+#
+#  python -m training.train_ddp --nproc 4 [--addr localhost:50051] [--max-steps 500]
+import argparse
+import os
+import socket
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch import nn, optim
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data.distributed import DistributedSampler
+
+from training.cifar_memmap import batch_to_device, make_memmap_loader, prepare_cifar_memmap
+from training.cpu_modes import CPUMode
+from training.model import SimpleCNN
+from training.step_telemetry import DistributedTelemetry
+from training.telemetry import open_sender
+from training.train_real import (
+    BATCH_SIZE, CATCHUP_POINTS, COMPRESSION, DASHBOARD_ADDR, DATA_ROOT, NUM_EPOCHS, NUM_TILES,
+    RUN_ID, TELEMETRY_POLICY, TELEMETRY_QUEUE_SIZE, TILE_ENCODING,
+)
+
+
+# --- CONFIG ---
+NUM_PROCS = 4
+WORKERS_PER_RANK = 1    # memmap batches are cheap to slice; keep the cores for training
+CPU_MODE = "eager"      # see training/cpu_modes.py; the same mode on every rank
+LOG_INTERVAL_S = 2.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def threads_per_rank(world_size):
+    """
+    Split the cores between the ranks: oversubscribing them (every rank
+    with torch's default thread count) is slower than fewer processes.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    return max(1, cpus // world_size)
+
+
+def connect_dashboard(addr, label_names):
+    """
+    Telemetry sender for rank 0, as in train_real: returns at once and
+    (re)connects in the background, catching up on missed losses.
+    """
+    return open_sender(
+        addr, COMPRESSION, max_queue=TELEMETRY_QUEUE_SIZE, policy=TELEMETRY_POLICY,
+        label_names=label_names, preferred_encoding=TILE_ENCODING,
+        catchup_points=CATCHUP_POINTS,
+    )
+
+
+def train_worker(rank, world_size, port, config, results):
+    """
+    One rank. config: dict with data_root, addr (None: no dashboard),
+    epochs, max_steps (0: whole epochs), cpu_mode, threads.
+    Rank 0 puts a summary dict into results (a multiprocessing queue).
+    """
+    torch.set_num_threads(config["threads"])
+    dist.init_process_group(
+        "gloo", init_method=f"tcp://127.0.0.1:{port}", rank=rank, world_size=world_size
+    )
+    try:
+        samplers = []
+        def make_sampler(dataset):
+            samplers.append(DistributedSampler(dataset, world_size, rank, shuffle=True))
+            return samplers[0]
+        loader, label_names = make_memmap_loader(
+            config["data_root"], BATCH_SIZE, num_workers=config["workers"],
+            make_sampler=make_sampler,
+        )
+
+        torch.manual_seed(0)    # same initial weights everywhere (DDP also broadcasts them)
+        mode = CPUMode(config["cpu_mode"])
+        model = mode.prepare_model(SimpleCNN(num_classes=len(label_names)))
+        model = DistributedDataParallel(model)
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(model.parameters(), lr=1e-3)
+
+        # only rank 0 connects; the others must not even open a channel.
+        # Every rank has to take part in the telemetry collectives or none:
+        # all see the same addr, and rank 0's sender never gives up.
+        sender = telemetry = None
+        if config["addr"]:
+            if rank == 0:
+                sender = connect_dashboard(config["addr"], label_names)
+            # encoding None: the one chosen from the dashboard's latest Ping
+            telemetry = DistributedTelemetry(
+                sender, None, rank, world_size, run_id=RUN_ID, num_tiles=NUM_TILES,
+                num_classes=len(label_names),
+            )
+
+        iteration = 0
+        last_log_time = 0.0
+        max_steps = config["max_steps"]
+        dist.barrier()
+        start = time.perf_counter()
+        for epoch in range(config["epochs"]):
+            samplers[0].set_epoch(epoch)   # a different shuffle per epoch, same on all ranks
+            for images, labels in loader:
+                start_time = time.time()
+                images, labels = batch_to_device(images, labels, torch.device("cpu"))
+                images = mode.prepare_input(images)
+
+                with mode.autocast():
+                    outputs = model(images)
+                    loss = criterion(outputs, labels)
+                optimizer.zero_grad()
+                loss.backward()       # gradients all-reduced across ranks here
+                optimizer.step()
+                preds = outputs.argmax(dim=1)
+                step_time_ms = (time.time() - start_time) * 1000.0
+
+                if telemetry is not None:
+                    telemetry.step(iteration, loss, images, labels, preds, step_time_ms)
+
+                if rank == 0 and start_time - last_log_time >= LOG_INTERVAL_S:
+                    loss_value = telemetry.last_loss if telemetry is not None else loss.item()
+                    loss_text = "-" if loss_value is None else f"{loss_value:.4f}"
+                    print(f"[ddp] iter={iteration}, loss={loss_text} (rank 0 view), ranks={world_size}")
+                    last_log_time = start_time
+
+                iteration += 1
+                if max_steps and iteration >= max_steps:
+                    break
+            if max_steps and iteration >= max_steps:
+                break
+        elapsed = time.perf_counter() - start
+
+        if telemetry is not None:
+            telemetry.close()
+        if rank == 0:
+            summary = {
+                "world_size": world_size,
+                "threads_per_rank": config["threads"],
+                "steps": iteration,
+                "elapsed_s": elapsed,
+                "samples_per_s": iteration * BATCH_SIZE * world_size / elapsed,
+                "last_loss": telemetry.last_loss if telemetry is not None else loss.item(),
+                "batches_sent": 0,
+                "connects": 0,
+            }
+            if sender is not None:
+                sender.close()
+                summary["batches_sent"] = sender.sent
+                summary["connects"] = sender.connects
+            results.put(summary)
+    finally:
+        dist.destroy_process_group()
+
+
+def launch(world_size, data_root=DATA_ROOT, addr=DASHBOARD_ADDR, epochs=NUM_EPOCHS,
+           max_steps=0, cpu_mode=CPU_MODE, threads=0, workers=WORKERS_PER_RANK):
+    """
+    Run world_size ranks to completion; returns rank 0's summary dict.
+    """
+    config = {
+        "data_root": data_root, "addr": addr, "epochs": epochs,
+        "max_steps": max_steps, "cpu_mode": cpu_mode,
+        "threads": threads or threads_per_rank(world_size), "workers": workers,
+    }
+    prepare_cifar_memmap(data_root)   # once, before N ranks race to convert it
+    results = mp.get_context("spawn").SimpleQueue()
+    mp.spawn(train_worker, args=(world_size, free_port(), config, results),
+             nprocs=world_size, join=True)
+    return results.get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data-parallel CIFAR-10 training (gloo, CPU)")
+    parser.add_argument("--nproc", type=int, default=NUM_PROCS)
+    parser.add_argument("--addr", default=DASHBOARD_ADDR, help="dashboard address ('' for none)")
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--epochs", type=int, default=NUM_EPOCHS)
+    parser.add_argument("--max-steps", type=int, default=0, help="stop after this many steps per rank")
+    parser.add_argument("--cpu-mode", default=CPU_MODE)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads per rank (0: cores / nproc)")
+    args = parser.parse_args()
+
+    summary = launch(
+        args.nproc, args.data_root, args.addr, args.epochs, args.max_steps,
+        args.cpu_mode, args.threads,
+    )
+    print(
+        f"[ddp] {summary['world_size']} ranks x {summary['threads_per_rank']} threads: "
+        f"{summary['steps']} steps in {summary['elapsed_s']:.1f}s, "
+        f"{summary['samples_per_s']:.0f} samples/s, batches sent={summary['batches_sent']}, "
+        f"connects={summary['connects']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,15 @@
-import io
-import random
 import time
 
-import grpc
 import torch
 from torch import nn, optim
 from torch.utils.data import DataLoader
 from torchvision import datasets, transforms
-from torchvision.utils import save_image
 
-from proto import dashboard_pb2, dashboard_pb2_grpc
+from training.cifar_memmap import batch_to_device, make_memmap_loader
+from training.cpu_modes import CPUMode, resolve_cpu_mode
 from training.model import SimpleCNN
+from training.step_telemetry import make_step_telemetry
+from training.telemetry import DROP_OLDEST, open_sender
 
 
 # --- CONFIG ---
@@ -18,28 +17,60 @@ BATCH_SIZE = 64
 NUM_EPOCHS = 1          # keep small at first
 NUM_TILES = 16          # tiles per batch for dashboard
 DATA_ROOT = "./data"    # where CIFAR-10 will be downloaded
-
-
-def tensor_to_png_bytes(tensor):
+DATA_BACKEND = "memmap" # "memmap" (uint8 .npy, batch slicing) or "torchvision" (per-sample PIL)
+NUM_WORKERS = 2
+PERSISTENT_WORKERS = True   # keep loader workers alive between epochs
+PREFETCH_FACTOR = 4         # batches loaded ahead per worker
+PIN_MEMORY = torch.cuda.is_available()
+CPU_MODE = "auto"       # CPU only: "auto" (python -m benchmarks.cpu_modes result, else eager),
+                        # "eager" or "+"-joined channels_last / bf16 / compile
+CPU_THREADS = 0         # intra-op threads on CPU; 0 = saved "auto" choice or torch default
+DASHBOARD_ADDR = "localhost:50051"   # "" to train without a dashboard
+RUN_ID = ""             # set per trainer when several share one dashboard
+TILE_ENCODING = "auto"  # "auto" (shared memory on localhost), "shm", "raw", "png" or "jpeg"
+COMPRESSION = "none"    # "none", "gzip" or "deflate" (remote dashboards)
+TELEMETRY_QUEUE_SIZE = 8          # batches buffered for the dashboard
+CATCHUP_POINTS = 10_000           # loss points kept while the dashboard is away
+TELEMETRY_POLICY = DROP_OLDEST    # or LATEST_WINS when the dashboard lags
+TELEMETRY_MODE = "low_overhead"   # or "per_step" (loss.item() and full .cpu() each step)
+SEND_BATCH_IDS = True   # every sample's true/predicted id, for the dashboard's confusion matrix
+LOG_INTERVAL_S = 2.0    # progress line at most this often (stdout is slow)
+
+
+class IndexedCIFAR10(datasets.CIFAR10):
     """
-    Convert a (C, H, W) tensor in [0, 1] to PNG bytes.
+    CIFAR10 that also returns each sample's index (the dashboard caches
+    tiles by it).
     """
-    buf = io.BytesIO()
-    save_image(tensor, buf, format="PNG")
-    return buf.getvalue()
-
+    def __getitem__(self, index):
+        img, target = super().__getitem__(index)
+        return img, target, index
 
-def make_dataloader():
-    transform = transforms.Compose([
-        transforms.Resize((32, 32)),
-        transforms.ToTensor(),  # -> [0,1] float, shape (C,H,W)
-    ])
 
-    train_dataset = datasets.CIFAR10(
+def make_dataloader(backend=DATA_BACKEND):
+    """
+    (loader, label names); batches are (images, labels, dataset indices).
+    """
+    if backend == "memmap":
+        return make_memmap_loader(
+            DATA_ROOT, BATCH_SIZE, num_workers=NUM_WORKERS,
+            persistent_workers=PERSISTENT_WORKERS, prefetch_factor=PREFETCH_FACTOR,
+            pin_memory=PIN_MEMORY, return_indices=True,
+        )
+
+    # CIFAR images are 32x32 already: ToTensor is all that's needed
+    transform = transforms.ToTensor()  # -> [0,1] float, shape (C,H,W)
+    train_dataset = IndexedCIFAR10(
         root=DATA_ROOT, train=True, download=True, transform=transform
     )
+    worker_options = {}
+    if NUM_WORKERS > 0:
+        worker_options = dict(
+            persistent_workers=PERSISTENT_WORKERS, prefetch_factor=PREFETCH_FACTOR
+        )
     loader = DataLoader(
-        train_dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=2
+        train_dataset, batch_size=BATCH_SIZE, shuffle=True,
+        num_workers=NUM_WORKERS, pin_memory=PIN_MEMORY, **worker_options,
     )
     return loader, train_dataset.classes  # label names
 
@@ -50,59 +81,54 @@ def main():
     print("[train] Using device:", device)
 
     # data
+    data_start = time.time()
     loader, label_names = make_dataloader()
+    print(f"[train] Data backend {DATA_BACKEND!r} ready in {time.time() - data_start:.2f}s")
 
     # model
     model = SimpleCNN(num_classes=len(label_names)).to(device)
+    mode = CPUMode("eager")
+    if device.type == "cpu":
+        mode, threads = resolve_cpu_mode(CPU_MODE, CPU_THREADS)
+        model = mode.prepare_model(model)
+        print(f"[train] CPU mode {mode.name!r} with {threads} intra-op thread(s)")
 
     # loss & optimizer
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=1e-3)
 
-    # gRPC channel + stub
-    channel = grpc.insecure_channel("localhost:50051")
-    stub = dashboard_pb2_grpc.DashboardServiceStub(channel)
-
-    dashboard_online = True  # will flip to False if we lose connection
-
-    # helper to send a single batch (as a 1-element stream)
-    def send_batch_to_dashboard(batch_msg):
-        nonlocal dashboard_online
-        if not dashboard_online:
-            return
-
-        try:
-            # iter([batch_msg]) creates a one-element "stream"
-            ack = stub.StreamTraining(iter([batch_msg]))
-            # you can optionally check ack.ok here
-        except grpc.RpcError as e:
-            print("[train] Dashboard connection lost, disabling streaming.")
-            print("        Error:", e)
-            dashboard_online = False
-
-    # Optional thing but here's quick Ping (also fault-tolerant)
-    try:
-        hb = dashboard_pb2.Heartbeat(timestamp_ms=int(time.time() * 1000))
-        ack = stub.Ping(hb)
-        print("[train] Ping ack:", ack.ok, ack.message)
-    except grpc.RpcError as e:
-        print("[train] Could not reach dashboard on Ping, will train offline.")
-        print("        Error:", e)
-        dashboard_online = False
+    # one long-lived stream for the whole run, fed by a background thread
+    # that also (re)connects: training never waits for the dashboard, and
+    # one that comes up (or back) mid-run gets the losses it missed
+    sender = telemetry = None
+    if DASHBOARD_ADDR:
+        sender = open_sender(
+            DASHBOARD_ADDR, COMPRESSION, max_queue=TELEMETRY_QUEUE_SIZE,
+            policy=TELEMETRY_POLICY, label_names=label_names,
+            preferred_encoding=TILE_ENCODING, catchup_points=CATCHUP_POINTS,
+        )
+        # encoding None: the one chosen from the dashboard's latest Ping
+        telemetry = make_step_telemetry(
+            TELEMETRY_MODE, sender, None, device, run_id=RUN_ID, num_tiles=NUM_TILES,
+            batch_ids=SEND_BATCH_IDS,
+        )
 
     iteration = 0
+    last_log_time = 0.0
     print("[train] Starting training loop...")
     for epoch in range(NUM_EPOCHS):
         print(f"[train] Epoch {epoch+1}/{NUM_EPOCHS}")
-        for images, labels in loader:
+        for images, labels, indices in loader:
             start_time = time.time()
 
-            images = images.to(device)
-            labels = labels.to(device)
+            # memmap batches are uint8: converted to float on the device
+            images, labels = batch_to_device(images, labels, device)
+            images = mode.prepare_input(images)
 
-            # forward
-            outputs = model(images)
-            loss = criterion(outputs, labels)
+            # forward (under bf16 autocast in the CPU "bf16" modes)
+            with mode.autocast():
+                outputs = model(images)
+                loss = criterion(outputs, labels)
 
             # backward
             optimizer.zero_grad()
@@ -111,36 +137,27 @@ def main():
 
             # preds
             preds = outputs.argmax(dim=1)
-
-            # --- Build TrainingBatch message ---
-            batch_msg = dashboard_pb2.TrainingBatch()
-            batch_msg.iteration = iteration
-            batch_msg.loss = float(loss.item())
-            batch_msg.fps = 0.0  # dashboard computes its own FPS
-
-            # choose up to NUM_TILES images
-            batch_size = images.size(0)
-            num_tiles = min(NUM_TILES, batch_size)
-            indices = random.sample(range(batch_size), k=num_tiles)
-
-            images_cpu = images.detach().cpu()
-            labels_cpu = labels.detach().cpu()
-            preds_cpu = preds.detach().cpu()
-
-            for idx in indices:
-                img_msg = batch_msg.images.add()
-                img_msg.id = idx
-                img_msg.true_label = label_names[int(labels_cpu[idx])]
-                img_msg.predicted_label = label_names[int(preds_cpu[idx])]
-                img_msg.image_data = tensor_to_png_bytes(images_cpu[idx])
-
-            print(
-                f"[train] iter={iteration}, loss={batch_msg.loss:.4f}, "
-                f"tiles={num_tiles}, dashboard_online={dashboard_online}"
-            )
-
-            # send to dashboard (if still online)
-            send_batch_to_dashboard(batch_msg)
+            step_time_ms = (time.time() - start_time) * 1000.0
+
+            dashboard_online = sender is not None and sender.online
+            num_tiles = 0
+            if telemetry is not None:
+                # what gets sent (and when the host waits for the device)
+                # depends on TELEMETRY_MODE and the dashboard's FlowControl;
+                # offline, only the loss points are kept for the catch-up
+                num_tiles = telemetry.step(
+                    iteration, loss, images, labels, preds, step_time_ms, indices
+                )
+
+            if start_time - last_log_time >= LOG_INTERVAL_S:
+                # low_overhead mode reports the last flushed loss (no sync)
+                loss_value = telemetry.last_loss if telemetry is not None else loss.item()
+                loss_text = "-" if loss_value is None else f"{loss_value:.4f}"
+                print(
+                    f"[train] iter={iteration}, loss={loss_text}, "
+                    f"tiles={num_tiles}, dashboard_online={dashboard_online}"
+                )
+                last_log_time = start_time
 
             # simulate a bit of delay (optional, to control pace)
             elapsed = time.time() - start_time
@@ -150,6 +167,11 @@ def main():
 
             iteration += 1
 
+    if sender is not None:
+        telemetry.close()
+        sender.close()
+        print(f"[train] Telemetry: sent={sender.sent}, dropped={sender.dropped}, "
+              f"connects={sender.connects}, catch-up points={sender.catchup_sent}")
     print("[train] Training finished.")
 
 